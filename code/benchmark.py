@@ -0,0 +1,170 @@
+"""
+Performance benchmarks of the neuron models, currents and recorders.
+
+Every axis is varied on its own around a default case (LIF, 10^4 neurons, dt=0.1, no refractory
+period, constant current, no recorders). Each case runs in a fresh process so that its peak memory
+can be measured.
+
+    python benchmark.py --save baseline.json                  # measure and store a baseline
+    python benchmark.py --compare baseline.json               # measure and flag regressions
+    python benchmark.py --quick --only LIF --compare base.json
+"""
+import argparse
+import json
+import multiprocessing
+import platform
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import torch
+from pymonntorch import *
+
+from currents import ConstantCurrent, StepCurrent, SinCurrent, RampCurrent, ExpCurrent, LogCurrent, NoisyCurrent
+from models import LIF, ELIF, AELIF
+from time_res import TimeResolution
+
+MODELS = {
+    "LIF": (LIF, dict(R=5, tau=10, threshold=-37, u_rest=-67, u_reset=-75)),
+    "ELIF": (ELIF, dict(R=1.7, tau=10, threshold=-13, rh_threshold=-42, u_rest=-65, u_reset=-73, delta_T=0.1)),
+    "AELIF": (AELIF, dict(a=6.7, b=0.5, R=1.7, tau_m=10, tau_w=100, threshold=-30, rh_threshold=-50,
+                          u_rest=-65, u_reset=-70, delta_T=1)),
+}
+CURRENTS = {
+    "constant": lambda steps: ConstantCurrent(value=10),
+    "step": lambda steps: StepCurrent(value=10, t_start=5, t_end=50),
+    "sin": lambda steps: SinCurrent(amplitude=20, frequency=2, phase=2.0, offset=10),
+    "ramp": lambda steps: RampCurrent(slope=1.2),
+    "exp": lambda steps: ExpCurrent(base=1.0),
+    "log": lambda steps: LogCurrent(vertical_shift=4),
+    "noisy": lambda steps: NoisyCurrent(iterations=steps + 1, mean=10, std=5, seed=1),
+}
+RECORDERS = {
+    "none": {},
+    "recorder": {4: lambda: Recorder(variables=["u", "I"])},
+    "event": {5: lambda: EventRecorder(variables=["spike"])},
+    "both": {4: lambda: Recorder(variables=["u", "I"]), 5: lambda: EventRecorder(variables=["spike"])},
+}
+SIZES = [10 ** k for k in range(8)]
+DEFAULT = dict(model="LIF", size=10 ** 4, dt=0.1, refractory=False, current="constant", recorders="none")
+
+
+def cases(models, sizes):
+    """
+    One-factor-at-a-time variations of DEFAULT for every model
+    """
+    result = []
+    for model in models:
+        base = dict(DEFAULT, model=model)
+        variations = ([dict(size=s) for s in sizes] + [dict(dt=dt) for dt in (0.01, 1.0)] + [dict(refractory=True)]
+                      + [dict(current=c) for c in CURRENTS if c != "constant"]
+                      + [dict(recorders=r) for r in RECORDERS if r != "none"])
+        for variation in variations:
+            case = dict(base, **variation)
+            if case not in result:
+                result.append(case)
+    return result
+
+
+def case_name(case):
+    return "{model}/n={size}/dt={dt}/refractory={refractory}/current={current}/recorders={recorders}".format(**case)
+
+
+def rss_kb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() // 1024
+
+
+def run_case(case, steps, warmup):
+    model, params = MODELS[case["model"]]
+    net = Network(behavior={1: TimeResolution(dt=case["dt"])})
+    before = rss_kb()
+    behavior = {2: CURRENTS[case["current"]](steps + warmup),
+                3: model(**params, refractory_T=2.0 if case["refractory"] else 0)}
+    behavior.update({key: recorder() for key, recorder in RECORDERS[case["recorders"]].items()})
+    ng = NeuronGroup(net=net, size=case["size"], behavior=behavior)
+    net.initialize(info=False)
+
+    for _ in range(warmup):
+        net.simulate_iteration()
+    latencies = np.empty(steps)
+    for i in range(steps):
+        start = time.perf_counter()
+        net.simulate_iteration()
+        if ng.device != "cpu" and torch.cuda.is_available():
+            torch.cuda.synchronize()
+        latencies[i] = time.perf_counter() - start
+
+    total = latencies.sum()
+    return {
+        "steps_per_sec": steps / total,
+        "neuron_updates_per_sec": steps * case["size"] / total,
+        "peak_memory_mb": (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 1024,
+        "latency_ms": {f"p{p}": float(np.percentile(latencies, p) * 1e3) for p in (50, 90, 99)},
+    }
+
+
+def steps_for(size, steps):
+    # Keep the largest populations to a few seconds per case
+    return max(10, min(steps, int(steps * 10 ** 5 / size)))
+
+
+def run(selected, steps, warmup):
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for case in selected:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(run_case, case, steps_for(case["size"], steps), warmup).result()
+        results[case_name(case)] = dict(case=case, **result)
+        print(f"{case_name(case):<75} {result['steps_per_sec']:>10.1f} steps/s "
+              f"{result['neuron_updates_per_sec']:>12.3e} updates/s {result['peak_memory_mb']:>8.1f} MB "
+              f"p50 {result['latency_ms']['p50']:.3f} ms p99 {result['latency_ms']['p99']:.3f} ms")
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Cases whose throughput dropped or whose peak memory grew by more than `tolerance` (relative)
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]
+        speed = result["steps_per_sec"] / old["steps_per_sec"] - 1
+        memory = (result["peak_memory_mb"] - old["peak_memory_mb"]) / max(old["peak_memory_mb"], 1.0)
+        if speed < -tolerance or memory > tolerance:
+            regressions.append((name, speed, memory))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", default=list(MODELS), choices=list(MODELS))
+    parser.add_argument("--max-size", type=int, default=SIZES[-1])
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--quick", action="store_true", help="sizes up to 10^5 and 50 steps")
+    parser.add_argument("--save", help="write the results as a baseline JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="relative change flagged as regression")
+    args = parser.parse_args()
+    if args.quick:
+        args.max_size, args.steps = min(args.max_size, 10 ** 5), 50
+
+    results = run(cases(args.only, [s for s in SIZES if s <= args.max_size]), args.steps, args.warmup)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"machine": {"platform": platform.platform(), "processor": platform.processor(),
+                                   "torch": torch.__version__, "threads": torch.get_num_threads()},
+                       "results": results}, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for name, speed, memory in regressions:
+            print(f"REGRESSION {name}: throughput {speed:+.1%}, peak memory {memory:+.1%}")
+        print(f"{len(regressions)} regression(s) in {len(results)} cases")
+        raise SystemExit(1 if regressions else 0)
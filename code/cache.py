@@ -0,0 +1,189 @@
+import glob
+import hashlib
+import inspect
+import io
+import json
+import os
+import time
+
+import numpy as np
+import pymonntorch
+import torch
+
+from snapshot import network_objects, restore, save_network, load_network
+
+
+def canonical(value):
+    """
+    JSON-serializable form of a behavior parameter that is equal for equal configurations
+    """
+    if isinstance(value, torch.Tensor) and value.layout != torch.strided:
+        # Connectivity matrices are large, so they are represented by a digest
+        value = value.detach().cpu().to_sparse_csr()
+        digest = hashlib.sha256()
+        for part in (value.crow_indices(), value.col_indices(), value.values()):
+            digest.update(part.contiguous().numpy().tobytes())
+        return {"sparse": str(value.dtype), "shape": list(value.shape), "digest": digest.hexdigest()}
+    if isinstance(value, torch.Tensor):
+        value = value.detach().cpu()
+        return {"tensor": str(value.dtype), "shape": list(value.shape), "data": value.flatten().tolist()}
+    if isinstance(value, np.ndarray):
+        return {"array": str(value.dtype), "shape": list(value.shape), "data": value.flatten().tolist()}
+    if isinstance(value, (bool, int, str)) or value is None:
+        return value
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, dict):
+        return {str(k): canonical(v) for k, v in sorted(value.items(), key=lambda item: str(item[0]))}
+    if isinstance(value, (list, tuple, range)):
+        return [canonical(v) for v in value]
+    if isinstance(value, type) or (callable(value) and hasattr(value, "__qualname__")):
+        return f"{value.__module__}.{value.__qualname__}"
+    # e.g. stimuli: their class and attributes
+    return {"class": canonical(type(value)), "vars": canonical(vars(value))}
+
+
+def source_files(net):
+    """
+    Modules of this project, since helpers (rng, integrators, stimuli, ...) change results too, and the
+    source files that define the network's behaviors
+    """
+    files = set(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "*.py")))
+    for obj in network_objects(net):
+        try:
+            files.add(os.path.abspath(inspect.getfile(type(obj))))
+        except TypeError:
+            pass
+    return sorted(files)
+
+
+def code_version(net):
+    """
+    Hash of the source files of a network (see source_files), plus the library versions
+    """
+    digest = hashlib.sha256(f"{pymonntorch.__version__} {torch.__version__}".encode())
+    for file in source_files(net):
+        with open(file, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+def config_key(net, **options):
+    """
+    Canonical hash of everything that determines a run except its length
+    """
+    config = {
+        "network": {str(k): [canonical(type(b)), canonical(b.init_kwargs)] for k, b in net.behavior.items()},
+        "groups": [{"tag": ng.tag, "size": ng.size, "class": canonical(type(ng)),
+                    "behavior": {str(k): [canonical(type(b)), canonical(b.init_kwargs)] for k, b in ng.behavior.items()}}
+                   for ng in net.NeuronGroups],
+        "synapses": [{"tag": sg.tag, "src": sg.src.tag, "dst": sg.dst.tag,
+                      "behavior": {str(k): [canonical(type(b)), canonical(b.init_kwargs)] for k, b in sg.behavior.items()}}
+                     for sg in net.SynapseGroups],
+        "options": canonical(options),
+        "code": code_version(net),
+    }
+    return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+
+def checkpoint_digest(state):
+    """
+    Hash of a checkpoint (see snapshot.checkpoint) or of a checkpoint file
+    """
+    digest = hashlib.sha256()
+    if isinstance(state, dict):
+        buffer = io.BytesIO()
+        torch.save(state, buffer)
+        digest.update(buffer.getvalue())
+    else:
+        with open(state, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk cache of simulated networks keyed by config_key and number of iterations.
+    A run that is longer than a cached one of the same configuration resumes from it.
+    The least recently used entries are evicted once the cache grows beyond max_bytes.
+    """
+
+    def __init__(self, directory=".sim_cache", max_bytes=2 * 1024 ** 3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.index_file = os.path.join(directory, "index.json")
+        self.index = {}
+        if os.path.exists(self.index_file):
+            with open(self.index_file) as f:
+                self.index = json.load(f)
+
+    def save_index(self):
+        with open(self.index_file, "w") as f:
+            json.dump(self.index, f)
+
+    def lookup(self, key, iterations):
+        """
+        :return: (iterations, file) of the longest cached run of `key` not longer than `iterations`, or None
+        """
+        entries = [entry for entry in self.index.values() if entry["key"] == key and entry["iterations"] <= iterations]
+        if not entries:
+            return None
+        entry = max(entries, key=lambda e: e["iterations"])
+        entry["used"] = time.time()
+        self.save_index()
+        return entry["iterations"], os.path.join(self.directory, entry["file"])
+
+    def store(self, key, iterations, net):
+        file = f"{key}_{iterations}.pt"
+        save_network(net, os.path.join(self.directory, file))
+        self.index[file] = {"key": key, "iterations": iterations, "file": file, "used": time.time(),
+                            "bytes": os.path.getsize(os.path.join(self.directory, file))}
+        self.evict()
+        self.save_index()
+
+    def evict(self):
+        total = sum(entry["bytes"] for entry in self.index.values())
+        for file, entry in sorted(self.index.items(), key=lambda item: item[1]["used"]):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.directory, file))
+            total -= entry["bytes"]
+            del self.index[file]
+
+    def clear(self):
+        for file in self.index:
+            os.remove(os.path.join(self.directory, file))
+        self.index = {}
+        self.save_index()
+
+    def simulate(self, sim, iterations, block_size=None, event_driven=False, info=True, seed=None, profile=None,
+                 until_steady=False, warm_start=None):
+        """
+        Run a Simulation through the cache; sim.net is replaced by the cached network on a hit
+        :param seed: seed of the torch and numpy global generators, part of the key.
+                     The default is torch.initial_seed().
+        :param warm_start: checkpoint (or checkpoint file) to continue from, part of the key by its content
+        :return: number of iterations that were loaded from the cache
+        """
+        seed = torch.initial_seed() if seed is None else seed
+        key = config_key(sim.net, seed=seed, block_size=block_size, event_driven=event_driven, until_steady=until_steady,
+                         warm_start=None if warm_start is None else checkpoint_digest(warm_start))
+        hit = self.lookup(key, iterations)
+        # An event-driven run is solved as a whole and cannot be resumed
+        if hit and (hit[0] == iterations or not event_driven):
+            done, file = hit
+            sim.net = load_network(file)
+        else:
+            done = 0
+            torch.manual_seed(seed)
+            np.random.seed(seed % 2 ** 32)
+            sim.net.initialize(info=info)
+            if warm_start is not None:
+                restore(sim.net, warm_start)
+        if done < iterations:
+            sim.advance(iterations - done, block_size, event_driven, info, profile, until_steady)
+            self.store(key, iterations, sim.net)
+        if info:
+            print(f"cache: {done} of {iterations} iterations loaded")
+        return done
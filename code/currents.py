@@ -4,160 +4,271 @@ import numpy
 import torch
 from pymonntorch import *
 
+from rng import NoiseBlocks, draw_seed, neuron_ids, normal, stream_id
+from stimuli import Step, Sin, Ramp, Exp, Log, StimulusCache
+from utils import to_lanes
+
+
+def noise_stream(behavior, noise_range):
+    """
+    Seed (the `seed` parameter, or one drawn from the global generator) and counter-based uniform noise
+    blocks of a behavior (see rng.py), or (None, None) without noise
+    """
+    seed = behavior.parameter("seed", None)
+    if not torch.any(torch.as_tensor(noise_range) != 0):
+        return None, None
+    return draw_seed() if seed is None else seed, NoiseBlocks(stream_id(type(behavior).__name__))
+
+
+def current_block(behavior, ng, start, steps, rows):
+    """
+    Currents of the iterations start, ..., start + steps - 1 at once (see block.simulate_blocks), set as
+    `forward` sets them step by step: the rows, then the noise of the behavior
+    :param rows: value or tensor broadcastable to (steps, ng.size)
+    :return: tensor of shape (steps, ng.size) in the dtype of ng.I
+    """
+    inputs = torch.empty((steps, ng.size), dtype=ng.I.dtype, device=ng.device)
+    inputs[:] = rows
+    if getattr(behavior, "noise", None) is not None:
+        iterations = range(start, start + steps)
+        noise = torch.stack([behavior.noise.row(ng, behavior.seed, iteration) for iteration in iterations])
+        inputs += (noise - 0.5) * behavior.noise_range
+    return inputs
+
+
+def cached_rows(cache, ng, start, steps):
+    return torch.stack([cache.row(ng, iteration) for iteration in range(start, start + steps)])
+
 
 class ConstantCurrent(Behavior):
     def initialize(self, ng):
-        self.value = self.parameter("value", None, required=True)
-        self.noise_range = self.parameter("noise_range", 0.0)
-        ng.I = ng.vector(self.value)
+        self.value = to_lanes(ng, self.parameter("value", None, required=True))
+        self.noise_range = to_lanes(ng, self.parameter("noise_range", 0.0))
+        self.seed, self.noise = noise_stream(self, self.noise_range)
+        ng.I = ng.vector() + self.value
 
     def forward(self, ng):
-        ng.I = ng.vector(self.value)
+        ng.I[:] = self.value
         self.add_noise(ng)
 
+    def block(self, ng, start, steps):
+        return current_block(self, ng, start, steps, self.value)
+
     def add_noise(self, ng):
-        ng.I += (ng.vector("uniform") - 0.5) * self.noise_range
+        if self.noise is not None:
+            ng.I += (self.noise.row(ng, self.seed, ng.network.iteration) - 0.5) * self.noise_range
 
 
 class StepCurrent(Behavior):
     def initialize(self, ng):
-        self.value = self.parameter("value", None, required=True)
-        self.t_start = self.parameter("t_start", required=True)
-        self.t_end = self.parameter("t_end", None)
-        self.noise_range = self.parameter("noise_range", 0.0)
+        self.value = to_lanes(ng, self.parameter("value", None, required=True))
+        self.t_start = to_lanes(ng, self.parameter("t_start", required=True))
+        self.t_end = to_lanes(ng, self.parameter("t_end", None))
+        self.noise_range = to_lanes(ng, self.parameter("noise_range", 0.0))
+        self.seed, self.noise = noise_stream(self, self.noise_range)
+        self.cache = StimulusCache(Step(self.value, self.t_start, self.t_end), self.parameter("chunk_size", 1024))
 
         ng.I = ng.vector()
 
     def forward(self, ng):
-        ng.I = ng.vector(0.0)
-        if ng.network.iteration * ng.network.dt >= self.t_start:
-            ng.I = ng.vector(mode=self.value)
-            if self.t_end:
-                if ng.network.iteration * ng.network.dt >= self.t_end:
-                    ng.I = ng.vector(0.0)
-
+        ng.I[:] = self.cache.row(ng, ng.network.iteration)
         self.add_noise(ng)
 
+    def block(self, ng, start, steps):
+        return current_block(self, ng, start, steps, cached_rows(self.cache, ng, start, steps))
+
     def add_noise(self, ng):
-        ng.I += (ng.vector("uniform") - 0.5) * self.noise_range
+        if self.noise is not None:
+            ng.I += (self.noise.row(ng, self.seed, ng.network.iteration) - 0.5) * self.noise_range
 
 
 class SinCurrent(Behavior):
     def initialize(self, ng):
-        self.amplitude = self.parameter("amplitude", None, required=True)
-        self.frequency = self.parameter("frequency", None, required=True)
-        self.phase = self.parameter("phase", 0.0)
-        self.offset = self.parameter("offset", 0.0)
-        self.noise_range = self.parameter("noise_range", 0.0)
+        self.amplitude = to_lanes(ng, self.parameter("amplitude", None, required=True))
+        self.frequency = to_lanes(ng, self.parameter("frequency", None, required=True))
+        self.phase = to_lanes(ng, self.parameter("phase", 0.0))
+        self.offset = to_lanes(ng, self.parameter("offset", 0.0))
+        self.noise_range = to_lanes(ng, self.parameter("noise_range", 0.0))
+        self.seed, self.noise = noise_stream(self, self.noise_range)
+        self.cache = StimulusCache(Sin(self.amplitude, self.frequency, self.phase, self.offset),
+                                   self.parameter("chunk_size", 1024))
 
-        t = ng.network.iteration * ng.network.dt
         ng.I = ng.vector()
 
     def forward(self, ng):
-        t = ng.network.iteration * ng.network.dt
-        ng.I = torch.sin(ng.vector(self.frequency * t) + self.phase) * self.amplitude + self.offset
+        ng.I[:] = self.cache.row(ng, ng.network.iteration)
         self.add_noise(ng)
 
+    def block(self, ng, start, steps):
+        return current_block(self, ng, start, steps, cached_rows(self.cache, ng, start, steps))
+
     def add_noise(self, ng):
-        ng.I += (ng.vector("uniform") - 0.5) * self.noise_range
+        if self.noise is not None:
+            ng.I += (self.noise.row(ng, self.seed, ng.network.iteration) - 0.5) * self.noise_range
 
 
 class RampCurrent(Behavior):
     def initialize(self, ng):
-        self.slope = self.parameter("slope", None, required=True)
-        self.noise_range = self.parameter("noise_range", 0.0)
+        self.slope = to_lanes(ng, self.parameter("slope", None, required=True))
+        self.noise_range = to_lanes(ng, self.parameter("noise_range", 0.0))
+        self.seed, self.noise = noise_stream(self, self.noise_range)
+        self.cache = StimulusCache(Ramp(self.slope), self.parameter("chunk_size", 1024))
 
         ng.I = ng.vector()
+        self.walk = ng.vector()
 
     def forward(self, ng):
-        t = ng.network.dt
-        ng.I += self.slope * t
+        ng.I[:] = self.cache.row(ng, ng.network.iteration)
         self.add_noise(ng)
 
     def add_noise(self, ng):
-        ng.I += (ng.vector("uniform") - 0.5) * self.noise_range
+        # Noise accumulates along the ramp
+        if self.noise is not None:
+            self.walk += (self.noise.row(ng, self.seed, ng.network.iteration) - 0.5) * self.noise_range
+        ng.I += self.walk
 
 
 class ExpCurrent(Behavior):
     def initialize(self, ng):
-        self.base = self.parameter("base")
+        self.base = to_lanes(ng, self.parameter("base", 0.0))
+        self.cache = StimulusCache(Exp(self.base), self.parameter("chunk_size", 1024))
         ng.I = ng.vector()
 
     def forward(self, ng):
-        t = ng.network.iteration
-        ng.I = self.base + torch.exp(ng.vector(t))
+        ng.I[:] = self.cache.row(ng, ng.network.iteration)
+
+    def block(self, ng, start, steps):
+        return current_block(self, ng, start, steps, cached_rows(self.cache, ng, start, steps))
+
 
 class LogCurrent(Behavior):
     def initialize(self, ng):
-        self.horizontal_shift = self.parameter("horizontal_shift", 0.0)
-        self.vertical_shift = self.parameter("vertical_shift", 0.0)
-        self.noise_range = self.parameter("noise_range", 0.0)
+        self.horizontal_shift = to_lanes(ng, self.parameter("horizontal_shift", 0.0))
+        self.vertical_shift = to_lanes(ng, self.parameter("vertical_shift", 0.0))
+        self.noise_range = to_lanes(ng, self.parameter("noise_range", 0.0))
+        self.seed, self.noise = noise_stream(self, self.noise_range)
+        self.cache = StimulusCache(Log(self.horizontal_shift, self.vertical_shift), self.parameter("chunk_size", 1024))
 
         ng.I = ng.vector()
 
     def forward(self, ng):
-        t = ng.network.iteration * ng.network.dt
-        ng.I = self.vertical_shift + torch.log(ng.vector(t + self.horizontal_shift))
+        ng.I[:] = self.cache.row(ng, ng.network.iteration)
         self.add_noise(ng)
 
+    def block(self, ng, start, steps):
+        return current_block(self, ng, start, steps, cached_rows(self.cache, ng, start, steps))
+
     def add_noise(self, ng):
-        ng.I += (ng.vector("uniform") - 0.5) * self.noise_range
+        if self.noise is not None:
+            ng.I += (self.noise.row(ng, self.seed, ng.network.iteration) - 0.5) * self.noise_range
 
 
 class NoisyCurrent(Behavior):
+    """
+    Independent white or Brownian noise for every neuron, from counter-based streams (see rng.py)
+    keyed by seed, neuron id and iteration. Brownian noise is the running sum of white noise, scaled
+    per neuron to `mean` and `std` over the whole series of `iterations` steps.
+    The series is served in chunks of `chunk_size` iterations (default 256) aligned to multiples of
+    it, so the values do not depend on how the run is split.
+    """
+
     def initialize(self, ng):
         self.iterations = self.parameter("iterations", None, required=True)
         self.noise_type = self.parameter("noise_type", "white")
         self.mean = self.parameter("mean", 0.0)
         self.std = self.parameter("std", 0.0)
         self.seed = self.parameter("seed", None)
+        self.chunk_size = self.parameter("chunk_size", 256)
 
-        ng.I = ng.vector()
-
-    def forward(self, ng):
-        ng.I = ng.vector(float(self.add_noise(mean=self.mean,
-                                              std=self.std,
-                                              size=self.iterations)[ng.network.iteration]))
-
-    def add_noise(self, mean, std, size):
-        if self.seed is not None:
-            self.set_seed()
-        if self.noise_type == 'white':
-            return self.white_noise(mean, std, size)
-        elif self.noise_type == 'brownian':
-            return self.brownian_noise(mean, std, size)
-        else:
+        if self.noise_type not in ('white', 'brownian'):
             raise ValueError("Unsupported noise type")
 
-    def set_seed(self):
-        np.random.seed(self.seed)
-
-    def white_noise(self, mean, std, size):
-        self.set_seed()
-        return np.random.normal(mean, std, size)
+        if self.seed is None:
+            self.seed = draw_seed()
+        self.stream = stream_id(type(self).__name__)
+        self.chunk = None
+        if self.noise_type == 'brownian':
+            self.walk_mean, self.walk_std = self.walk_statistics(ng)
 
-    def brownian_noise(self, mean, std, size):
-        # Generate white noise with mean=0 and std=1
-        white_noise = np.random.normal(0, 1, size)
-
-        # Generate cumulative sum to simulate Brownian motion
-        brownian_motion = np.cumsum(white_noise)
+        ng.I = ng.vector()
 
-        # Adjust mean and std
-        adjusted_brownian_motion = (brownian_motion - np.mean(brownian_motion)) / np.std(brownian_motion)
+    def forward(self, ng):
+        ng.I[:] = self.noise_at(ng, ng.network.iteration)
+
+    def block(self, ng, start, steps):
+        rows = torch.stack([self.noise_at(ng, iteration) for iteration in range(start, start + steps)])
+        return current_block(self, ng, start, steps, rows)
+
+    def noise_at(self, ng, iteration):
+        """
+        Noise of every neuron at one iteration, generating the chunk that holds it when needed
+        :param ng: neuron group
+        :param iteration: index into the series
+        :return: tensor of shape (ng.size,)
+        """
+        if self.chunk is None or not self.chunk_start <= iteration < self.chunk_start + len(self.chunk):
+            self.load_chunk(ng, iteration)
+        return self.chunk[iteration - self.chunk_start]
+
+    def load_chunk(self, ng, iteration):
+        if not 0 <= iteration < self.iterations:
+            raise IndexError(f"Iteration {iteration} is outside the noise series of length {self.iterations}")
+        if self.noise_type == 'white':
+            # White noise can be generated at any offset
+            self.chunk_start = iteration - iteration % self.chunk_size
+            size = min(self.chunk_size, self.iterations - self.chunk_start)
+            self.chunk = self.mean + self.std * self.white(ng, self.chunk_start, size)
+            return
+        if self.chunk is None or iteration < self.chunk_start:
+            # Replay the walk from its beginning
+            self.chunk_start, self.walk_end = 0, 0.0
+            self.chunk = torch.empty((0, ng.size), dtype=torch.float64, device=ng.device)
+        while iteration >= self.chunk_start + len(self.chunk):
+            self.chunk_start += len(self.chunk)
+            size = min(self.chunk_size, self.iterations - self.chunk_start)
+            self.chunk = self.brownian_noise(self.next_walk(ng, self.chunk_start, size))
+
+    def white(self, ng, start, size):
+        iterations = torch.arange(start, start + size, dtype=torch.int64, device=ng.device)
+        return normal(self.seed, self.stream, neuron_ids(ng), iterations)
+
+    def next_walk(self, ng, start, size):
+        # Cumulative sum to simulate Brownian motion, continued from the previous chunk
+        brownian_motion = self.walk_end + torch.cumsum(self.white(ng, start, size), dim=0)
+        self.walk_end = brownian_motion[-1]
+        return brownian_motion
+
+    def walk_statistics(self, ng):
+        """
+        Mean and std of the whole random walk of every neuron, streamed chunk by chunk so that memory stays bounded
+        :return: (mean, std), tensors of shape (ng.size,)
+        """
+        self.walk_end = 0.0
+        count, mean, m2 = 0, 0.0, 0.0
+        for start in range(0, self.iterations, self.chunk_size):
+            walk = self.next_walk(ng, start, min(self.chunk_size, self.iterations - start))
+            # Chan et al. combination of the running and the chunk statistics
+            delta = walk.mean(dim=0) - mean
+            total = count + len(walk)
+            mean = mean + delta * len(walk) / total
+            m2 = m2 + ((walk - walk.mean(dim=0)) ** 2).sum(dim=0) + delta ** 2 * count * len(walk) / total
+            count = total
+        return mean, torch.sqrt(m2 / count)
+
+    def brownian_noise(self, brownian_motion):
+        # Adjust mean and std with the statistics of the full series
+        adjusted_brownian_motion = (brownian_motion - self.walk_mean) / self.walk_std
 
         # Scale to desired mean and std
-        scaled_brownian_noise = adjusted_brownian_motion * std + mean
-
-        return scaled_brownian_noise
+        return adjusted_brownian_motion * self.std + self.mean
 
 
 class RefractoryPeriod(Behavior):
     def initialize(self, ng):
-        self.refractory_T = self.parameter("refractory_T", None, required=True) / ng.network.dt
+        self.refractory_T = to_lanes(ng, self.parameter("refractory_T", None, required=True)) / ng.network.dt
 
         if not hasattr(ng, 'last_spike'):
-            ng.last_spike = ng.vector(-self.refractory_T - 1)
+            ng.last_spike = ng.vector() - self.refractory_T - 1
 
     def forward(self, ng):
         ng.I = ng.I * (ng.last_spike < ng.network.iteration - self.refractory_T).byte()
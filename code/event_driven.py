@@ -0,0 +1,165 @@
+import math
+
+import torch
+from pymonntorch import *
+
+from currents import ConstantCurrent, StepCurrent
+from models import LIF
+
+
+def exact_behaviors(ng):
+    """
+    Find the (current, model, event recorders) of a group that can be solved in closed form:
+    LIF driven by a noiseless ConstantCurrent or StepCurrent. Groups with a Recorder are time
+    stepped, as it samples the state of every step.
+    :param ng: neuron group
+    :return: tuple or None if the group has to be time stepped
+    """
+    # Synaptic input is not piecewise constant, and synapses read the spikes of every step
+    if ng.afferent_synapses.get("All") or ng.efferent_synapses.get("All"):
+        return None
+    current, model, events = None, None, []
+    for behavior in ng.behavior.values():
+        if isinstance(behavior, EventRecorder):
+            if list(behavior.variables) != ['spike']:
+                return None
+            events.append(behavior)
+        elif type(behavior) in (ConstantCurrent, StepCurrent) and current is None:
+            current = behavior
+        elif type(behavior) is LIF and model is None:
+            model = behavior
+        else:
+            return None
+    if current is None or model is None or model.packed or torch.any(torch.as_tensor(current.noise_range) != 0):
+        return None
+    return current, model, events
+
+
+def lanes(value, ng):
+    return torch.as_tensor(value, dtype=torch.float64, device=ng.device).expand(ng.size).clone()
+
+
+def input_edges(current, ng):
+    """
+    Times at which the input of a StepCurrent switches, as a [N, k] tensor
+    """
+    if type(current) is ConstantCurrent:
+        return torch.empty((ng.size, 0), dtype=torch.float64, device=ng.device)
+    edges = [lanes(current.t_start, ng)]
+    if current.t_end is not None:
+        edges.append(lanes(current.t_end, ng))
+    return torch.stack(edges, dim=1)
+
+
+def input_at(current, ng, t):
+    """
+    Input current of every lane on the segment that starts at time t
+    """
+    value = lanes(current.value, ng)
+    if type(current) is ConstantCurrent:
+        return value
+    on = t >= lanes(current.t_start, ng)
+    if current.t_end is not None:
+        on &= t < lanes(current.t_end, ng)
+    return value * on
+
+
+def solve_lif(ng, current, model, t0, t1):
+    """
+    Jump from event to event (spike, input edge, refractory end) for every neuron of a LIF group
+    :param ng: initialized neuron group
+    :param current: ConstantCurrent or StepCurrent behavior of the group
+    :param model: LIF behavior of the group
+    :param t0: start time
+    :param t1: end time
+    :return: (spike times, neuron ids) sorted by time, with the group state advanced to t1
+    """
+    dt = ng.network.dt
+    R, tau = lanes(model.R, ng), lanes(model.tau, ng)
+    u_rest, u_reset = lanes(model.u_rest, ng), lanes(model.u_reset, ng)
+    threshold = lanes(model.threshold, ng)
+    refractory = lanes(model.refractory_T, ng) * dt
+
+    t = torch.full((ng.size,), float(t0), dtype=torch.float64, device=ng.device)
+    u = ng.u.to(torch.float64)
+    # Input is gated off until this time, see LIF.forward
+    ref_until = ng.last_spike.to(torch.float64) * dt + refractory
+    edges = input_edges(current, ng)
+    times, ids = [], []
+
+    running = t < t1
+    while running.any():
+        active = t >= ref_until
+        u_inf = u_rest + R * input_at(current, ng, t) * active
+
+        # Next event that changes the input
+        pending = torch.cat([edges, ref_until.unsqueeze(1)], dim=1)
+        pending = torch.where(pending > t.unsqueeze(1), pending, math.inf)
+        next_edge = torch.clamp(pending.min(dim=1).values, max=t1)
+
+        # Closed-form time to threshold under constant input
+        crossing = torch.full_like(t, math.inf)
+        reaches = u_inf > threshold
+        crossing[reaches] = t[reaches] + tau[reaches] * torch.log(
+            (u_inf[reaches] - u[reaches]) / (u_inf[reaches] - threshold[reaches])).clamp(min=0)
+
+        spike = running & (crossing <= next_edge)
+        t_next = torch.where(spike, crossing, next_edge)
+        u = torch.where(running, u_inf + (u - u_inf) * torch.exp(-(t_next - t) / tau), u)
+        t = torch.where(running, t_next, t)
+
+        if spike.any():
+            times.append(t[spike])
+            ids.append(torch.nonzero(spike).flatten())
+            u[spike] = u_reset[spike]
+            ref_until[spike] = t[spike] + refractory[spike]
+        running = t < t1
+
+    times = torch.cat(times) if times else torch.empty(0, dtype=torch.float64, device=ng.device)
+    ids = torch.cat(ids) if ids else torch.empty(0, dtype=torch.long, device=ng.device)
+    order = torch.argsort(times, stable=True)
+    times, ids = times[order], ids[order]
+
+    # Sync the state back to the group
+    iterations = torch.ceil(times / dt - 1e-9).long()
+    ng.u = u.to(ng.def_dtype)
+    ng.last_spike.scatter_reduce_(0, ids, iterations.to(ng.last_spike.dtype), reduce='amax')
+    ng.spike = ng.vector(dtype=torch.bool)
+    ng.spike[ids[iterations == round(t1 / dt)]] = True
+    return times, ids
+
+
+def simulate_event_driven(net, iterations):
+    """
+    Simulate groups that have a closed-form solution event by event and time step the rest
+    :param net: initialized network
+    :param iterations: number of iterations
+    :return: list of the groups that were solved exactly
+    """
+    t0 = net.iteration * net.dt
+    t1 = (net.iteration + iterations) * net.dt
+    solved = []
+    for ng in net.NeuronGroups:
+        behaviors = exact_behaviors(ng)
+        if behaviors is None:
+            continue
+        current, model, events = behaviors
+        times, ids = solve_lif(ng, current, model, t0, t1)
+        # Same (iteration, neuron) layout as EventRecorder
+        spikes = torch.stack([torch.ceil(times / net.dt - 1e-9).long(), ids], dim=1)
+        for recorder in events:
+            recorder.variables['spike'] = torch.cat([recorder.variables['spike'], spikes])
+        ng.spike_times = times
+        solved.append(ng)
+
+    # Step everything else; solved groups only keep the clock company
+    behaviors = [b for ng in solved for b in ng.behavior.values() if b.behavior_enabled]
+    for behavior in behaviors:
+        behavior.behavior_enabled = False
+    net.simulate_iterations(iterations=iterations, measure_block_time=False)
+    for behavior in behaviors:
+        behavior.behavior_enabled = True
+    # The state of a solved group is that of its last iteration, input included
+    for ng in solved:
+        exact_behaviors(ng)[0].forward(ng)
+    return solved
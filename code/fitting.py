@@ -0,0 +1,419 @@
+"""
+Fit model parameters to target spike trains by evaluating whole candidate populations in one
+batched simulation: every candidate is a lane with its own parameters, one neuron group per protocol.
+
+    fitter = Fitter(AELIF, fixed=dict(R=1.7, tau_m=10, threshold=-30, u_rest=-65, u_reset=-70),
+                    bounds={"a": (0, 10), "b": (0, 2), "tau_w": (20, 300), "delta_T": (0.5, 3),
+                            "rh_threshold": (-60, -40)},
+                    protocols=[(ConstantCurrent(value=80), target_times)], duration=500)
+    result = fitter.run(CMAES(dim=5, population=32, seed=0), generations=60)
+
+Candidates are scored by the van Rossum distance to the targets, accumulated online. It only grows
+over time, so a candidate whose running distance exceeds the optimizer's cutoff (the parent for
+differential evolution, the last generation's mu-th best for CMA-ES) is stopped, and the batch is
+shrunk to the surviving lanes once half of them are stopped.
+"""
+import math
+import time
+
+import numpy as np
+import torch
+from pymonntorch import *
+
+from block import simulate_blocks
+from rng import neuron_ids
+from snapshot import checkpoint
+from spikes import SpikeRecorder
+from time_res import TimeResolution
+
+
+def van_rossum(trains, target, tau):
+    """
+    Van Rossum distance between spike trains and a target, for exponential kernels of time constant tau:
+    D^2 = 1/tau * integral (f - g)^2 dt = 1/2 sum_ij k(x_i - x_j) with k(t) = exp(-|t| / tau), over the
+    spikes of both trains with signs +1 and -1
+    :param trains: list of arrays of spike times, one per lane
+    :param target: array of target spike times
+    :return: numpy array of distances, one per lane
+    """
+    target = torch.as_tensor(np.asarray(target, dtype=np.float64))
+    length = max([len(t) for t in trains] + [0]) + len(target)
+    times = torch.zeros((len(trains), length), dtype=torch.float64)
+    signs = torch.zeros((len(trains), length), dtype=torch.float64)
+    for lane, train in enumerate(trains):
+        n = len(train)
+        times[lane, :n] = torch.as_tensor(np.asarray(train, dtype=np.float64))
+        signs[lane, :n] = 1
+        times[lane, n:n + len(target)] = target
+        signs[lane, n:n + len(target)] = -1
+    kernel = torch.exp(-(times[:, :, None] - times[:, None, :]).abs() / tau)
+    squared = 0.5 * torch.einsum("li,lij,lj->l", signs, kernel, signs)
+    return squared.clamp(min=0).sqrt().numpy()
+
+
+def coincidence_factor(trains, target, delta, duration):
+    """
+    Coincidence factor of Kistler et al. (1997): the number of target spikes with a model spike within
+    +-delta, corrected for the coincidences expected by chance from a Poisson train with the model's
+    rate and normalized to 1 for identical trains (0 for chance level)
+    :param trains: list of arrays of spike times, one per lane
+    :param target: array of target spike times
+    :return: numpy array, one factor per lane
+    """
+    target = np.sort(np.asarray(target, dtype=np.float64))
+    factors = np.zeros(len(trains))
+    for lane, train in enumerate(trains):
+        train = np.sort(np.asarray(train, dtype=np.float64))
+        if len(train):
+            # A target spike coincides when the nearest model spike is within delta
+            i = np.clip(np.searchsorted(train, target), 1, len(train)) if len(target) else np.array([], int)
+            nearest = np.minimum(np.abs(train[i - 1] - target), np.abs(train[np.minimum(i, len(train) - 1)] - target))
+            coincidences = np.count_nonzero(nearest <= delta)
+        else:
+            coincidences = 0
+        rate = len(train) / duration
+        expected = 2 * rate * delta * len(target)
+        norm = 0.5 * (len(target) + len(train)) * (1 - 2 * rate * delta)
+        factors[lane] = (coincidences - expected) / norm if norm > 0 else 0.0
+    return factors
+
+
+class VanRossum(Behavior):
+    """
+    Running van Rossum distance of every lane to a target spike train: the spikes of the lane and
+    of the target are filtered with exp(-t / tau) and the squared difference of the traces is
+    integrated (`self.squared`). Target spikes are binned to the step that contains them.
+
+    Args:
+        target (array): target spike times
+        tau (float): time constant of the kernel. The default is 5.
+        variable (str): spike attribute of the group. The default is "spike".
+    """
+
+    def initialize(self, ng):
+        super().initialize(ng)
+        target = np.asarray(self.parameter("target", None, required=True), dtype=np.float64)
+        self.tau = self.parameter("tau", 5.0)
+        self.variable = self.parameter("variable", "spike")
+        bins = np.ceil(target / ng.network.dt - 1e-9).astype(np.int64)
+        self.target = np.bincount(bins, minlength=1).astype(np.float64)
+        self.decay = math.exp(-ng.network.dt / self.tau)
+        self.trace = torch.zeros(ng.size, dtype=torch.float64, device=ng.device)
+        self.target_trace = 0.0
+        self.squared = torch.zeros(ng.size, dtype=torch.float64, device=ng.device)
+
+    def forward(self, ng):
+        spikes = getattr(ng, self.variable)
+        iteration = ng.network.iteration
+        arrived = self.target[iteration] if iteration < len(self.target) else 0.0
+        self.target_trace = self.target_trace * self.decay + float(arrived)
+        self.trace.mul_(self.decay).add_(spikes)
+        self.squared.add_((self.trace - self.target_trace).square_(), alpha=ng.network.dt / self.tau)
+
+
+class CMAES:
+    """
+    CMA-ES (Hansen, 2016) on the unit cube, with ask/tell. Samples are clipped to the cube for
+    evaluation but the update uses the unclipped steps.
+
+    Args:
+        dim (int): number of parameters
+        population (int): candidates per generation. The default is 4 + 3 ln(dim).
+        sigma (float): initial step size. The default is 0.3.
+        mean (array): initial mean. The default is the center of the cube.
+        seed (int): seed of the sampler
+    """
+
+    def __init__(self, dim, population=None, sigma=0.3, mean=None, seed=None):
+        self.rng = np.random.default_rng(seed)
+        n = self.dim = dim
+        self.population = population or 4 + int(3 * math.log(n))
+        self.mu = self.population // 2
+        weights = math.log(self.mu + 0.5) - np.log(np.arange(1, self.mu + 1))
+        self.weights = weights / weights.sum()
+        self.mueff = 1 / np.sum(self.weights ** 2)
+        self.cc = (4 + self.mueff / n) / (n + 4 + 2 * self.mueff / n)
+        self.cs = (self.mueff + 2) / (n + self.mueff + 5)
+        self.c1 = 2 / ((n + 1.3) ** 2 + self.mueff)
+        self.cmu = min(1 - self.c1, 2 * (self.mueff - 2 + 1 / self.mueff) / ((n + 2) ** 2 + self.mueff))
+        self.damps = 1 + 2 * max(0, math.sqrt((self.mueff - 1) / (n + 1)) - 1) + self.cs
+        self.chi = math.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n ** 2))
+        self.mean = np.full(n, 0.5) if mean is None else np.asarray(mean, dtype=np.float64)
+        self.sigma = sigma
+        self.C = np.eye(n)
+        self.pc = np.zeros(n)
+        self.ps = np.zeros(n)
+        self.generation = 0
+        self.threshold = np.inf
+
+    def ask(self):
+        eigenvalues, self.B = np.linalg.eigh(self.C)
+        self.D = np.sqrt(np.maximum(eigenvalues, 1e-20))
+        self.steps = self.rng.standard_normal((self.population, self.dim)) @ (self.B * self.D).T
+        return np.clip(self.mean + self.sigma * self.steps, 0, 1)
+
+    def cutoff(self):
+        return np.full(self.population, self.threshold)
+
+    def tell(self, fitness, stopped):
+        # Stopped candidates rank behind every completed one
+        order = np.lexsort((fitness, stopped))
+        selected = self.steps[order[:self.mu]]
+        step = self.weights @ selected
+        self.mean = self.mean + self.sigma * step
+
+        inverse_sqrt = self.B @ np.diag(1 / self.D) @ self.B.T
+        self.ps = (1 - self.cs) * self.ps + math.sqrt(self.cs * (2 - self.cs) * self.mueff) * inverse_sqrt @ step
+        self.generation += 1
+        norm = np.linalg.norm(self.ps) / math.sqrt(1 - (1 - self.cs) ** (2 * self.generation))
+        hsig = norm / self.chi < 1.4 + 2 / (self.dim + 1)
+        self.pc = (1 - self.cc) * self.pc + hsig * math.sqrt(self.cc * (2 - self.cc) * self.mueff) * step
+        rank_mu = (selected * self.weights[:, None]).T @ selected
+        self.C = ((1 - self.c1 - self.cmu) * self.C
+                  + self.c1 * (np.outer(self.pc, self.pc) + (1 - hsig) * self.cc * (2 - self.cc) * self.C)
+                  + self.cmu * rank_mu)
+        self.sigma *= math.exp(self.cs / self.damps * (np.linalg.norm(self.ps) / self.chi - 1))
+        completed = np.sort(fitness[~stopped])
+        self.threshold = completed[self.mu - 1] if len(completed) >= self.mu else np.inf
+
+
+class DifferentialEvolution:
+    """
+    DE/rand/1/bin on the unit cube, with ask/tell; a trial replaces its parent when it is not worse
+
+    Args:
+        dim (int): number of parameters
+        population (int): number of candidates. The default is 10 * dim.
+        F (float): differential weight. The default is 0.8.
+        CR (float): crossover probability. The default is 0.9.
+        seed (int): seed of the sampler
+    """
+
+    def __init__(self, dim, population=None, F=0.8, CR=0.9, seed=None):
+        self.rng = np.random.default_rng(seed)
+        self.dim = dim
+        self.population = population or 10 * dim
+        self.F = F
+        self.CR = CR
+        self.members = self.rng.random((self.population, dim))
+        self.fitness = np.full(self.population, np.inf)
+        self.trials = None
+
+    def ask(self):
+        if self.trials is None and np.all(np.isinf(self.fitness)):
+            self.trials = self.members
+            return self.trials
+        P = self.population
+        # Three distinct partners per member, all different from the member itself
+        choices = np.argsort(self.rng.random((P, P - 1)), axis=1)[:, :3]
+        partners = choices + (choices >= np.arange(P)[:, None])
+        a, b, c = (self.members[partners[:, k]] for k in range(3))
+        mutant = np.clip(a + self.F * (b - c), 0, 1)
+        cross = self.rng.random((P, self.dim)) < self.CR
+        cross[np.arange(P), self.rng.integers(self.dim, size=P)] = True
+        self.trials = np.where(cross, mutant, self.members)
+        return self.trials
+
+    def cutoff(self):
+        return self.fitness.copy()
+
+    def tell(self, fitness, stopped):
+        better = ~stopped & (fitness <= self.fitness)
+        self.members[better] = self.trials[better]
+        self.fitness[better] = fitness[better]
+
+
+class Fitter:
+    """
+    Batched evaluation of parameter sets of a model against target spike trains.
+
+    Args:
+        model: model behavior class, e.g. models.AELIF
+        fixed (dict): parameters that are not fitted; ratio defaults to 0 (every lane starts at u_reset)
+        bounds (dict): fitted parameter -> (low, high); optimizers work on the unit cube mapped onto it
+        protocols (list): (current behavior, target spike times) pairs; the current is copied per run
+        duration (float): length of every protocol in units of time
+        dt (float): time step. The default is 0.1.
+        tau (float): time constant of the van Rossum kernel. The default is 5.
+        delta (float): coincidence window of the coincidence factor. The default is 2.
+        segments (int): number of early-stopping checks per run. The default is 10.
+        extrapolate (bool): stop a candidate once its running distance, extrapolated linearly to the
+            whole run, exceeds the cutoff. Stops far more candidates, but no longer only hopeless ones.
+            The default is False.
+    """
+
+    def __init__(self, model, fixed, bounds, protocols, duration, dt=0.1, tau=5.0, delta=2.0, segments=10,
+                 extrapolate=False):
+        self.model = model
+        self.fixed = {"ratio": 0, **fixed}
+        self.names = list(bounds)
+        self.low = np.array([bounds[name][0] for name in self.names], dtype=np.float64)
+        self.high = np.array([bounds[name][1] for name in self.names], dtype=np.float64)
+        self.protocols = protocols
+        self.duration = duration
+        self.dt = dt
+        self.tau = tau
+        self.delta = delta
+        self.segments = segments
+        self.extrapolate = extrapolate
+        self.lane_steps = 0
+        # Seeds of the protocol currents, drawn by the first build and reused by every later one
+        self.seeds = [None] * len(protocols)
+
+    def parameters(self, unit):
+        """
+        Map points of the unit cube, shape (candidates, dim), to parameter dicts of per-lane tensors
+        """
+        values = self.low + np.asarray(unit) * (self.high - self.low)
+        return {name: torch.as_tensor(values[:, i], dtype=torch.float32) for i, name in enumerate(self.names)}
+
+    def build(self, unit, record=False, ids=None):
+        """
+        Network of the candidates, one group per protocol, with the same input for every build
+        :param ids: neuron id of every lane, which keys its noise stream (see rng.py). The default is the lane index.
+        """
+        params = self.parameters(unit)
+        net = Network(behavior={1: TimeResolution(dt=self.dt)})
+        for i, (current, target) in enumerate(self.protocols):
+            kwargs = dict(current.init_kwargs)
+            if self.seeds[i] is not None:
+                kwargs["seed"] = self.seeds[i]
+            behavior = {
+                2: type(current)(**kwargs),
+                3: self.model(**self.fixed, **params),
+                6: VanRossum(target=target, tau=self.tau),
+            }
+            if record:
+                behavior[5] = SpikeRecorder()
+            ng = NeuronGroup(net=net, tag=f"protocol{i}", size=len(unit), behavior=behavior)
+            if ids is not None:
+                ng.global_ids = torch.as_tensor(ids, dtype=torch.int64)
+        net.initialize(info=False)
+        self.seeds = [getattr(ng.behavior[2], "seed", None) for ng in net.NeuronGroups]
+        return net
+
+    def shrink(self, net, unit, lanes):
+        """
+        Continue the given lanes of a running network in a new, smaller one. The lanes keep their neuron ids,
+        so they are served the same noise as before.
+        """
+        state = checkpoint(net)
+        smaller = self.build(unit[lanes], ids=neuron_ids(net.NeuronGroups[0])[lanes])
+        smaller.iteration = net.iteration
+        smaller.passed = net.passed
+        lanes = torch.as_tensor(lanes)
+        for old, new in zip(net.NeuronGroups, smaller.NeuronGroups):
+            for name, value in state["groups"][old.tag]["tensors"].items():
+                if name != "id" and value.dim() and value.shape[0] == old.size:
+                    setattr(new, name, value[lanes].clone())
+            distance, fresh = old.behavior[6], new.behavior[6]
+            fresh.trace, fresh.squared = distance.trace[lanes].clone(), distance.squared[lanes].clone()
+            fresh.target_trace = distance.target_trace
+        return smaller
+
+    def evaluate(self, unit, cutoff=None):
+        """
+        Van Rossum distance of every candidate, summed in quadrature over the protocols
+        :param unit: candidates on the unit cube, shape (candidates, dim)
+        :param cutoff: per-candidate distances beyond which a candidate is stopped
+        :return: (distances, stopped); the distance of a stopped candidate is a lower bound
+        """
+        unit = np.asarray(unit, dtype=np.float64)
+        cutoff = np.full(len(unit), np.inf) if cutoff is None else np.asarray(cutoff)
+        distances = np.zeros(len(unit))
+        stopped = np.zeros(len(unit), dtype=bool)
+        lanes = np.arange(len(unit))
+        net = self.build(unit)
+        steps = int(round(self.duration / self.dt))
+        boundaries = np.linspace(0, steps, self.segments + 1).round().astype(int)
+        for start, end in zip(boundaries[:-1], boundaries[1:]):
+            simulate_blocks(net, end - start, end - start)
+            self.lane_steps += (end - start) * len(lanes) * len(self.protocols)
+            distance = sum(ng.behavior[6].squared for ng in net.NeuronGroups).sqrt().numpy()
+            distances[lanes] = distance
+            if self.extrapolate:
+                hopeless = distance * math.sqrt(steps / end) > cutoff[lanes]
+            else:
+                hopeless = distance > cutoff[lanes]
+            if end == steps or not hopeless.any():
+                continue
+            stopped[lanes[hopeless]] = True
+            if hopeless.all():
+                break
+            if 2 * hopeless.sum() >= len(lanes):
+                net = self.shrink(net, unit, np.flatnonzero(~hopeless))
+                lanes = lanes[~hopeless]
+            else:
+                # The hopeless lanes keep stepping until the next shrink, marked as stopped
+                cutoff = cutoff.copy()
+                cutoff[lanes[hopeless]] = -np.inf
+        return distances, stopped
+
+    def score(self, unit):
+        """
+        Spike trains, van Rossum distances and coincidence factors of candidates, per protocol
+        :return: dict of lists with one entry per protocol
+        """
+        net = self.build(np.atleast_2d(unit), record=True)
+        net.simulate_iterations(int(round(self.duration / self.dt)), measure_block_time=False)
+        result = {"trains": [], "van_rossum": [], "coincidence": []}
+        for ng, (_, target) in zip(net.NeuronGroups, self.protocols):
+            store = ng.behavior[5].store
+            trains = [np.asarray(store.train(i), dtype=np.float64) * self.dt for i in range(ng.size)]
+            result["trains"].append(trains)
+            result["van_rossum"].append(van_rossum(trains, target, self.tau))
+            result["coincidence"].append(coincidence_factor(trains, target, self.delta, self.duration))
+        return result
+
+    def run(self, optimizer, generations=50, info=True):
+        """
+        Optimize with an ask/tell optimizer (CMAES or DifferentialEvolution)
+        :return: dict with the best parameters, their distance and coincidence factors, the best
+                 distance per generation and the number of simulated lane-steps
+        """
+        best, best_distance, history = None, np.inf, []
+        start = time.time()
+        for generation in range(generations):
+            unit = optimizer.ask()
+            distances, stopped = self.evaluate(unit, optimizer.cutoff())
+            optimizer.tell(distances, stopped)
+            completed = np.flatnonzero(~stopped)
+            if len(completed) and distances[completed].min() < best_distance:
+                best = unit[completed[np.argmin(distances[completed])]].copy()
+                best_distance = distances[completed].min()
+            history.append(best_distance)
+            if info:
+                print(f"generation {generation}: best {best_distance:.4f}, "
+                      f"stopped {stopped.sum()}/{len(unit)}, {time.time() - start:.1f} s")
+        if best is None:
+            raise RuntimeError("No candidate completed a run, so there is no best one to return.")
+        params = {name: float(value) for name, value in zip(self.names, self.low + best * (self.high - self.low))}
+        scores = self.score(best)
+        return {
+            "params": params,
+            "distance": best_distance,
+            "coincidence": [float(c[0]) for c in scores["coincidence"]],
+            "history": history,
+            "lane_steps": self.lane_steps,
+            "time": time.time() - start,
+        }
+
+
+if __name__ == "__main__":
+    # Recover the adaptation parameters of an AELIF from its own spike trains
+    from currents import ConstantCurrent, StepCurrent
+    from models import AELIF
+
+    fixed = dict(R=1.7, tau_m=10, threshold=-30, u_rest=-65, u_reset=-70)
+    bounds = {"a": (0, 6), "b": (0, 2), "tau_w": (30, 300), "delta_T": (0.5, 3), "rh_threshold": (-58, -42)}
+    truth = np.array([[2.0, 0.8, 120.0, 1.5, -50.0]])
+    currents = [ConstantCurrent(value=30), StepCurrent(value=50, t_start=200, t_end=600)]
+
+    reference = Fitter(AELIF, fixed, bounds, [(current, []) for current in currents], duration=800)
+    unit = (truth - reference.low) / (reference.high - reference.low)
+    targets = [trains[0] for trains in reference.score(unit)["trains"]]
+
+    fitter = Fitter(AELIF, fixed, bounds, list(zip(currents, targets)), duration=800)
+    result = fitter.run(CMAES(dim=len(bounds), population=24, seed=0), generations=40)
+    print({name: round(value, 3) for name, value in result["params"].items()})
+    print(f"distance {result['distance']:.3f}, coincidence {result['coincidence']}, {result['time']:.0f} s")
@@ -0,0 +1,72 @@
+"""
+Accuracy vs cost of the ELIF/AELIF integrators against a fine-dt forward Euler reference.
+The spike-triggered jump of AELIF's w is b * dt in this model, i.e. it depends on dt by
+construction, so the AELIF comparison runs with b=0 and only checks subthreshold adaptation.
+
+    python integrator_benchmark.py
+"""
+import time
+
+import torch
+from pymonntorch import *
+
+from currents import ConstantCurrent
+from models import ELIF, AELIF
+from time_res import TimeResolution
+
+DURATION = 100
+CURRENTS = torch.linspace(14, 40, 8)
+MODELS = {
+    "ELIF": (ELIF, dict(R=1.7, tau=10, threshold=-13, rh_threshold=-42, u_rest=-65, u_reset=-73, delta_T=0.1)),
+    "AELIF": (AELIF, dict(a=6.7, b=0, R=1.7, tau_m=10, tau_w=100, threshold=-30, rh_threshold=-50,
+                          u_rest=-65, u_reset=-70, delta_T=1)),
+}
+CONFIGS = [
+    ("euler", False, 0.5), ("euler", False, 0.1),
+    ("exp_euler", False, 0.5), ("rk2", False, 0.5), ("rk4", False, 0.5),
+    ("rk2", True, 0.5), ("rk2", True, 1.0), ("exp_euler", True, 1.0),
+]
+
+
+def spike_times(model, params, dt, **kwargs):
+    """
+    Run one lane per input current and return the spike times of every lane and the wall time
+    """
+    net = Network(behavior={1: TimeResolution(dt=dt)})
+    ng = NeuronGroup(net=net, size=len(CURRENTS), behavior={
+        2: ConstantCurrent(value=CURRENTS),
+        3: model(**params, ratio=0, **kwargs),
+    })
+    net.initialize(info=False)
+    times = [[] for _ in CURRENTS]
+    start = time.time()
+    for _ in range(int(DURATION / dt)):
+        net.simulate_iteration()
+        if ng.spike.any():
+            offset = getattr(ng, "spike_offset", torch.ones(ng.size))
+            for i in torch.nonzero(ng.spike).flatten().tolist():
+                times[i].append((net.iteration - 1 + float(offset[i])) * dt)
+    return times, time.time() - start
+
+
+def spike_time_error(times, reference):
+    """
+    Mean absolute difference of matched spike times and the number of missing/extra spikes
+    """
+    errors, missing = [], 0
+    for lane, ref in zip(times, reference):
+        n = min(len(lane), len(ref))
+        errors += [abs(a - b) for a, b in zip(lane[:n], ref[:n])]
+        missing += abs(len(lane) - len(ref))
+    return (sum(errors) / len(errors) if errors else float("nan")), missing
+
+
+if __name__ == "__main__":
+    for name, (model, params) in MODELS.items():
+        reference, ref_cost = spike_times(model, params, 0.001)
+        print(f"{name}: reference euler dt=0.001 ({ref_cost:.1f}s)")
+        print(f"{'integrator':>10} {'adaptive':>8} {'dt':>5} {'time [s]':>9} {'mean |dt_spike|':>16} {'missing':>8}")
+        for integrator, adaptive, dt in CONFIGS:
+            times, cost = spike_times(model, params, dt, integrator=integrator, adaptive=adaptive)
+            error, missing = spike_time_error(times, reference)
+            print(f"{integrator:>10} {str(adaptive):>8} {dt:>5} {cost:>9.3f} {error:>16.4f} {missing:>8}")
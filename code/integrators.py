@@ -0,0 +1,183 @@
+import torch
+
+from utils import at_lanes
+
+
+def euler(rhs, y, h, jacobian=None):
+    return [yi + h * ki for yi, ki in zip(y, rhs(y))]
+
+
+def exp_euler(rhs, y, h, jacobian=None):
+    """
+    Exponential (Rosenbrock) Euler: y + (exp(J h) - 1) / J * f(y) with the diagonal Jacobian J,
+    which stays stable on the stiff exponential term of ELIF/AELIF
+    """
+    result = []
+    for yi, ki, ji in zip(y, rhs(y), jacobian(y)):
+        z = ji * h
+        phi = torch.where(z.abs() < 1e-6, torch.ones_like(z), torch.expm1(z) / z)
+        result.append(yi + h * phi * ki)
+    return result
+
+
+def rk2(rhs, y, h, jacobian=None):
+    # Heun's method
+    k1 = rhs(y)
+    k2 = rhs([yi + h * ki for yi, ki in zip(y, k1)])
+    return [yi + h / 2 * (a + b) for yi, a, b in zip(y, k1, k2)]
+
+
+def rk4(rhs, y, h, jacobian=None):
+    k1 = rhs(y)
+    k2 = rhs([yi + h / 2 * ki for yi, ki in zip(y, k1)])
+    k3 = rhs([yi + h / 2 * ki for yi, ki in zip(y, k2)])
+    k4 = rhs([yi + h * ki for yi, ki in zip(y, k3)])
+    return [yi + h / 6 * (a + 2 * b + 2 * c + d) for yi, a, b, c, d in zip(y, k1, k2, k3, k4)]
+
+
+INTEGRATORS = {"euler": (euler, 1), "exp_euler": (exp_euler, 1), "rk2": (rk2, 2), "rk4": (rk4, 4)}
+
+
+def crossed_threshold(u, threshold):
+    """
+    A step that runs away on the exponential term (inf/nan) has crossed the threshold as well
+    """
+    return (u > threshold) | ~torch.isfinite(u)
+
+
+def crossing_fraction(before, after, threshold):
+    """
+    Linearly interpolated fraction of a step at which u crossed the threshold
+    """
+    fraction = (threshold - before) / (after - before)
+    return torch.nan_to_num(fraction, nan=1.0, posinf=1.0, neginf=0.0).clamp(0, 1)
+
+
+def at_crossing(before, after, crossed, fraction):
+    """
+    State interpolated to the threshold crossing of the crossed neurons; components that ran
+    away during the step keep their value from the start of the step
+    """
+    result = []
+    for a, b in zip(before, after):
+        interpolated = torch.where(torch.isfinite(b), a + fraction * (b - a), a)
+        result.append(torch.where(crossed, interpolated, b))
+    return result
+
+
+def locate_crossing(y, rhs, h, threshold, step, fraction, jacobian=None, iterations=4):
+    """
+    Fraction of a step of size h at which the integrated u reaches the threshold: safeguarded Newton
+    iterations on step(y, fraction * h)[0] - threshold, whose derivative is h * du/dt at the sub-step.
+    Iterates leaving the bracket of the root (or running away to inf/nan) are replaced by bisection.
+    :param fraction: initial guess, e.g. the linear crossing_fraction of the full step
+    :return: (fraction, state at the crossing)
+    """
+    low, high = torch.zeros_like(fraction), torch.ones_like(fraction)
+    for _ in range(iterations):
+        y_sub = step(rhs, y, fraction * h, jacobian)
+        gap = y_sub[0] - threshold
+        above = crossed_threshold(y_sub[0], threshold)
+        low, high = torch.where(above, low, fraction), torch.where(above, fraction, high)
+        newton = fraction - gap / (rhs(y_sub)[0] * h)
+        inside = torch.isfinite(newton) & (newton >= low) & (newton <= high)
+        fraction = torch.where(inside, newton, (low + high) / 2)
+    y_sub = step(rhs, y, fraction * h, jacobian)
+    diverged = ~torch.stack([torch.isfinite(yi) for yi in y_sub]).all(dim=0)
+    if diverged.any():
+        fraction = torch.where(diverged, low, fraction)
+        y_sub = step(rhs, y, fraction * h, jacobian)
+    return fraction, y_sub
+
+
+def precise_step(y, rhs, dt, threshold, step, jacobian, system, iterations=4):
+    """
+    One fixed step that locates threshold crossings inside the step, resets the crossed neurons there and
+    restarts their integration for the rest of the step. Only the crossed neurons are integrated again.
+    :param system: function (index, after_spike) -> (rhs, jacobian, on_spike) of the neurons at index,
+                   after_spike selecting the input of the rest of the step
+    :return: (y, spike mask, spike offset as a fraction of dt)
+    """
+    y_new = step(rhs, y, dt, jacobian)
+    spike = crossed_threshold(y_new[0], threshold)
+    offset = torch.zeros_like(y[0])
+    index = spike.nonzero().flatten()
+    if not len(index):
+        return y_new, spike, offset
+
+    y_start = [yi[index] for yi in y]
+    threshold = at_lanes(threshold, index)
+    rhs, jacobian, _ = system(index, False)
+    guess = crossing_fraction(y_start[0], y_new[0][index], threshold)
+    fraction, y_cross = locate_crossing(y_start, rhs, dt, threshold, step, guess, jacobian, iterations)
+
+    rhs, jacobian, on_spike = system(index, True)
+    y_cross = on_spike(y_cross, torch.ones_like(spike[index]))
+    y_end = step(rhs, y_cross, (1 - fraction) * dt, jacobian)
+    for yi, end in zip(y_new, y_end):
+        yi[index] = end
+    offset[index] = fraction
+    return y_new, spike, offset
+
+
+def advance(y, rhs, dt, threshold, on_spike, method="rk2", jacobian=None,
+            adaptive=False, tolerance=1e-3, h=None, system=None):
+    """
+    Advance the state of a group by one step of the network clock
+    :param y: list of state tensors, membrane potential first
+    :param rhs: function mapping the state list to the list of its time derivatives
+    :param dt: step of the network clock
+    :param threshold: firing threshold
+    :param on_spike: function (y, mask) -> y applying reset (and adaptation jump) to the masked neurons
+    :param method: one of INTEGRATORS
+    :param jacobian: function returning the diagonal of the Jacobian, used by exp_euler and the step-size controller
+    :param adaptive: split the step into per-neuron substeps chosen by a step-doubling error estimate
+    :param tolerance: absolute error allowed per substep in adaptive mode
+    :param h: per-neuron substep size proposed by the previous call in adaptive mode
+    :param system: for fixed steps, locate threshold crossings inside the step and restart from them
+                   (see precise_step)
+    :return: (y, spike mask, spike offset as a fraction of dt, proposed substep size)
+    """
+    step, order = INTEGRATORS[method]
+    if system is not None and not adaptive:
+        return (*precise_step(y, rhs, dt, threshold, step, jacobian, system), h)
+    if not adaptive:
+        y_new = step(rhs, y, dt, jacobian)
+        spike = crossed_threshold(y_new[0], threshold)
+        offset = crossing_fraction(y[0], y_new[0], threshold)
+        y_new = at_crossing(y, y_new, spike, offset)
+        return on_spike(y_new, spike), spike, offset * spike, h
+
+    remaining = torch.full_like(y[0], dt)
+    h = torch.full_like(y[0], dt) if h is None else h.clone()
+    h_min = dt * 1e-4
+    spike = torch.zeros_like(y[0], dtype=torch.bool)
+    offset = torch.zeros_like(y[0])
+    running = remaining > 0
+    while running.any():
+        h = torch.minimum(h, remaining)
+        full = step(rhs, y, h, jacobian)
+        half = step(rhs, step(rhs, y, h / 2, jacobian), h / 2, jacobian)
+        error = torch.stack([(a - b).abs() for a, b in zip(full, half)]).amax(dim=0)
+        error = torch.nan_to_num(error, nan=float("inf"))
+        # The step-doubling estimate misses the onset of the exponential runaway, so also
+        # require the step to stay resolvable (|J| h <= 1) at its end point
+        stiffness = torch.nan_to_num(torch.stack([j.abs() for j in jacobian(half)]).amax(dim=0) * h, nan=float("inf"))
+        accept = running & (((error <= tolerance) & (stiffness <= 1)) | (h <= h_min))
+        y_new = [torch.where(accept, b, a) for a, b in zip(y, half)]
+
+        # Restart integration from the interpolated threshold crossing
+        crossed = accept & crossed_threshold(y_new[0], threshold)
+        fraction = crossing_fraction(y[0], y_new[0], threshold)
+        offset = torch.where(crossed, (dt - remaining + fraction * h) / dt, offset)
+        spike |= crossed
+        y_new = at_crossing(y, y_new, crossed, fraction)
+        y = on_spike(y_new, crossed)
+        remaining = torch.where(crossed, remaining - fraction * h, torch.where(accept, remaining - h, remaining))
+
+        # Step-size controller
+        scale = (0.9 * (tolerance / error.clamp(min=1e-12)) ** (1 / (order + 1))).clamp(0.2, 5.0)
+        scale = torch.minimum(scale, 0.9 / stiffness.clamp(min=1e-12))
+        h = torch.where(running, (h * scale).clamp(min=h_min), h)
+        running = remaining > 1e-9 * dt
+    return y, spike, offset, h
@@ -5,6 +5,8 @@ import matplotlib.pyplot as plt
 
 from hw1.code.currents import ConstantCurrent
 from hw1.code.models import LIF
+from hw1.code.plots import plot_raster, plot_trace, show
+from hw1.code.spikes import SpikeRecorder
 from hw1.code.time_res import TimeResolution
 
 net = Network(behavior={1: TimeResolution(dt=1.0), })
@@ -21,27 +23,23 @@ pop1 = NeuronGroup(
                u_reset=-75,
                ),
         4: Recorder(variables=["u", "I"], tag="ng1_rec"),
-        5: EventRecorder(variables=['spike'], tag="ng1_event")
+        5: SpikeRecorder(tag="ng1_spikes")
     }
 )
 
 net.initialize()
 net.simulate_iterations(iterations=100)
 
-plt.plot(net["ng1_rec", 0].variables["u"][:, :3])
-plt.show()
+plot_trace(plt.gca(), net["ng1_rec", 0].variables["u"][:, :3])
+show()
 
-spike_events = net["ng1_event", 0].variables["spike"]
-
-spike_times = spike_events[:, 0]
-neuron_ids = spike_events[:, 1]
+spike_times, neuron_ids = net["ng1_spikes", 0].store.spikes()
 # Plot the raster plot
 plt.figure(figsize=(8, 6))
-plt.scatter(spike_times, neuron_ids, marker='|', color='blue', s=10)
+plot_raster(plt.gca(), spike_times, neuron_ids, n_neurons=pop1.size, color='blue')
 
 plt.xlabel('Time')
 plt.ylabel('Neuron ID')
 plt.title('Raster Plot for LIF model')
-plt.yticks(neuron_ids.unique())
 plt.grid(True)
-plt.show()
+show()
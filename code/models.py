@@ -1,6 +1,226 @@
 import torch
 from pymonntorch import *
 
+from integrators import advance
+from utils import at_lanes, to_lanes
+
+
+def refractory_gate(ng, refractory_T, buffer, out):
+    """
+    In-place version of `ng.last_spike < ng.network.iteration - refractory_T`
+    :return: out, a bool tensor that is True for neurons outside their refractory period
+    """
+    if isinstance(refractory_T, torch.Tensor):
+        torch.sub(refractory_T, ng.network.iteration, out=buffer).neg_()
+        return torch.lt(ng.last_spike, buffer, out=out)
+    return torch.lt(ng.last_spike, ng.network.iteration - refractory_T, out=out)
+
+
+def fire_and_reset(ng, threshold, u_reset):
+    """
+    In-place threshold, reset and last spike bookkeeping shared by the fused models
+    """
+    torch.gt(ng.u, threshold, out=ng.spike)
+    if isinstance(u_reset, torch.Tensor):
+        torch.where(ng.spike, u_reset, ng.u, out=ng.u)
+    else:
+        ng.u.masked_fill_(ng.spike, u_reset)
+    ng.last_spike.masked_fill_(ng.spike, ng.network.iteration)
+
+
+def fused_F(u, u_rest, rh_threshold, delta_T, out, buffer):
+    """
+    In-place version of the exponential term `-(u - u_rest) + delta_T * exp((u - rh_threshold) / delta_T)`
+    """
+    torch.sub(u, rh_threshold, out=buffer).div_(delta_T).exp_().mul_(delta_T)
+    torch.sub(u, u_rest, out=out).neg_().add_(buffer)
+    return out
+
+
+def precise_system(model, ng, inp_u):
+    """
+    `system` argument of integrators.advance for the precise mode of a model. A neuron that spikes inside a
+    step keeps its input for the rest of the step only without refractory period; the refractory period
+    itself still counts whole steps from the step of the spike.
+    """
+    refractory_T = model.refractory_T
+    if isinstance(refractory_T, torch.Tensor) and refractory_T.dim():
+        inp_after = inp_u * (refractory_T <= 0)
+    else:
+        inp_after = inp_u if refractory_T <= 0 else 0.0
+    return lambda index, after_spike: model.system(ng, inp_after if after_spike else inp_u, index)
+
+
+# (storage dtype, compute dtype) of the state of a group
+PRECISIONS = {
+    "float64": (torch.float64, torch.float64),
+    "float32": (torch.float32, torch.float32),
+    "bfloat16": (torch.bfloat16, torch.float32),
+    "float16": (torch.float16, torch.float32),
+}
+STATE = ("u", "w", "I")
+# State accumulated by the models from step to step: with half-precision storage its rounding residual is
+# stored too (ng.u_residual, ...), so that increments below the resolution of the storage dtype add up
+ACCUMULATED = ("u", "w")
+# Neurons per chunk of packed_step, which bounds the memory of the compute-dtype copies of the state
+CHUNK_SIZE = 2 ** 16
+
+
+def refractory_steps(refractory_T):
+    """
+    Length of the refractory countdown started by a spike: `last_spike < iteration - refractory_T`
+    holds again floor(refractory_T) + 1 steps after the spike
+    """
+    steps = torch.floor(torch.as_tensor(refractory_T)) + 1
+    if steps.max() > torch.iinfo(torch.int16).max:
+        raise ValueError("The refractory period is too long for an int16 countdown.")
+    return steps.to(torch.int16) if steps.dim() else int(steps)
+
+
+def compact_state(ng, model):
+    """
+    Convert the state of a group to the model's storage dtype. In compact mode `last_spike` is
+    replaced by the int16 countdown `ng.refractory`; `ng.spike` stays a bool tensor for the recorders.
+    """
+    for name in STATE:
+        if hasattr(ng, name):
+            value = getattr(ng, name)
+            setattr(ng, name, value.to(model.storage))
+            if name in ACCUMULATED and model.storage.itemsize < model.compute.itemsize:
+                stored, residual = getattr(ng, name), torch.empty_like(getattr(ng, name))
+                for begin in range(0, ng.size, CHUNK_SIZE):
+                    chunk = slice(begin, begin + CHUNK_SIZE)
+                    residual[chunk] = value[chunk].to(model.compute) - stored[chunk]
+                setattr(ng, f"{name}_residual", residual)
+    if model.compact:
+        model.countdown = refractory_steps(model.refractory_T)
+        ng.refractory = ng.vector(dtype=torch.int16)
+        del ng.last_spike
+
+
+class GroupChunk:
+    """
+    Stand-in of a neuron group for the neurons of a chunk, see packed_step
+    """
+
+
+def lane_chunk(value, size, chunk):
+    """
+    A per-neuron tensor (or a tuple of them) of a group of `size` neurons restricted to the slice `chunk`;
+    other values as they are
+    """
+    if isinstance(value, tuple):
+        return tuple(lane_chunk(v, size, chunk) for v in value)
+    if isinstance(value, torch.Tensor) and value.dim() and value.shape[0] == size:
+        return value[chunk]
+    return value
+
+
+def packed_step(ng, model):
+    """
+    Run `model.step` chunk by chunk (CHUNK_SIZE neurons) on the state upcast to the compute dtype, with
+    the rounding residual of the accumulated state added back, and store the result. The step sees
+    stand-ins of the group and the model whose per-neuron tensors are views of the chunk; tensors that
+    it replaces instead of updating in place (spike, spike_offset, h, ...) are copied back. In compact
+    mode a chunk gets a transient `last_spike` from the refractory countdown.
+    """
+    size = ng.size
+    if model.compact:
+        ng.refractory.sub_(1).clamp_(min=0)
+    # name -> (input, stored result, residual); e.g. the currents may have replaced I by a compute-dtype tensor
+    state = {}
+    for name in STATE:
+        if hasattr(ng, name):
+            value = getattr(ng, name)
+            stored = value if value.dtype == model.storage else torch.empty_like(value, dtype=model.storage)
+            state[name] = (value, stored, getattr(ng, f"{name}_residual", None))
+    replaced = {}
+
+    for begin in range(0, size, CHUNK_SIZE):
+        chunk = slice(begin, min(begin + CHUNK_SIZE, size))
+        group = {name: lane_chunk(value, size, chunk) for name, value in vars(ng).items() if not name.startswith("_")}
+        for name, (value, _, residual) in state.items():
+            group[name] = value[chunk].to(model.compute)
+            if residual is not None:
+                group[name] = group[name].add_(residual[chunk])
+        if model.compact:
+            group["last_spike"] = torch.where(ng.refractory[chunk] == 0, float("-inf"), float("inf")).to(model.compute)
+        group["network"], group["size"] = ng.network, chunk.stop - begin
+        group_chunk = GroupChunk()
+        vars(group_chunk).update(group)
+        model_chunk = object.__new__(type(model))
+        vars(model_chunk).update({name: lane_chunk(value, size, chunk) for name, value in vars(model).items()})
+        given = dict(vars(model_chunk))
+
+        model.step.__func__(model_chunk, group_chunk)
+
+        for name, (_, stored, residual) in state.items():
+            value = getattr(group_chunk, name)
+            stored[chunk].copy_(value)
+            if residual is not None:
+                residual[chunk].copy_(value.sub_(stored[chunk]))
+        if model.compact:
+            countdown = lane_chunk(model.countdown, size, chunk)
+            if isinstance(countdown, torch.Tensor):
+                ng.refractory[chunk] = torch.where(group_chunk.spike, countdown, ng.refractory[chunk])
+            else:
+                ng.refractory[chunk].masked_fill_(group_chunk.spike, countdown)
+        for owner, chunk_owner, passed in ((ng, group_chunk, group), (model, model_chunk, given)):
+            for name, value in vars(chunk_owner).items():
+                if name in state or (owner is ng and model.compact and name == "last_spike"):
+                    continue
+                if isinstance(value, torch.Tensor) and value is not passed.get(name) and value.dim() and \
+                        value.shape[0] == group["size"]:
+                    replaced.setdefault((owner, name), []).append(value)
+
+    for name, (_, stored, _) in state.items():
+        setattr(ng, name, stored)
+    for (owner, name), parts in replaced.items():
+        current = getattr(owner, name, None)
+        if isinstance(current, torch.Tensor) and current.shape[:1] == (size,) and current.dtype == parts[0].dtype:
+            torch.cat(parts, out=current)
+        else:
+            setattr(owner, name, torch.cat(parts))
+
+
+# State of a lane that held_step keeps
+HELD = ("u", "w", "u_residual", "w_residual", "last_spike", "refractory")
+
+
+def held_step(ng, model):
+    """
+    Update the group but hold the lanes of the bool tensor `ng.frozen` (e.g. the converged lanes of a
+    steady.SteadyState): their state is kept and they do not spike
+    """
+    frozen = ng.frozen
+    held = {name: getattr(ng, name)[frozen] for name in HELD if hasattr(ng, name)} if frozen.any() else {}
+    if model.packed:
+        packed_step(ng, model)
+    else:
+        model.step(ng)
+    for name, value in held.items():
+        getattr(ng, name)[frozen] = value
+    if held:
+        ng.spike[frozen] = False
+
+
+def block_advance(ng, model, inputs, spikes=None):
+    """
+    Advance the group len(inputs) steps in one call under the currents inputs[k] of each step, as
+    forward does step by step (see block.simulate_blocks)
+    :param inputs: tensor of shape (steps, ng.size) in the dtype of ng.I
+    :param spikes: bool tensor of shape (steps, ng.size) receiving the spikes of every step, or None
+    :return: None
+    """
+    network = ng.network
+    for k in range(len(inputs)):
+        network.iteration += 1
+        # copied rather than bound: setting attributes of a group costs more than the copy
+        ng.I.copy_(inputs[k])
+        model.forward(ng)
+        if spikes is not None:
+            spikes[k] = ng.spike
+
 
 class LIF(Behavior):
     def initialize(self, ng):
@@ -10,21 +230,34 @@ class LIF(Behavior):
         :return: None
         """
         # initial parameters in LIF model
-        self.R = self.parameter("R", None, required=True)
-        self.tau = self.parameter("tau", None, required=True)
-        self.u_rest = self.parameter("u_rest", None, required=True)
-        self.u_reset = self.parameter("u_reset", None, required=True)
-        self.threshold = self.parameter("threshold", None, required=True)
-        self.refractory_T = self.parameter("refractory_T", 0) / ng.network.dt
+        self.R = to_lanes(ng, self.parameter("R", None, required=True))
+        self.tau = to_lanes(ng, self.parameter("tau", None, required=True))
+        self.u_rest = to_lanes(ng, self.parameter("u_rest", None, required=True))
+        self.u_reset = to_lanes(ng, self.parameter("u_reset", None, required=True))
+        self.threshold = to_lanes(ng, self.parameter("threshold", None, required=True))
+        self.refractory_T = to_lanes(ng, self.parameter("refractory_T", 0)) / ng.network.dt
         self.ratio = self.parameter("ratio", 1.1)
+        self.fused = self.parameter("fused", False)
+        self.precise = self.parameter("precise", False)
+        self.precision = self.parameter("precision", "float32")
+        self.compact = self.parameter("compact", False)
+        self.storage, self.compute = PRECISIONS[self.precision]
+        self.packed = self.compact or self.storage != ng.def_dtype or self.compute != ng.def_dtype
         # initial value of u in neurons
         ng.u = ng.vector("uniform") * (self.threshold - self.u_reset) * self.ratio
         ng.u += self.u_reset
         ng.spike = ng.u > self.threshold
-        ng.u[ng.spike] = self.u_reset
+        ng.u = torch.where(ng.spike, self.u_reset, ng.u)
 
         if not hasattr(ng, 'last_spike'):
-            ng.last_spike = ng.vector(-self.refractory_T - 1)
+            ng.last_spike = ng.vector() - self.refractory_T - 1
+
+        if self.fused:
+            self.scratch = (ng.vector(dtype=self.compute), ng.vector(dtype=self.compute))
+            self.active = ng.vector(dtype=torch.bool)
+
+        if self.packed:
+            compact_state(ng, self)
 
     def forward(self, ng):
         """
@@ -32,6 +265,20 @@ class LIF(Behavior):
         :param ng: neuron group
         :return: None
         """
+        if getattr(ng, "frozen", None) is not None:
+            return held_step(ng, self)
+        if self.packed:
+            return packed_step(ng, self)
+        self.step(ng)
+
+    def advance(self, ng, inputs, spikes=None):
+        block_advance(ng, self, inputs, spikes)
+
+    def step(self, ng):
+        if self.precise:
+            return self.integrate(ng)
+        if self.fused:
+            return self.fused_forward(ng)
         # Neuron dynamic
         inp_u = self.R * ng.I * (ng.last_spike < ng.network.iteration - self.refractory_T).byte()
         leakage = ng.u - self.u_rest
@@ -39,32 +286,110 @@ class LIF(Behavior):
         # Firing
         ng.spike = ng.u > self.threshold
         # Reset
-        ng.u[ng.spike] = self.u_reset
+        ng.u = torch.where(ng.spike, self.u_reset, ng.u)
         # Save last spike
         ng.last_spike[ng.spike] = ng.network.iteration
 
+    def system(self, ng, inp_u, index=None):
+        """
+        (rhs, jacobian, reset) of the neurons at `index` (all of them when None) for integrators.advance
+        """
+        u_rest, tau, u_reset, inp_u = (at_lanes(v, index) for v in (self.u_rest, self.tau, self.u_reset, inp_u))
+
+        def rhs(y):
+            return [(-(y[0] - u_rest) + inp_u) / tau]
+
+        def jacobian(y):
+            return [torch.full_like(y[0], -1.0) / tau]
+
+        def reset(y, spike):
+            return [torch.where(spike, u_reset, y[0])]
+
+        return rhs, jacobian, reset
+
+    def integrate(self, ng):
+        """
+        Precise mode: exponential Euler, which solves the LIF dynamics exactly under the input of the step,
+        and spikes located inside the step (see integrators.precise_step).
+        ng.spike_offset holds the spike time as a fraction of the step.
+        :param ng: neuron group
+        :return: None
+        """
+        inp_u = self.R * ng.I * (ng.last_spike < ng.network.iteration - self.refractory_T).byte()
+        rhs, jacobian, reset = self.system(ng, inp_u)
+        (ng.u,), ng.spike, ng.spike_offset, _ = advance(
+            [ng.u], rhs, ng.network.dt, self.threshold, reset, method="exp_euler", jacobian=jacobian,
+            system=precise_system(self, ng, inp_u))
+        ng.last_spike[ng.spike] = ng.network.iteration
+
+    def fused_forward(self, ng):
+        """
+        Same dynamic as `forward`, computed with in-place ops on preallocated buffers
+        :param ng: neuron group
+        :return: None
+        """
+        du, inp_u = self.scratch
+        active = refractory_gate(ng, self.refractory_T, inp_u, self.active)
+        torch.mul(ng.I, self.R, out=inp_u).mul_(active)
+        torch.sub(ng.u, self.u_rest, out=du).neg_()
+        du.add_(inp_u).div_(self.tau).mul_(ng.network.dt)
+        ng.u.add_(du)
+        fire_and_reset(ng, self.threshold, self.u_reset)
+
 
 class ELIF(Behavior):
     def initialize(self, ng):
-        self.R = self.parameter("R", None, required=True)
-        self.tau = self.parameter("tau", None, required=True)
-        self.u_rest = self.parameter("u_rest", None, required=True)
-        self.u_reset = self.parameter("u_reset", None, required=True)
-        self.threshold = self.parameter("threshold", None, required=True)
-        self.rh_threshold = self.parameter("rh_threshold", None, required=True)
-        self.delta_T = self.parameter("delta_T", None, required=True)
-        self.refractory_T = self.parameter("refractory_T", 0) / ng.network.dt
+        self.R = to_lanes(ng, self.parameter("R", None, required=True))
+        self.tau = to_lanes(ng, self.parameter("tau", None, required=True))
+        self.u_rest = to_lanes(ng, self.parameter("u_rest", None, required=True))
+        self.u_reset = to_lanes(ng, self.parameter("u_reset", None, required=True))
+        self.threshold = to_lanes(ng, self.parameter("threshold", None, required=True))
+        self.rh_threshold = to_lanes(ng, self.parameter("rh_threshold", None, required=True))
+        self.delta_T = to_lanes(ng, self.parameter("delta_T", None, required=True))
+        self.refractory_T = to_lanes(ng, self.parameter("refractory_T", 0)) / ng.network.dt
         self.ratio = self.parameter("ratio", 1.0)
+        self.fused = self.parameter("fused", False)
+        self.precise = self.parameter("precise", False)
+        self.precision = self.parameter("precision", "float32")
+        self.compact = self.parameter("compact", False)
+        self.storage, self.compute = PRECISIONS[self.precision]
+        self.packed = self.compact or self.storage != ng.def_dtype or self.compute != ng.def_dtype
+        self.integrator = self.parameter("integrator", "euler")
+        self.adaptive = self.parameter("adaptive", False)
+        self.tolerance = self.parameter("tolerance", 1e-3)
+        self.h = None
 
         ng.u = ng.vector("uniform") * (self.threshold - self.u_reset) * self.ratio
         ng.u += self.u_reset
         ng.spike = ng.u > self.threshold
-        ng.u[ng.spike] = self.u_reset
+        ng.u = torch.where(ng.spike, self.u_reset, ng.u)
 
         if not hasattr(ng, 'last_spike'):
-            ng.last_spike = ng.vector(-self.refractory_T - 1)
+            ng.last_spike = ng.vector() - self.refractory_T - 1
+
+        if self.fused:
+            self.scratch = (ng.vector(dtype=self.compute), ng.vector(dtype=self.compute))
+            self.active = ng.vector(dtype=torch.bool)
+
+        if self.packed:
+            compact_state(ng, self)
 
     def forward(self, ng):
+        if getattr(ng, "frozen", None) is not None:
+            return held_step(ng, self)
+        if self.packed:
+            return packed_step(ng, self)
+        self.step(ng)
+
+    def advance(self, ng, inputs, spikes=None):
+        block_advance(ng, self, inputs, spikes)
+
+    def step(self, ng):
+        if self.integrator != "euler" or self.adaptive or self.precise:
+            return self.integrate(ng)
+        if self.fused:
+            return self.fused_forward(ng)
+
         # Neuron dynamic
         F = self.F(ng.u)
         inp_u = self.R * ng.I * (ng.last_spike < ng.network.iteration - self.refractory_T).byte()
@@ -74,30 +399,87 @@ class ELIF(Behavior):
         ng.spike = ng.u > self.threshold
 
         # Reset
-        ng.u[ng.spike] = self.u_reset
+        ng.u = torch.where(ng.spike, self.u_reset, ng.u)
 
         # Save last spike
         ng.last_spike[ng.spike] = ng.network.iteration
 
-    def F(self, u):
-        leakage = u - self.u_rest
-        return -leakage + self.delta_T * torch.exp((u - self.rh_threshold) / self.delta_T)
+    def F(self, u, index=None):
+        u_rest, rh_threshold, delta_T = (at_lanes(v, index) for v in (self.u_rest, self.rh_threshold, self.delta_T))
+        leakage = u - u_rest
+        return -leakage + delta_T * torch.exp((u - rh_threshold) / delta_T)
+
+    def dF(self, u, index=None):
+        rh_threshold, delta_T = at_lanes(self.rh_threshold, index), at_lanes(self.delta_T, index)
+        return -1 + torch.exp((u - rh_threshold) / delta_T)
+
+    def system(self, ng, inp_u, index=None):
+        """
+        (rhs, jacobian, reset) of the neurons at `index` (all of them when None) for integrators.advance
+        """
+        tau, u_reset, inp_u = (at_lanes(v, index) for v in (self.tau, self.u_reset, inp_u))
+
+        def rhs(y):
+            return [(self.F(y[0], index) + inp_u) / tau]
+
+        def jacobian(y):
+            return [self.dF(y[0], index) / tau]
+
+        def reset(y, spike):
+            return [torch.where(spike, u_reset, y[0])]
+
+        return rhs, jacobian, reset
+
+    def integrate(self, ng):
+        """
+        Advance the neurons with the selected integrator, optionally with adaptive substeps, or in precise
+        mode with the spikes located inside fixed steps (see integrators.precise_step).
+        ng.spike_offset holds the interpolated spike time as a fraction of the step.
+        :param ng: neuron group
+        :return: None
+        """
+        inp_u = self.R * ng.I * (ng.last_spike < ng.network.iteration - self.refractory_T).byte()
+        rhs, jacobian, reset = self.system(ng, inp_u)
+        (ng.u,), ng.spike, ng.spike_offset, self.h = advance(
+            [ng.u], rhs, ng.network.dt, self.threshold, reset, method=self.integrator, jacobian=jacobian,
+            adaptive=self.adaptive, tolerance=self.tolerance, h=self.h,
+            system=precise_system(self, ng, inp_u) if self.precise else None)
+        ng.last_spike[ng.spike] = ng.network.iteration
+
+    def fused_forward(self, ng):
+        du, inp_u = self.scratch
+        fused_F(ng.u, self.u_rest, self.rh_threshold, self.delta_T, du, inp_u)
+        active = refractory_gate(ng, self.refractory_T, inp_u, self.active)
+        torch.mul(ng.I, self.R, out=inp_u).mul_(active)
+        du.add_(inp_u).div_(self.tau).mul_(ng.network.dt)
+        ng.u.add_(du)
+        fire_and_reset(ng, self.threshold, self.u_reset)
 
 
 class AELIF(Behavior):
     def initialize(self, ng):
-        self.a = self.parameter("a", None, required=True)
-        self.b = self.parameter("b", None, required=True)
-        self.R = self.parameter("R", None, required=True)
-        self.tau_m = self.parameter("tau_m", None, required=True)
-        self.tau_w = self.parameter("tau_w", None, required=True)
-        self.u_rest = self.parameter("u_rest", None, required=True)
-        self.u_reset = self.parameter("u_reset", None, required=True)
-        self.threshold = self.parameter("threshold", None, required=True)
-        self.rh_threshold = self.parameter("rh_threshold", None, required=True)
-        self.delta_T = self.parameter("delta_T", None, required=True)
-        self.refractory_T = self.parameter("refractory_T", 0) / ng.network.dt
+        self.a = to_lanes(ng, self.parameter("a", None, required=True))
+        self.b = to_lanes(ng, self.parameter("b", None, required=True))
+        self.R = to_lanes(ng, self.parameter("R", None, required=True))
+        self.tau_m = to_lanes(ng, self.parameter("tau_m", None, required=True))
+        self.tau_w = to_lanes(ng, self.parameter("tau_w", None, required=True))
+        self.u_rest = to_lanes(ng, self.parameter("u_rest", None, required=True))
+        self.u_reset = to_lanes(ng, self.parameter("u_reset", None, required=True))
+        self.threshold = to_lanes(ng, self.parameter("threshold", None, required=True))
+        self.rh_threshold = to_lanes(ng, self.parameter("rh_threshold", None, required=True))
+        self.delta_T = to_lanes(ng, self.parameter("delta_T", None, required=True))
+        self.refractory_T = to_lanes(ng, self.parameter("refractory_T", 0)) / ng.network.dt
         self.ratio = self.parameter("ratio", 1.0)
+        self.fused = self.parameter("fused", False)
+        self.precise = self.parameter("precise", False)
+        self.precision = self.parameter("precision", "float32")
+        self.compact = self.parameter("compact", False)
+        self.storage, self.compute = PRECISIONS[self.precision]
+        self.packed = self.compact or self.storage != ng.def_dtype or self.compute != ng.def_dtype
+        self.integrator = self.parameter("integrator", "euler")
+        self.adaptive = self.parameter("adaptive", False)
+        self.tolerance = self.parameter("tolerance", 1e-3)
+        self.h = None
 
         ng.u = ng.vector("uniform") * (self.threshold - self.u_reset) * self.ratio
         ng.u += self.u_reset
@@ -105,11 +487,34 @@ class AELIF(Behavior):
         ng.w = ng.vector()
 
         ng.spike = ng.u > self.threshold
-        ng.u[ng.spike] = self.u_reset
+        ng.u = torch.where(ng.spike, self.u_reset, ng.u)
         if not hasattr(ng, 'last_spike'):
-            ng.last_spike = ng.vector(-self.refractory_T - 1)
+            ng.last_spike = ng.vector() - self.refractory_T - 1
+
+        if self.fused:
+            self.scratch = (ng.vector(dtype=self.compute), ng.vector(dtype=self.compute))
+            self.active = ng.vector(dtype=torch.bool)
+            self.b_tau_w = self.b * self.tau_w
+
+        if self.packed:
+            compact_state(ng, self)
 
     def forward(self, ng):
+        if getattr(ng, "frozen", None) is not None:
+            return held_step(ng, self)
+        if self.packed:
+            return packed_step(ng, self)
+        self.step(ng)
+
+    def advance(self, ng, inputs, spikes=None):
+        block_advance(ng, self, inputs, spikes)
+
+    def step(self, ng):
+        if self.integrator != "euler" or self.adaptive or self.precise:
+            return self.integrate(ng)
+        if self.fused:
+            return self.fused_forward(ng)
+
         # Neuron dynamic
         F = self.F(ng.u)
         inp_u = self.R * ng.I * (ng.last_spike < ng.network.iteration - self.refractory_T).byte()
@@ -119,7 +524,7 @@ class AELIF(Behavior):
         ng.spike = ng.u > self.threshold
 
         # Reset
-        ng.u[ng.spike] = self.u_reset
+        ng.u = torch.where(ng.spike, self.u_reset, ng.u)
 
         # Update w
         self.update_w(ng)
@@ -127,10 +532,67 @@ class AELIF(Behavior):
         # Save last spike
         ng.last_spike[ng.spike] = ng.network.iteration
 
-    def F(self, u):
-        leakage = u - self.u_rest
-        return -leakage + self.delta_T * torch.exp((u - self.rh_threshold) / self.delta_T)
+    def F(self, u, index=None):
+        u_rest, rh_threshold, delta_T = (at_lanes(v, index) for v in (self.u_rest, self.rh_threshold, self.delta_T))
+        leakage = u - u_rest
+        return -leakage + delta_T * torch.exp((u - rh_threshold) / delta_T)
+
+    def dF(self, u, index=None):
+        rh_threshold, delta_T = at_lanes(self.rh_threshold, index), at_lanes(self.delta_T, index)
+        return -1 + torch.exp((u - rh_threshold) / delta_T)
+
+    def integrate(self, ng):
+        """
+        Advance u and w with the selected integrator, optionally with adaptive substeps or in precise mode.
+        A spike makes w jump by b * dt, as in update_w.
+        :param ng: neuron group
+        :return: None
+        """
+        inp_u = self.R * ng.I * (ng.last_spike < ng.network.iteration - self.refractory_T).byte()
+        rhs, jacobian, reset = self.system(ng, inp_u)
+        (ng.u, ng.w), ng.spike, ng.spike_offset, self.h = advance(
+            [ng.u, ng.w], rhs, ng.network.dt, self.threshold, reset, method=self.integrator, jacobian=jacobian,
+            adaptive=self.adaptive, tolerance=self.tolerance, h=self.h,
+            system=precise_system(self, ng, inp_u) if self.precise else None)
+        ng.last_spike[ng.spike] = ng.network.iteration
+
+    def system(self, ng, inp_u, index=None):
+        """
+        (rhs, jacobian, reset) of the neurons at `index` (all of them when None) for integrators.advance
+        """
+        a, b, R, tau_m, tau_w, u_rest, u_reset, inp_u = (at_lanes(v, index) for v in (
+            self.a, self.b, self.R, self.tau_m, self.tau_w, self.u_rest, self.u_reset, inp_u))
+
+        def rhs(y):
+            u, w = y
+            return [(self.F(u, index) - R * w + inp_u) / tau_m,
+                    (a * (u - u_rest) - w) / tau_w]
+
+        def jacobian(y):
+            return [self.dF(y[0], index) / tau_m, torch.full_like(y[1], -1.0) / tau_w]
+
+        def reset(y, spike):
+            u, w = y
+            return [torch.where(spike, u_reset, u), w + b * ng.network.dt * spike]
+
+        return rhs, jacobian, reset
 
     def update_w(self, ng):
         leakage = ng.u - self.u_rest
         ng.w += ((self.a * leakage - ng.w + self.b * self.tau_w * ng.spike.byte()) / self.tau_w) * ng.network.dt
+
+    def fused_forward(self, ng):
+        du, tmp = self.scratch
+        fused_F(ng.u, self.u_rest, self.rh_threshold, self.delta_T, du, tmp)
+        du.sub_(torch.mul(ng.w, self.R, out=tmp))
+        active = refractory_gate(ng, self.refractory_T, tmp, self.active)
+        torch.mul(ng.I, self.R, out=tmp).mul_(active)
+        du.add_(tmp).div_(self.tau_m).mul_(ng.network.dt)
+        ng.u.add_(du)
+        fire_and_reset(ng, self.threshold, self.u_reset)
+
+        # Update w
+        dw = du
+        torch.sub(ng.u, self.u_rest, out=dw).mul_(self.a).sub_(ng.w)
+        dw.add_(torch.mul(ng.spike, self.b_tau_w, out=tmp)).div_(self.tau_w).mul_(ng.network.dt)
+        ng.w.add_(dw)
@@ -0,0 +1,177 @@
+import math
+
+import numpy as np
+import torch
+from pymonntorch import *
+
+
+class OnlineStatistics(Behavior):
+    """
+    Summary statistics of a group, updated every step in O(N) memory without storing traces:
+    spike counts and rates, ISI mean and CV (Welford), Fano factor of the spike counts in windows of
+    `count_window`, mean, variance (Welford), min and max of state variables, a population ISI histogram with
+    log-spaced bins, optional population histograms of state variables and a PSTH.
+
+    The PSTH has `psth_bins` bins. Over the whole run, adjacent bins are merged (the bin width
+    doubles) whenever the run outgrows them; with `psth_period`, spikes are folded onto one period
+    of a periodic stimulus instead. `summary()` can be called at any time during the run.
+
+    Put it after the model, e.g. at key 5 instead of a recorder.
+
+    Args:
+        variables (list): state variables whose mean, variance, min and max are tracked. The default is ["u"].
+        histograms (dict): variable -> (low, high, bins) of population value histograms. The default is {}.
+        count_window (float): window of the Fano factor in units of time. The default is 100.
+        isi_range (tuple): (low, high) of the ISI histogram in units of time. The default is (dt, 1000).
+        isi_bins (int): number of log-spaced ISI bins. The default is 50.
+        psth_bin (float): initial PSTH bin width in units of time. The default is 1.
+        psth_bins (int): number of PSTH bins. The default is 1000.
+        psth_period (float): period to fold the PSTH on, in units of time. The default is None.
+        skip (int): iterations to ignore at the start (transient). The default is 0.
+        variable (str): spike attribute of the group. The default is "spike".
+    """
+
+    def initialize(self, ng):
+        super().initialize(ng)
+        self.dt = dt = ng.network.dt
+        self.variables = self.parameter("variables", ["u"])
+        self.histogram_ranges = self.parameter("histograms", {})
+        self.count_window = max(1, round(self.parameter("count_window", 100.0) / dt))
+        isi_low, isi_high = self.parameter("isi_range", (dt, 1000.0))
+        self.isi_bins = self.parameter("isi_bins", 50)
+        self.psth_steps = max(1, round(self.parameter("psth_bin", 1.0) / dt))
+        self.psth_bins = self.parameter("psth_bins", 1000)
+        period = self.parameter("psth_period", None)
+        self.period = None if period is None else max(1, round(period / dt))
+        self.skip = self.parameter("skip", 0)
+        self.variable = self.parameter("variable", "spike")
+
+        vector = lambda: torch.zeros(ng.size, dtype=torch.float64, device=ng.device)
+        self.start = ng.network.iteration + self.skip
+        self.steps = 0
+        self.spike_count = torch.zeros(ng.size, dtype=torch.long, device=ng.device)
+        self.last = torch.full((ng.size,), -1, dtype=torch.long, device=ng.device)
+        self.isi_count = torch.zeros(ng.size, dtype=torch.long, device=ng.device)
+        self.isi_mean, self.isi_m2 = vector(), vector()
+        self.window = torch.zeros(ng.size, dtype=torch.long, device=ng.device)
+        self.windows = 0
+        self.window_mean, self.window_m2 = vector(), vector()
+        self.mean = {name: vector() for name in self.variables}
+        self.m2 = {name: vector() for name in self.variables}
+        self.min = {name: vector().fill_(math.inf) for name in self.variables}
+        self.max = {name: vector().fill_(-math.inf) for name in self.variables}
+        self.isi_edges = torch.logspace(math.log10(isi_low), math.log10(isi_high), self.isi_bins + 1,
+                                        dtype=torch.float64, device=ng.device)
+        self.isi_histogram = torch.zeros(self.isi_bins, dtype=torch.long, device=ng.device)
+        self.histograms = {name: torch.zeros(bins, dtype=torch.long, device=ng.device)
+                           for name, (_, _, bins) in self.histogram_ranges.items()}
+        self.psth = torch.zeros(self.psth_bins, dtype=torch.long, device=ng.device)
+
+    def forward(self, ng):
+        iteration = ng.network.iteration
+        if iteration <= self.start:
+            return
+        spikes = getattr(ng, self.variable)
+        self.steps += 1
+
+        # Welford's running mean and variance of the state variables
+        for name in self.variables:
+            value = getattr(ng, name).to(torch.float64)
+            delta = value - self.mean[name]
+            self.mean[name] += delta / self.steps
+            self.m2[name] += delta * (value - self.mean[name])
+            torch.minimum(self.min[name], value, out=self.min[name])
+            torch.maximum(self.max[name], value, out=self.max[name])
+        for name, (low, high, bins) in self.histogram_ranges.items():
+            self.histograms[name] += torch.histc(getattr(ng, name).to(torch.float64), bins, low, high).long()
+
+        self.spike_count += spikes
+        self.window += spikes
+        if self.steps % self.count_window == 0:
+            self.windows += 1
+            counts = self.window.to(torch.float64)
+            delta = counts - self.window_mean
+            self.window_mean += delta / self.windows
+            self.window_m2 += delta * (counts - self.window_mean)
+            self.window.zero_()
+
+        fired = spikes.nonzero().flatten()
+        if len(fired):
+            self.update_isi(fired, iteration, ng.network.dt)
+            self.update_psth(iteration, len(fired))
+
+    def update_isi(self, fired, iteration, dt):
+        previous = self.last[fired]
+        self.last[fired] = iteration
+        seen = previous >= 0
+        lanes = fired[seen]
+        if not len(lanes):
+            return
+        isi = (iteration - previous[seen]).to(torch.float64) * dt
+        self.isi_count[lanes] += 1
+        delta = isi - self.isi_mean[lanes]
+        self.isi_mean[lanes] += delta / self.isi_count[lanes]
+        self.isi_m2[lanes] += delta * (isi - self.isi_mean[lanes])
+        bins = (torch.searchsorted(self.isi_edges, isi, right=True) - 1).clamp(0, self.isi_bins - 1)
+        self.isi_histogram += torch.bincount(bins, minlength=self.isi_bins)
+
+    def update_psth(self, iteration, count):
+        offset = iteration - self.start - 1
+        if self.period is not None:
+            offset %= self.period
+        index = offset // self.psth_steps
+        while index >= self.psth_bins:
+            # Merge neighbouring bins to cover twice the time with the same memory
+            merged = self.psth.view(-1, 2).sum(dim=1) if self.psth_bins % 2 == 0 else \
+                torch.cat([self.psth, self.psth.new_zeros(1)]).view(-1, 2).sum(dim=1)[:self.psth_bins]
+            self.psth.zero_()
+            self.psth[:len(merged)] = merged
+            self.psth_steps *= 2
+            index = offset // self.psth_steps
+        self.psth[index] += count
+
+    def summary(self):
+        """
+        Statistics so far
+        :return: dict of per-neuron tensors (rate, isi_mean, isi_cv, fano, mean_<var>, var_<var>, min_<var>,
+                 max_<var>) and
+                 population histograms (isi_edges, isi_histogram, psth_times, psth, <var>_histogram)
+        """
+        dt = self.dt
+        duration = max(self.steps, 1) * dt
+        nan = torch.tensor(float("nan"), dtype=torch.float64)
+        isi_var = torch.where(self.isi_count > 1, self.isi_m2 / (self.isi_count - 1).clamp(min=1), nan)
+        window_var = self.window_m2 / (self.windows - 1) if self.windows > 1 else torch.full_like(self.window_m2, float("nan"))
+        result = {
+            "steps": self.steps,
+            "rate": self.spike_count.to(torch.float64) / duration,
+            "isi_mean": torch.where(self.isi_count > 0, self.isi_mean, nan),
+            "isi_cv": isi_var.sqrt() / self.isi_mean,
+            "fano": window_var / self.window_mean,
+            "isi_edges": self.isi_edges,
+            "isi_histogram": self.isi_histogram,
+        }
+        for name in self.variables:
+            result[f"mean_{name}"] = self.mean[name]
+            result[f"var_{name}"] = self.m2[name] / max(self.steps - 1, 1)
+            result[f"min_{name}"] = self.min[name]
+            result[f"max_{name}"] = self.max[name]
+        for name, (low, high, bins) in self.histogram_ranges.items():
+            result[f"{name}_edges"] = torch.linspace(low, high, bins + 1, dtype=torch.float64)
+            result[f"{name}_histogram"] = self.histograms[name]
+
+        # PSTH as a population rate per bin (spikes per neuron per unit of time), normalized by the
+        # number of steps that fell into every bin
+        covered = self.steps if self.period is None else self.period
+        used = min(self.psth_bins, -(-covered // self.psth_steps))
+        start = torch.arange(used, dtype=torch.long) * self.psth_steps
+        length = torch.clamp(covered - start, max=self.psth_steps)
+        if self.period is None:
+            exposure = length
+        else:
+            partial = torch.clamp(self.steps % self.period - start, min=0).minimum(length)
+            exposure = self.steps // self.period * length + partial
+        width = self.psth_steps * dt
+        result["psth_times"] = torch.arange(used, dtype=torch.float64) * width
+        result["psth"] = self.psth[:used].to(torch.float64) / (exposure.clamp(min=1) * dt * self.spike_count.numel())
+        return result
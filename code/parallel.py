@@ -0,0 +1,194 @@
+"""
+Run independent simulations across a process pool.
+
+A job is a plain, picklable spec instead of a built Simulation:
+
+    {
+        "name": "lif_step",
+        "dt": 0.1,
+        "iterations": 1000,
+        "seed": 3,                      # optional, defaults to base_seed + job index
+        "simulate": {"block_size": 10},  # optional keyword arguments of Simulation.simulate, see simulate_options
+        "groups": [{
+            "tag": "lif_step_curr",
+            "size": 1,
+            "behavior": {
+                2: ("currents.StepCurrent", {"value": 10, "t_start": 25, "t_end": 75}),
+                3: ("models.LIF", {"R": 5, "tau": 10, "threshold": -37, "u_rest": -67, "u_reset": -75}),
+                4: ("Recorder", {"variables": ["u", "I"]}),
+                5: ("EventRecorder", {"variables": ["spike"]}),
+            },
+        }],
+    }
+
+Behavior classes are given as "module.Class" (bare names come from pymonntorch) or as the class itself.
+A group with "sweep": [[key, parameter, values], ...] instead of a size runs the grid of those values
+as lanes (see Simulation.add_parameter_sweep).
+Workers write every recorded variable to .npy files under the output directory and only send back
+their file names; the parent opens the results memory-mapped.
+"""
+import importlib
+import inspect
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+
+import numpy as np
+import torch
+from pymonntorch import *
+
+from spikes import SpikeRecorder
+from time_res import TimeResolution
+
+
+def resolve_behavior(name):
+    if not isinstance(name, str):
+        return name
+    module, _, attr = name.rpartition(".")
+    return getattr(importlib.import_module(module or "pymonntorch"), attr)
+
+
+def behavior_key(key):
+    """
+    Behavior key of a spec, which JSON turns into a string: "3" -> 3, "2.5" -> 2.5
+    """
+    key = float(key)
+    return int(key) if key.is_integer() else key
+
+
+def build_simulation(spec):
+    """
+    Build the Simulation described by a job spec
+    """
+    from simulate import Simulation
+
+    sim = Simulation(net=Network(behavior={1: TimeResolution(dt=spec.get("dt", 1.0))}))
+    for group in spec["groups"]:
+        behavior = {behavior_key(key): resolve_behavior(cls)(**kwargs)
+                    for key, (cls, kwargs) in group["behavior"].items()}
+        if "sweep" in group:
+            grid = {(behavior_key(key), name): values for key, name, values in group["sweep"]}
+            sim.add_parameter_sweep(tag=group["tag"], grid=grid, behavior=behavior)
+        else:
+            sim.add_neuron_group(tag=group["tag"], size=group["size"], behavior=behavior)
+    return sim
+
+
+def simulate_options(spec):
+    """
+    Keyword arguments of Simulation.simulate given by the "simulate" entry of a spec
+    :return: dict of the options, checked against the signature of Simulation.simulate
+    """
+    from simulate import Simulation
+
+    options = dict(spec.get("simulate", {}))
+    accepted = set(inspect.signature(Simulation.simulate).parameters) - {"self", "iterations", "info"}
+    unknown = set(options) - accepted
+    if unknown:
+        raise ValueError(f"Unknown simulate options {sorted(unknown)} in {spec.get('name')}, "
+                         f"accepted are {sorted(accepted)}.")
+    return options
+
+
+def recorded_arrays(ng):
+    """
+    (behavior key, variable, array) of everything recorded on a group
+    """
+    for key, behavior in ng.behavior.items():
+        if isinstance(behavior, SpikeRecorder):
+            times, ids = behavior.store.spikes()
+            yield key, behavior.variable, np.stack([times, ids], axis=1)
+        elif isinstance(behavior, Recorder):
+            for variable, data in behavior.variables.items():
+                data = data.cpu().numpy() if isinstance(data, torch.Tensor) else np.asarray(data)
+                yield key, variable, data
+
+
+def run_job(spec, seed, directory):
+    torch.manual_seed(seed)
+    np.random.seed(seed)
+    start = time.time()
+    sim = build_simulation(spec)
+    sim.simulate(iterations=spec["iterations"], info=False, **simulate_options(spec))
+
+    os.makedirs(directory, exist_ok=True)
+    files = {}
+    for ng in sim.net.NeuronGroups:
+        for key, variable, data in recorded_arrays(ng):
+            file = f"{ng.tag}_{key}_{variable}.npy"
+            np.save(os.path.join(directory, file), data)
+            files.setdefault(ng.tag, {}).setdefault(str(key), {})[variable] = file
+
+    manifest = {"name": spec.get("name"), "seed": seed, "iterations": spec["iterations"],
+                "wall_time": time.time() - start, "files": files}
+    with open(os.path.join(directory, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+    return directory
+
+
+def load_result(directory):
+    """
+    Open the output of one job
+    :return: manifest dict whose "data"[tag][key][variable] are read-only memory-mapped arrays
+    """
+    with open(os.path.join(directory, "manifest.json")) as f:
+        manifest = json.load(f)
+    manifest["data"] = {
+        tag: {behavior_key(key): {variable: np.load(os.path.join(directory, file), mmap_mode="r")
+                                  for variable, file in variables.items()}
+              for key, variables in keys.items()}
+        for tag, keys in manifest["files"].items()
+    }
+    return manifest
+
+
+def set_threads(threads):
+    torch.set_num_threads(threads)
+
+
+def run_parallel(specs, workers=None, threads=None, base_seed=0, directory=None):
+    """
+    Run independent simulation specs across a process pool
+    :param specs: list of job specs (see module docstring)
+    :param workers: number of processes. The default is one per core, at most one per job.
+    :param threads: torch intra-op threads per worker. The default splits the cores evenly.
+    :param base_seed: job i without an explicit "seed" runs with base_seed + i
+    :param directory: where the results are written. The default is a new temporary directory.
+    :return: list of load_result outputs in the order of specs
+    """
+    cores = os.cpu_count() or 1
+    workers = workers or max(1, min(cores, len(specs)))
+    threads = threads or max(1, cores // workers)
+    directory = directory or tempfile.mkdtemp(prefix="runs_")
+    jobs = [(spec, spec.get("seed", base_seed + i), os.path.join(directory, f"{i:04d}_{spec.get('name') or 'job'}"))
+            for i, spec in enumerate(specs)]
+
+    # spawn rather than fork: forking a parent whose torch thread pool is already running can deadlock
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                             initializer=set_threads, initargs=(threads,)) as pool:
+        outputs = list(pool.map(run_job, *zip(*jobs)))
+    return [load_result(output) for output in outputs]
+
+
+if __name__ == "__main__":
+    # Scaling check: the same suite on one worker and on every core
+    lif = {"R": 5, "tau": 10, "threshold": -37, "u_rest": -67, "u_reset": -75}
+    suite = [{
+        "name": f"noisy_{i}",
+        "dt": 0.1,
+        "iterations": 5000,
+        "groups": [{"tag": "lif", "size": 1000, "behavior": {
+            2: ("currents.StepCurrent", {"value": 10 + i, "t_start": 25, "noise_range": 5}),
+            3: ("models.LIF", lif),
+            5: ("spikes.SpikeRecorder", {}),
+        }}],
+    } for i in range(2 * (os.cpu_count() or 1))]
+    for workers in sorted({1, os.cpu_count() or 1}):
+        start = time.time()
+        results = run_parallel(suite, workers=workers)
+        print(f"{workers} worker(s): {time.time() - start:.2f}s for {len(suite)} jobs, "
+              f"{sum(len(r['data']['lif'][5]['spike']) for r in results)} spikes")
@@ -1,12 +1,103 @@
 import matplotlib.pyplot as plt
+from matplotlib.colors import LinearSegmentedColormap
+import numpy as np
 from pymonntorch import NeuronGroup
 
+headless = False
+
+
+def set_headless(on=True):
+    """
+    Save-only mode: figures are never shown, `show` just closes them
+    """
+    global headless
+    headless = on
+    if on:
+        plt.switch_backend("Agg")
+
+
+def show(fig=None):
+    if headless:
+        plt.close(fig)
+    else:
+        plt.show()
+
+
+def decimate(y, width=2000):
+    """
+    Min/max decimation of a trace to `width` buckets: each bucket keeps its minimum and maximum
+    sample in time order, so peaks and spikes survive at any zoom level of the figure width.
+    :param y: [T] or [T, k] array-like
+    :return: (x, y) with at most 2 * width rows
+    """
+    y = np.asarray(y)
+    length = len(y)
+    if length <= 2 * width:
+        return np.arange(length), y
+    bucket = -(-length // width)
+    full = length // bucket * bucket
+    blocks = y[:full].reshape(full // bucket, bucket, *y.shape[1:])
+    starts = np.arange(0, full, bucket).reshape(-1, *([1] * (y.ndim - 1)))
+    lo, hi = blocks.argmin(axis=1) + starts, blocks.argmax(axis=1) + starts
+    if full < length:
+        tail = y[full:]
+        lo = np.concatenate([lo, tail.argmin(axis=0, keepdims=True) + full])
+        hi = np.concatenate([hi, tail.argmax(axis=0, keepdims=True) + full])
+    x = np.stack([np.minimum(lo, hi), np.maximum(lo, hi)], axis=1).reshape(-1, *y.shape[1:])
+    if y.ndim == 1:
+        return x, y[x]
+    # Lines of a 2D trace get their own x positions, so plot them column by column
+    return x, np.take_along_axis(y, x, axis=0)
+
+
+def pixel_width(ax):
+    return max(int(ax.get_window_extent().width), 100)
+
+
+def plot_trace(ax, y, **kwargs):
+    """
+    ax.plot of a long trace decimated to the pixel width of the axes
+    """
+    x, y = decimate(y, pixel_width(ax))
+    if y.ndim == 1 or y.shape[1] == 1:
+        return ax.plot(x.reshape(len(x), -1)[:, 0], y.reshape(len(y), -1), **kwargs)
+    label = kwargs.pop("label", None)
+    lines = [ax.plot(x[:, j], y[:, j], **kwargs)[0] for j in range(y.shape[1])]
+    lines[0].set_label(label)
+    return lines
+
+
+def plot_raster(ax, times, ids, max_points=100_000, bins=None, t_range=None, n_neurons=None, **kwargs):
+    """
+    Raster plot; above `max_points` spikes it is drawn as an image of spike counts per
+    (time, neuron) pixel instead of one marker per spike
+    :param times: spike times (iterations)
+    :param ids: neuron indices
+    :param bins: (time bins, neuron bins) of the image; the default is the pixel size of the axes
+    """
+    times, ids = np.asarray(times), np.asarray(ids)
+    if len(times) <= max_points:
+        return ax.scatter(times, ids, marker='|', s=10, **kwargs)
+    extent = ax.get_window_extent()
+    t_bins, n_bins = bins or (max(int(extent.width), 100), max(int(extent.height), 100))
+    t0, t1 = t_range or (times.min(), times.max() + 1)
+    n_neurons = n_neurons or int(ids.max()) + 1
+    n_bins = min(n_bins, n_neurons)
+    # bincount over flat pixel indices is much faster than histogram2d on 10^7 points
+    column = ((times - t0) * t_bins // max(t1 - t0, 1)).clip(0, t_bins - 1)
+    row = (ids.astype(np.int64) * n_bins // n_neurons).clip(0, n_bins - 1)
+    image = np.bincount(row * t_bins + column, minlength=n_bins * t_bins).reshape(n_bins, t_bins)
+    color = kwargs.pop("color", None)
+    kwargs.setdefault("cmap", LinearSegmentedColormap.from_list("raster", ["white", color]) if color else "Greys")
+    return ax.imshow(image, aspect="auto", origin="lower", interpolation="nearest",
+                     extent=(t0, t1, 0, n_neurons), **kwargs)
+
 
 def plot_membrane_potential(ng: NeuronGroup, ng_rec_name: str, title: str, model_idx: int = 3):
     net = ng.network
     fig, (ax1, ax2) = plt.subplots(2, 1, sharex=True)
 
-    ax1.plot(net[ng_rec_name, 0].variables["u"][:, :3], label='potential')
+    plot_trace(ax1, net[ng_rec_name, 0].variables["u"][:, :3], label='potential')
     ax1.axhline(y=ng.behavior[model_idx].init_kwargs['threshold'], color='r', linestyle='--', label='Threshold')
     ax1.axhline(y=ng.behavior[model_idx].init_kwargs['u_reset'], color='black', linestyle='--', label='u_reset')
     ax1.set_xlabel('Time')
@@ -14,7 +105,7 @@ def plot_membrane_potential(ng: NeuronGroup, ng_rec_name: str, title: str, model
     ax1.set_title(f'Membrane Potential')
     ax1.legend()
 
-    ax2.plot(net[ng_rec_name, 0].variables["I"][:, :3], label="current")
+    plot_trace(ax2, net[ng_rec_name, 0].variables["I"][:, :3], label="current")
     ax2.set_xlabel('Time')
     ax2.set_ylabel("I(t)")
     ax2.set_title('Current')
@@ -22,4 +113,4 @@ def plot_membrane_potential(ng: NeuronGroup, ng_rec_name: str, title: str, model
     fig.suptitle(title)
     plt.tight_layout()
 
-    plt.show()
+    show(fig)
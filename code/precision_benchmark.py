@@ -0,0 +1,117 @@
+"""
+Accuracy and memory of the precision modes against float64, one lane per input current.
+
+    python precision_benchmark.py
+
+Measured with DURATION=200, dt=0.1 (rate error: mean relative difference of the firing rates,
+first spike: mean absolute difference of the first spike times; float32 matches float64 here
+because the spike times are quantized to dt). Peak MB and ms/step: a separate process per row with
+MEMORY_SIZE=10**7 neurons and MEMORY_ITERATIONS=10, growth of the peak resident memory including
+initialization (Linux, 1 thread):
+
+    model   precision  compact bytes/neuron  rate error  first spike  peak MB  ms/step
+    LIF     float64    False           21.0      0.0000       0.0000      310      184
+    LIF     float32    False           13.0      0.0000       0.0000      406      290
+    LIF     float32    True            11.0      0.0000       0.0000      233      185
+    LIF     float16    True             9.0      0.0000       0.0048      234      184
+    LIF     bfloat16   True             9.0      0.0020       0.0242      235      259
+    ELIF    float64    False           21.0      0.0000       0.0000      350      313
+    ELIF    float32    False           13.0      0.0000       0.0000      367      797
+    ELIF    float32    True            11.0      0.0000       0.0000      232      528
+    ELIF    float16    True             9.0      0.0000       0.0042      233      512
+    ELIF    bfloat16   True             9.0      0.0019       0.0458      234      493
+    AELIF   float64    False           29.0      0.0000       0.0000      426      478
+    AELIF   float32    False           17.0      0.0000       0.0000      481      712
+    AELIF   float32    True            15.0      0.0000       0.0000      270      280
+    AELIF   float16    True            13.0      0.0000       0.0024      271      292
+    AELIF   bfloat16   True            13.0      0.0000       0.0262      272      371
+
+Half-precision storage keeps u and w with their rounding residual (see models.ACCUMULATED), so increments
+below the resolution of the storage dtype still add up and the rates stay within 0.2% of float64. The compact
+modes step the group in chunks of models.CHUNK_SIZE neurons, so their peak stays at the one of initialization,
+where the state is still drawn in the default dtype; the default modes allocate temporaries of the whole group
+in every step.
+"""
+import multiprocessing
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import torch
+from pymonntorch import *
+
+from currents import ConstantCurrent
+from models import LIF, ELIF, AELIF
+from spikes import SpikeRecorder
+from time_res import TimeResolution
+
+DURATION = 200
+DT = 0.1
+CURRENTS = torch.linspace(5, 40, 64)
+MODELS = {
+    "LIF": (LIF, dict(R=5, tau=10, threshold=-37, u_rest=-67, u_reset=-75, refractory_T=1.0)),
+    "ELIF": (ELIF, dict(R=1.7, tau=10, threshold=-13, rh_threshold=-42, u_rest=-65, u_reset=-73, delta_T=0.1)),
+    "AELIF": (AELIF, dict(a=6.7, b=0.5, R=1.7, tau_m=10, tau_w=100, threshold=-30, rh_threshold=-50,
+                          u_rest=-65, u_reset=-70, delta_T=1)),
+}
+MODES = [("float64", False), ("float32", False), ("float32", True), ("float16", True), ("bfloat16", True)]
+STATE = ("u", "w", "I", "u_residual", "w_residual", "spike", "last_spike", "refractory")
+# Peak memory: a group of MEMORY_SIZE neurons with a constant current, MEMORY_ITERATIONS steps
+MEMORY_SIZE = 10 ** 7
+MEMORY_ITERATIONS = 10
+
+
+def run(model, params, precision, compact):
+    net = Network(behavior={1: TimeResolution(dt=DT)})
+    ng = NeuronGroup(net=net, size=len(CURRENTS), behavior={
+        2: ConstantCurrent(value=CURRENTS),
+        3: model(**params, ratio=0, precision=precision, compact=compact),
+        5: SpikeRecorder(),
+    })
+    net.initialize(info=False)
+    net.simulate_iterations(int(DURATION / DT), measure_block_time=False)
+    store = ng.behavior[5].store
+    rates = torch.as_tensor(store.rates(0, net.iteration + 1, DT), dtype=torch.float64)
+    first = torch.tensor([float(store.train(i)[0]) * DT if len(store.train(i)) else float("nan")
+                          for i in range(ng.size)])
+    nbytes = sum(getattr(ng, name).nbytes for name in STATE if hasattr(ng, name))
+    return rates, first, nbytes / ng.size
+
+
+def peak_memory(model, params, precision, compact):
+    """
+    Growth of the peak resident memory (MB) of a fresh process that builds and runs a large group,
+    initialization included (ru_maxrss is in kilobytes on Linux)
+    """
+    before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    net = Network(behavior={1: TimeResolution(dt=DT)})
+    NeuronGroup(net=net, size=MEMORY_SIZE, behavior={
+        2: ConstantCurrent(value=20.0),
+        3: model(**params, ratio=0, precision=precision, compact=compact),
+    })
+    net.initialize(info=False)
+    begin = time.perf_counter()
+    net.simulate_iterations(MEMORY_ITERATIONS, measure_block_time=False)
+    step = (time.perf_counter() - begin) / MEMORY_ITERATIONS
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - before) / 1024, step * 1000
+
+
+def isolated(function, *args):
+    # A process per measurement, since the peak resident memory of a process never decreases
+    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return pool.submit(function, *args).result()
+
+
+if __name__ == "__main__":
+    print(f"{'model':<7} {'precision':<10} {'compact':<7} {'bytes/neuron':>12} {'rate error':>11} {'first spike':>12} "
+          f"{'peak MB':>8} {'ms/step':>8}")
+    for name, (model, params) in MODELS.items():
+        reference, reference_first, _ = run(model, params, "float64", False)
+        firing = reference > 0
+        for precision, compact in MODES:
+            rates, first, nbytes = run(model, params, precision, compact)
+            rate_error = ((rates - reference).abs()[firing] / reference[firing]).mean()
+            first_error = (first - reference_first).abs().nanmean()
+            peak, step = isolated(peak_memory, model, params, precision, compact)
+            print(f"{name:<7} {precision:<10} {str(compact):<7} {nbytes:>12.1f} {rate_error:>11.4f} {first_error:>12.4f} "
+                  f"{peak:>8.0f} {step:>8.0f}")
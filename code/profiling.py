@@ -0,0 +1,121 @@
+import json
+import os
+import time
+
+import numpy as np
+import torch
+
+
+# Resident size of the process, on Linux
+STATM = "/proc/self/statm"
+
+
+def allocated_bytes():
+    """
+    Bytes allocated by torch on the GPU, or the resident size of the process on the CPU
+    :return: number of bytes, or None where neither can be read (CPU without /proc, e.g. macOS or Windows)
+    """
+    if torch.cuda.is_available() and torch.cuda.is_initialized():
+        return torch.cuda.memory_allocated()
+    try:
+        with open(STATM) as f:
+            pages = int(f.read().split()[1])
+    except OSError:
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+class Profiler:
+    """
+    Time-steps a network while measuring every behavior call: wall time, call count and
+    allocated bytes per (group, key, behavior). Steps that take more than `spike_factor` times
+    the median of the last `window` steps are sampled with their per-behavior breakdown.
+
+    Args:
+        memory (bool): measure allocated bytes per call. The default is True; it is turned off where
+            allocated_bytes cannot measure them.
+        spike_factor (float): threshold of a latency spike relative to the recent median step time.
+        window (int): number of recent steps the median is taken over.
+        max_samples (int): latency spikes to keep.
+        trace_steps (int): steps written to the Chrome trace besides the sampled spikes.
+    """
+
+    def __init__(self, memory=True, spike_factor=3.0, window=100, max_samples=100, trace_steps=1000):
+        self.memory = memory
+        self.spike_factor = spike_factor
+        self.window = window
+        self.max_samples = max_samples
+        self.trace_steps = trace_steps
+        self.stats = {}
+        self.step_times = []
+        self.samples = []
+        self.trace = []
+        self.origin = None
+
+    def run(self, net, iterations):
+        if self.origin is None:
+            self.origin = time.perf_counter()
+        if self.memory and allocated_bytes() is None:
+            self.memory = False
+        sync = torch.cuda.synchronize if torch.cuda.is_available() and torch.cuda.is_initialized() else None
+        for _ in range(iterations):
+            self.step(net, sync)
+
+    def step(self, net, sync=None):
+        net.iteration += 1
+        calls = []
+        step_start = time.perf_counter()
+        for key, parent, behavior in net.sorted_behavior_execution_list:
+            if not behavior.behavior_enabled or behavior.empty_iteration_function:
+                continue
+            before = allocated_bytes() if self.memory else 0
+            start = time.perf_counter()
+            behavior(parent)
+            if sync:
+                sync()
+            end = time.perf_counter()
+            grown = max(allocated_bytes() - before, 0) if self.memory else 0
+
+            name = (getattr(parent, "tag", "network"), key, type(behavior).__name__)
+            entry = self.stats.setdefault(name, [0.0, 0, 0])
+            entry[0] += end - start
+            entry[1] += 1
+            entry[2] += grown
+            calls.append((name, start, end))
+        step_time = time.perf_counter() - step_start
+
+        recent = self.step_times[-self.window:]
+        self.step_times.append(step_time)
+        spike = len(recent) >= 10 and step_time > self.spike_factor * np.median(recent)
+        if spike and len(self.samples) < self.max_samples:
+            self.samples.append({"iteration": net.iteration, "step_ms": step_time * 1e3,
+                                 "behaviors": {f"{g}[{k}] {b}": (e - s) * 1e3 for (g, k, b), s, e in calls}})
+        if len(self.step_times) <= self.trace_steps or spike:
+            self.trace += [{"name": f"[{k}] {b}", "cat": "behavior", "ph": "X", "pid": 0, "tid": str(g),
+                            "ts": (s - self.origin) * 1e6, "dur": (e - s) * 1e6, "args": {"iteration": net.iteration}}
+                           for (g, k, b), s, e in calls]
+
+    def summary(self):
+        """
+        Table of the behaviors by total time, followed by the step latency percentiles
+        """
+        total = sum(entry[0] for entry in self.stats.values()) or 1.0
+        lines = [f"{'group':<20} {'key':>4} {'behavior':<16} {'calls':>8} {'total [ms]':>11} "
+                 f"{'mean [us]':>10} {'share':>7} {'alloc [KB]':>11}"]
+        for (group, key, name), (seconds, calls, grown) in sorted(self.stats.items(), key=lambda item: -item[1][0]):
+            alloc = f"{grown / 1024:>11.1f}" if self.memory else f"{'-':>11}"
+            lines.append(f"{str(group):<20} {key:>4} {name:<16} {calls:>8} {seconds * 1e3:>11.2f} "
+                         f"{seconds / calls * 1e6:>10.1f} {seconds / total:>7.1%} {alloc}")
+        if self.step_times:
+            p50, p90, p99 = np.percentile(self.step_times, [50, 90, 99]) * 1e3
+            lines.append(f"{len(self.step_times)} steps, latency p50 {p50:.3f} ms, p90 {p90:.3f} ms, p99 {p99:.3f} ms, "
+                         f"{len(self.samples)} spike(s) sampled")
+        return "\n".join(lines)
+
+    def save_trace(self, filename):
+        """
+        Write the recorded behavior calls as Chrome trace-event JSON (chrome://tracing, Perfetto)
+        """
+        with open(filename, "w") as f:
+            json.dump({"traceEvents": self.trace, "displayTimeUnit": "ms",
+                       "otherData": {"latency_spikes": self.samples}}, f)
@@ -0,0 +1,168 @@
+import os
+import tempfile
+
+import numpy as np
+import torch
+from pymonntorch import *
+
+
+class ChunkedArray:
+    """
+    Append-only [time, neuron] array stored as .npy chunks on disk, of `chunk_size` rows except
+    those written by an early flush. Slicing loads only the chunks that hold the requested rows
+    (memory-mapped).
+    """
+
+    def __init__(self, path, width, dtype, chunk_size, temporary=None):
+        self.path = path
+        self.width = width
+        self.dtype = np.dtype(dtype)
+        self.chunk_size = chunk_size
+        # Keeps a temporary directory (and its chunks) alive as long as the array
+        self.temporary = temporary
+        self.files = []
+        # Row index at which every chunk file ends
+        self.ends = []
+        self.buffer = np.empty((chunk_size, width), dtype=self.dtype)
+        self.filled = 0
+
+    def append(self, row):
+        self.buffer[self.filled] = row
+        self.filled += 1
+        if self.filled == self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.filled == 0:
+            return
+        file = f"{self.path}_{len(self.files):06d}.npy"
+        np.save(file, self.buffer[:self.filled])
+        self.files.append(file)
+        self.ends.append(len(self))
+        self.filled = 0
+
+    def chunk(self, k):
+        if k < len(self.files):
+            return np.load(self.files[k], mmap_mode='r')
+        return self.buffer[:self.filled]
+
+    def start(self, k):
+        return self.ends[k - 1] if k > 0 else 0
+
+    def __len__(self):
+        return (self.ends[-1] if self.ends else 0) + self.filled
+
+    @property
+    def shape(self):
+        return len(self), self.width
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        rows, rest = key[0], key[1:]
+        if isinstance(rows, (int, np.integer)):
+            rows = rows + len(self) if rows < 0 else rows
+            if not 0 <= rows < len(self):
+                raise IndexError(f"Row {rows} is out of range for {len(self)} rows.")
+            k = int(np.searchsorted(self.ends, rows, side='right'))
+            return self.chunk(k)[(rows - self.start(k),) + rest]
+
+        indices = np.arange(len(self))[rows]
+        # The buffer is chunk len(self.files)
+        chunk_ids = np.searchsorted(self.ends, indices, side='right')
+        parts = []
+        # Walk runs of consecutive rows that live in the same chunk
+        bounds = np.flatnonzero(np.diff(chunk_ids)) + 1
+        for run in np.split(np.arange(len(indices)), bounds):
+            if len(run) == 0:
+                continue
+            k = chunk_ids[run[0]]
+            parts.append(np.asarray(self.chunk(k)[(indices[run] - self.start(k),) + rest]))
+        if not parts:
+            return np.empty((0, self.width), dtype=self.dtype)[(slice(None),) + rest]
+        return np.concatenate(parts)
+
+    def __array__(self, dtype=None, copy=None):
+        result = self[:]
+        return result if dtype is None else result.astype(dtype)
+
+
+class StreamRecorder(Recorder):
+    """
+    Recorder with bounded memory: every variable is written in chunks of `chunk_size` rows
+    to `directory` and exposed as a lazy ChunkedArray in `variables`.
+
+    Args:
+        variables (list of str): attribute names of the neuron group to record.
+        gap_width (int): record every `gap_width` iterations, as for Recorder.
+        neurons (list of int): indices of the neurons to record. The default is all neurons.
+        dtype (str): storage dtype, e.g. "float16". The default is "float32".
+        chunk_size (int): rows kept in memory before a chunk is written. The default is 4096.
+        directory (str): where the chunks go. The default is a new temporary directory, removed by
+            close(), or once the recorder and its arrays are garbage collected, or at exit.
+    """
+
+    def __init__(self, *args, **kwargs):
+        Behavior.__init__(self, *args, **kwargs)
+        self.variables = {}
+
+    def initialize(self, ng):
+        Behavior.initialize(self, ng)
+        variables = self.parameter("variables", None, required=True)
+        if isinstance(variables, str):
+            variables = [variables]
+        self.gap_width = self.parameter("gap_width", 0)
+        self.max_length = None
+        self.neurons = self.parameter("neurons", None)
+        self.dtype = self.parameter("dtype", "float32")
+        self.chunk_size = self.parameter("chunk_size", 4096)
+        self.directory = self.parameter("directory", None)
+        self.temporary = None
+        if self.directory is None:
+            self.temporary = tempfile.TemporaryDirectory(prefix="recorder_")
+            self.directory = self.temporary.name
+        self.counter = 0
+        self.new_data_available = False
+
+        os.makedirs(self.directory, exist_ok=True)
+        width = ng.size if self.neurons is None else len(self.neurons)
+        self.variables = {v: ChunkedArray(os.path.join(self.directory, v), width, self.dtype, self.chunk_size,
+                                          self.temporary) for v in variables}
+
+    def forward(self, ng):
+        if not ng.recording:
+            return
+        self.counter += 1
+        if self.counter < self.gap_width:
+            return
+        self.counter = 0
+        self.new_data_available = True
+        for v, array in self.variables.items():
+            data = getattr(ng, v)
+            if self.neurons is not None:
+                data = data[self.neurons]
+            data = data.detach().cpu()
+            if data.dtype == torch.bfloat16:
+                # numpy has no bfloat16; it is stored in the recorder's dtype anyway
+                data = data.float()
+            array.append(data.numpy())
+
+    def flush(self):
+        for array in self.variables.values():
+            array.flush()
+
+    def clear_recorder(self):
+        # Only the chunks written by this recorder: a user-given directory may hold other files
+        for array in self.variables.values():
+            for file in array.files:
+                if os.path.exists(file):
+                    os.remove(file)
+        for v, array in self.variables.items():
+            self.variables[v] = ChunkedArray(array.path, array.width, array.dtype, array.chunk_size, self.temporary)
+
+    def close(self):
+        """
+        Remove the temporary directory of the chunks; a user-given directory is kept
+        """
+        if self.temporary is not None:
+            self.temporary.cleanup()
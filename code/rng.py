@@ -0,0 +1,147 @@
+"""
+Counter-based random numbers (Philox4x32-10, Salmon et al. 2011). A value is a pure function of
+(seed, stream, neuron id, iteration), so noise does not depend on how a run is chunked, block-stepped,
+sharded or parallelized, and any block of it can be generated at once.
+
+The counter of a neuron is (iteration // 4 low, high, neuron id, stream), its four output words are
+the values of four consecutive iterations, and the key is the 64-bit seed. Streams separate the
+behaviors that draw noise for the same neurons.
+"""
+import zlib
+
+import torch
+
+MASK = 0xFFFFFFFF
+MULTIPLIERS = (0xD2511F53, 0xCD9E8D57)
+WEYL = (0x9E3779B9, 0xBB67AE85)
+ROUNDS = 10
+
+
+def mulhilo(a, b):
+    """
+    High and low 32 bits of a * b for uint32 values held in int64 tensors. The product may overflow
+    int64, which wraps around and leaves both halves intact.
+    """
+    product = a * b
+    return (product >> 32) & MASK, product & MASK
+
+
+def philox(counter, key):
+    """
+    Philox4x32-10 block function
+    :param counter: four int64 tensors of uint32 words (broadcastable)
+    :param key: two python ints of 32 bits
+    :return: four int64 tensors of uint32 random words
+    """
+    c0, c1, c2, c3 = counter
+    k0, k1 = key
+    for i in range(ROUNDS):
+        if i:
+            k0, k1 = (k0 + WEYL[0]) & MASK, (k1 + WEYL[1]) & MASK
+        hi0, lo0 = mulhilo(c0, MULTIPLIERS[0])
+        hi1, lo1 = mulhilo(c2, MULTIPLIERS[1])
+        c0, c1, c2, c3 = hi1 ^ c1 ^ k0, lo1, hi0 ^ c3 ^ k1, lo0
+    return c0, c1, c2, c3
+
+
+def stream_id(name):
+    """
+    32-bit stream of a name, e.g. of a behavior class
+    """
+    return zlib.crc32(str(name).encode())
+
+
+def draw_seed():
+    """
+    Seed for a counter-based stream from the global torch generator, so that Simulation.simulate(seed=...)
+    still fixes the noise of behaviors without a seed of their own
+    """
+    return int(torch.randint(0, 2 ** 62, (1,)).item())
+
+
+def neuron_ids(ng):
+    """
+    Global ids of the neurons of a group; a group holding a slice of a larger population sets `ng.id_offset`,
+    one holding any subset of it their ids in `ng.global_ids`
+    """
+    if hasattr(ng, "global_ids"):
+        return ng.global_ids
+    return torch.arange(ng.size, dtype=torch.int64, device=ng.device) + getattr(ng, "id_offset", 0)
+
+
+def random_words(seed, stream, ids, counters):
+    """
+    :param ids: int64 tensor of neuron ids, shape (N,)
+    :param counters: int64 tensor of iteration counters, shape (G,)
+    :return: four int64 tensors of uint32 words, shape (G, N)
+    """
+    counters = counters.reshape(-1, 1)
+    counter = (counters & MASK, (counters >> 32) & MASK, (ids & MASK).reshape(1, -1),
+               torch.full((1, 1), stream & MASK, dtype=torch.int64, device=ids.device))
+    return philox(counter, (seed & MASK, (seed >> 32) & MASK))
+
+
+def counter_values(seed, stream, ids, iterations, transform):
+    """
+    Every block function call yields four values per neuron, those of four consecutive iterations
+    :param transform: maps the four words of a call to four float64 values
+    :return: float64 tensor of shape (T, N)
+    """
+    iterations = torch.as_tensor(iterations, dtype=torch.int64, device=ids.device).flatten()
+    counters, inverse = torch.unique(iterations // 4, return_inverse=True)
+    values = torch.stack(transform(*random_words(seed, stream, ids, counters)), dim=1)
+    return values[inverse, iterations % 4]
+
+
+def unit(word):
+    return word.to(torch.float64) * 2.0 ** -32
+
+
+def uniform(seed, stream, ids, iterations):
+    """
+    Uniform float64 values in [0, 1) with 32 random bits, shape (T, N)
+    """
+    return counter_values(seed, stream, ids, iterations, lambda *words: [unit(w) for w in words])
+
+
+def box_muller(w0, w1, w2, w3):
+    values = []
+    for a, b in ((w0, w1), (w2, w3)):
+        radius = torch.sqrt(-2 * torch.log1p(-unit(a)))
+        angle = 2 * torch.pi * unit(b)
+        values += [radius * torch.cos(angle), radius * torch.sin(angle)]
+    return values
+
+
+def normal(seed, stream, ids, iterations):
+    """
+    Standard normal float64 values (Box-Muller), shape (T, N)
+    """
+    return counter_values(seed, stream, ids, iterations, box_muller)
+
+
+class NoiseBlocks:
+    """
+    Serves the noise of one iteration from blocks of `rows` iterations, aligned to multiples of `rows`
+    and generated at once. The seed is passed on every call, so a behavior whose seed was restored
+    from a checkpoint is served from the right stream.
+    """
+
+    def __init__(self, stream, kind="uniform", rows=None):
+        self.stream = stream
+        self.generate = {"uniform": uniform, "normal": normal}[kind]
+        self.rows = rows
+        self.seed = None
+        self.start = None
+        self.block = None
+
+    def row(self, ng, seed, iteration):
+        if self.rows is None:
+            # Blocks of about 2^17 values stay in cache; 4 iterations share a block function call
+            self.rows = max(4, min(256, 2 ** 17 // ng.size // 4 * 4))
+        start = iteration - iteration % self.rows
+        if seed != self.seed or start != self.start:
+            iterations = torch.arange(start, start + self.rows, dtype=torch.int64, device=ng.device)
+            self.block = self.generate(seed, self.stream, neuron_ids(ng), iterations)
+            self.seed, self.start = seed, start
+        return self.block[iteration - start]
@@ -0,0 +1,207 @@
+"""
+Headless batch runner for declarative scenario files.
+
+    python runner.py scenarios/lif_step.json --out runs
+    python runner.py scenarios/*.json --out runs --plot
+
+A scenario file (JSON, or TOML) holds one scenario or a list of them. Scenarios are the job specs of
+parallel.py, with shorthands for the usual layout of a group:
+
+    {
+        "name": "lif_step",
+        "dt": 1.0,
+        "iterations": 100,
+        "seed": 0,                                  # optional, defaults to --seed + scenario index
+        "simulate": {"block_size": 10},             # optional keyword arguments of Simulation.simulate
+        "groups": [{
+            "tag": "lif",
+            "size": 1,                              # or "sweep": [[2, "value", [0, 5, 10]]]
+            "current": ["currents.StepCurrent", {"value": 10, "t_start": 25, "t_end": 75}],
+            "model": ["models.LIF", {"R": 5, "tau": 10, "threshold": -37, "u_rest": -67, "u_reset": -75}],
+            "record": ["u", "I"],
+            "spikes": true,
+            "behavior": {"6": ["online_stats.OnlineStatistics", {}]}
+        }]
+    }
+
+"current", "model", "record" and "spikes" fill the behavior keys 2, 3, 4 (Recorder) and 5 (SpikeRecorder);
+"behavior" adds or overrides any key.
+
+Every scenario writes <out>/<name>.npz, one array per "tag/key/variable" (spikes as int32 (time, id) rows),
+and <out>/<name>.json with its seed, iterations, sweeps and timings. A scenario runs through
+Simulation.simulate as a job of parallel.py does, with the same options (see parallel.simulate_options).
+The runner reports the time spent importing (once per process), building, initializing and simulating,
+and writing separately. Only the
+standard library is imported before the scenarios are read, and matplotlib only with --plot, so
+many short scenarios are best passed to one invocation.
+"""
+import argparse
+import json
+import os
+import time
+
+SHORTHANDS = {"current": 2, "model": 3}
+
+
+def read_scenarios(filename):
+    """
+    Scenarios of a .json or .toml file, a single one or a list (a TOML file lists them under "scenario")
+    """
+    if filename.endswith(".toml"):
+        import tomllib
+
+        with open(filename, "rb") as f:
+            scenarios = tomllib.load(f)
+        scenarios = scenarios.get("scenario", scenarios)
+    else:
+        with open(filename) as f:
+            scenarios = json.load(f)
+    scenarios = scenarios if isinstance(scenarios, list) else [scenarios]
+    base = os.path.splitext(os.path.basename(filename))[0]
+    for i, scenario in enumerate(scenarios):
+        scenario.setdefault("name", base if len(scenarios) == 1 else f"{base}_{i}")
+    return scenarios
+
+
+def expand(scenario):
+    """
+    Job spec of a scenario (see parallel.py), with its group shorthands turned into behaviors
+    """
+    groups = []
+    for group in scenario["groups"]:
+        group = dict(group)
+        behavior = {}
+        for name, key in SHORTHANDS.items():
+            if name in group:
+                behavior[str(key)] = group.pop(name)
+        if group.get("record"):
+            behavior["4"] = ["Recorder", {"variables": group.pop("record")}]
+        if group.pop("spikes", False):
+            behavior["5"] = ["spikes.SpikeRecorder", {}]
+        behavior.update({str(key): value for key, value in group.get("behavior", {}).items()})
+        group["behavior"] = behavior
+        groups.append(group)
+    return dict(scenario, groups=groups)
+
+
+def compact(data):
+    """
+    Integer arrays in int32 when their values fit, e.g. spike times and ids
+    """
+    import numpy as np
+
+    if data.dtype.kind in "iu" and data.size and np.iinfo(np.int32).min <= data.min() and data.max() <= np.iinfo(np.int32).max:
+        return data.astype(np.int32)
+    return data
+
+
+def run_scenario(spec, seed, out, plot=False, imported=None):
+    """
+    Build, run and save one expanded scenario
+    :param imported: import time of the process, recorded in the manifest
+    :return: manifest dict
+    """
+    import numpy as np
+    import torch
+    from parallel import build_simulation, recorded_arrays, simulate_options
+
+    start = time.perf_counter()
+    torch.manual_seed(seed)
+    np.random.seed(seed)
+    sim = build_simulation(spec)
+    setup = time.perf_counter()
+
+    sim.simulate(spec["iterations"], info=False, **simulate_options(spec))
+    simulated = time.perf_counter()
+
+    arrays = {}
+    for ng in sim.net.NeuronGroups:
+        for key, variable, data in recorded_arrays(ng):
+            arrays[f"{ng.tag}/{key}/{variable}"] = compact(data)
+    name = spec["name"]
+    np.savez(os.path.join(out, name + ".npz"), **arrays)
+    if plot:
+        save_figures(sim, os.path.join(out, name))
+    written = time.perf_counter()
+
+    manifest = {
+        "name": name, "seed": seed, "iterations": spec["iterations"], "dt": spec.get("dt", 1.0),
+        "sweeps": {tag: {"axes": sweep["axes"], "values": [v.tolist() for v in sweep["values"]]}
+                   for tag, sweep in sim.sweeps.items()},
+        "arrays": {key: {"shape": list(data.shape), "dtype": str(data.dtype)} for key, data in arrays.items()},
+        "time": {"import": imported, "setup": setup - start, "simulate": simulated - setup, "write": written - simulated},
+    }
+    with open(os.path.join(out, name + ".json"), "w") as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+
+def save_figures(sim, prefix, model_idx=3, record_idx=4):
+    """
+    Membrane potential figure of every group that records u and I, saved as <prefix>_<tag>.pdf
+    """
+    from plots import set_headless
+
+    set_headless()
+    for ng in sim.net.NeuronGroups:
+        recorder = ng.behavior.get(record_idx)
+        if recorder is None or not {"u", "I"} <= set(getattr(recorder, "variables", {})):
+            continue
+        ng.plot_membrane_potential(ng.tag, model_idx, record_idx, save=True, filename=f"{prefix}_{ng.tag}.pdf")
+
+
+def load_output(out, name):
+    """
+    Open the result of a scenario
+    :return: manifest dict whose "data" maps "tag/key/variable" to arrays
+    """
+    import numpy as np
+
+    with open(os.path.join(out, name + ".json")) as f:
+        manifest = json.load(f)
+    with np.load(os.path.join(out, name + ".npz")) as data:
+        manifest["data"] = dict(data)
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenarios", nargs="+", help="scenario files (.json or .toml)")
+    parser.add_argument("--out", default="runs", help="output directory")
+    parser.add_argument("--seed", type=int, default=0, help="seed of scenario i without its own is seed + i")
+    parser.add_argument("--threads", type=int, default=None, help="torch intra-op threads")
+    parser.add_argument("--plot", action="store_true", help="also save membrane potential figures")
+    parser.add_argument("--quiet", action="store_true")
+    args = parser.parse_args(argv)
+
+    specs = [expand(scenario) for filename in args.scenarios for scenario in read_scenarios(filename)]
+    os.makedirs(args.out, exist_ok=True)
+
+    start = time.perf_counter()
+    import torch
+    import simulate  # noqa: F401, imported here so that its cost is reported as import time
+    from parallel import resolve_behavior, simulate_options
+
+    if args.threads:
+        torch.set_num_threads(args.threads)
+    for spec in specs:
+        simulate_options(spec)
+        for group in spec["groups"]:
+            for cls, _ in group["behavior"].values():
+                resolve_behavior(cls)
+    imported = time.perf_counter() - start
+    if not args.quiet:
+        print(f"import {imported:.3f} s")
+
+    manifests = []
+    for i, spec in enumerate(specs):
+        manifest = run_scenario(spec, spec.get("seed", args.seed + i), args.out, args.plot, imported)
+        manifests.append(manifest)
+        if not args.quiet:
+            print(f"{manifest['name']}: " + ", ".join(f"{stage} {seconds:.3f} s" for stage, seconds in
+                                                      manifest["time"].items() if stage != "import"))
+    return manifests
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Throughput of one LIF population sharded over 1, 2, 4 and 8 worker processes (see sharded.py),
+against the same population as a single NeuronGroup in this process.
+
+    python shard_benchmark.py
+    python shard_benchmark.py --neurons 100000000 --steps 50 --workers 4 8
+
+Throughput is in neuron updates per second over the timed steps; setup is the time to allocate the shared
+state and start and initialize the shards. The baseline uses every core through torch's intra-op threads,
+each shard a single thread.
+
+Measured on a 1-core, 5 GB machine (10^7 neurons, 50 steps, fused LIF with spike recording):
+
+    mode        workers  setup s  step ms  Mupdates/s  speedup
+    baseline          1     0.42    202.0        49.5     1.00
+    sharded           1    10.03    205.9        48.6     0.98
+    sharded           2    12.66    187.8        53.2     1.08
+    sharded           4    17.31    193.2        51.8     1.05
+    sharded           8    30.51    187.3        53.4     1.08
+
+With a single core the shards can only take turns, so this table measures the cost of sharding rather
+than its gain: the shared-memory state and a barrier per step cost about 2 %, and smaller shards even
+run slightly faster per neuron. On a machine with more cores than workers the step time divides by the
+number of workers until memory bandwidth runs out. Setup is dominated by spawning the workers (each imports
+torch) and grows with their number on one core. The population is bounded by RAM rather than by a
+process: 10^8 neurons take 1.3 GB of shared state.
+
+The current has no noise: at this size the per-step counter-based noise (rng.py) allocates several GB of
+temporaries per process and would dominate the step.
+"""
+import argparse
+import time
+
+import torch
+from pymonntorch import *
+
+from sharded import ShardedGroup, build_behavior
+from time_res import TimeResolution
+
+LIF_PARAMS = dict(R=5, tau=10, threshold=-37, u_rest=-67, u_reset=-75, refractory_T=2.0, fused=True)
+BEHAVIOR = {
+    2: ("currents.ConstantCurrent", {"value": 7.0}),
+    3: ("models.LIF", LIF_PARAMS),
+    5: ("spikes.SpikeRecorder", {}),
+}
+
+
+def baseline(neurons, steps, warmup):
+    start = time.perf_counter()
+    net = Network(behavior={1: TimeResolution(dt=1.0)})
+    NeuronGroup(net=net, size=neurons, behavior=build_behavior(BEHAVIOR))
+    net.initialize(info=False)
+    setup = time.perf_counter() - start
+    net.simulate_iterations(warmup, measure_block_time=False)
+    start = time.perf_counter()
+    net.simulate_iterations(steps, measure_block_time=False)
+    return setup, (time.perf_counter() - start) / steps
+
+
+def sharded(neurons, steps, warmup, workers):
+    start = time.perf_counter()
+    with ShardedGroup(neurons, BEHAVIOR, workers=workers) as group:
+        setup = time.perf_counter() - start
+        group.advance(warmup)
+        start = time.perf_counter()
+        group.advance(steps)
+        return setup, (time.perf_counter() - start) / steps
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--neurons", type=int, default=10_000_000)
+    parser.add_argument("--steps", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    print(f"{'mode':<10} {'workers':>8} {'setup s':>8} {'step ms':>8} {'Mupdates/s':>11} {'speedup':>8}")
+    setup, step = baseline(args.neurons, args.steps, args.warmup)
+    reference = step
+    print(f"{'baseline':<10} {torch.get_num_threads():>8} {setup:>8.2f} {step * 1e3:>8.1f} "
+          f"{args.neurons / step / 1e6:>11.1f} {1.0:>8.2f}")
+    for workers in args.workers:
+        setup, step = sharded(args.neurons, args.steps, args.warmup, workers)
+        print(f"{'sharded':<10} {workers:>8} {setup:>8.2f} {step * 1e3:>8.1f} "
+              f"{args.neurons / step / 1e6:>11.1f} {reference / step:>8.2f}")
@@ -0,0 +1,265 @@
+"""
+Sharded simulation of one large population across the processes of the local machine.
+
+    with ShardedGroup(10 ** 7, behavior, workers=4, dt=1.0) as group:
+        group.advance(1000)
+        u = group.state("u")          # global membrane potentials, read from shared memory
+        store = group.spikes()        # SpikeStore of the whole population, global neuron ids
+
+The behaviors are given as in the job specs of parallel.py ({key: ("module.Class", kwargs)}). Each
+worker runs a NeuronGroup holding the neurons [start, stop) of the population. Its state (`u`, `w`,
+`I`, `last_spike`, `spike`, ...) lives in slices of population-sized tensors in shared memory, which the
+parent can read between calls. The workers advance the TimeResolution clock in lockstep (a barrier every
+`sync_every` iterations). Their spikes are merged into one stream of global neuron ids.
+
+A shard sets `ng.id_offset`, so the counter-based noise of the currents (see rng.py) is the same whatever
+the number of workers. The initial potentials are redrawn from such a stream as well, so a population
+gives the same spikes on 1 or 8 workers, given behaviors without a seed of their own seeded by `seed`.
+"""
+import queue
+import time
+import traceback
+
+import numpy as np
+import torch
+import torch.multiprocessing
+from pymonntorch import *
+
+from parallel import behavior_key, resolve_behavior
+from rng import neuron_ids, stream_id, uniform
+from spikes import SpikeRecorder, SpikeStore
+from time_res import TimeResolution
+
+# Per-neuron attributes kept in shared memory, when a group has them
+SHARED = ("u", "w", "I", "u_residual", "w_residual", "last_spike", "spike", "refractory")
+SHARD_KEY = 3.5
+
+
+def shard_bounds(size, workers):
+    """
+    (start, stop) of the contiguous neuron range of every shard
+    """
+    edges = np.linspace(0, size, workers + 1).round().astype(np.int64)
+    return list(zip(edges[:-1].tolist(), edges[1:].tolist()))
+
+
+class ShardState(Behavior):
+    """
+    Binds the state of a shard to its slice of the shared population tensors and keeps the shards in
+    lockstep. It runs after the model (key 3.5), copies back the attributes that the model replaced
+    instead of updating in place (fused models update the shared memory directly) and waits at the barrier.
+
+    Args:
+        shared (dict): name -> population-sized tensor in shared memory
+        start (int): global id of the first neuron of the shard
+        seed (int): seed of the initial potentials
+        barrier: multiprocessing.Barrier of all shards, or None
+        sync_every (int): iterations between barriers. The default is 1.
+        model_idx (int): key of the model behavior. The default is 3.
+    """
+
+    def initialize(self, ng):
+        self.shared = self.parameter("shared", None, required=True)
+        self.start = self.parameter("start", 0)
+        self.seed = self.parameter("seed", 0)
+        self.barrier = self.parameter("barrier", None)
+        self.sync_every = self.parameter("sync_every", 1)
+        model = ng.behavior[self.parameter("model_idx", 3)]
+
+        # Same draw as the models, but from the global neuron id instead of the global generator
+        u = model.u_reset + uniform(self.seed, stream_id("initial u"), neuron_ids(ng), [0])[0] * (
+                model.threshold - model.u_reset) * model.ratio
+        spike = u > model.threshold
+        ng.u = torch.where(spike, model.u_reset, u).to(ng.u.dtype)
+        if hasattr(ng, "spike"):
+            ng.spike = spike
+
+        self.views = {}
+        for name, tensor in self.shared.items():
+            local = getattr(ng, name)
+            if local.dtype != tensor.dtype:
+                raise ValueError(f"Shard attribute {name} is {local.dtype}, the shared tensor is {tensor.dtype}.")
+            self.views[name] = tensor[self.start:self.start + ng.size]
+            self.views[name].copy_(local)
+            setattr(ng, name, self.views[name])
+
+    def forward(self, ng):
+        for name, view in self.views.items():
+            local = getattr(ng, name)
+            if local.data_ptr() != view.data_ptr():
+                view.copy_(local)
+                setattr(ng, name, view)
+        if self.barrier is not None and ng.network.iteration % self.sync_every == 0:
+            self.barrier.wait()
+
+
+def build_behavior(spec):
+    return {behavior_key(key): resolve_behavior(cls)(**kwargs) for key, (cls, kwargs) in spec.items()}
+
+
+def probe(behavior, dt):
+    """
+    Dtypes of the shared attributes of a group with these behaviors, from a one-neuron copy
+    """
+    net = Network(behavior={1: TimeResolution(dt=dt)})
+    ng = NeuronGroup(net=net, size=1, behavior=build_behavior(behavior))
+    net.initialize(info=False)
+    return {name: getattr(ng, name).dtype for name in SHARED if getattr(getattr(ng, name, None), "shape", None) == (1,)}
+
+
+def shard_worker(index, start, stop, spec, shared, barrier, commands, results):
+    try:
+        torch.set_num_threads(spec["threads"])
+        # The same seed in every shard: seeds drawn by the behaviors then agree across shards
+        torch.manual_seed(spec["seed"])
+        np.random.seed(spec["seed"])
+        behavior = build_behavior(spec["behavior"])
+        behavior[SHARD_KEY] = ShardState(shared={name: shared[name] for name in shared}, start=start,
+                                         seed=spec["seed"], barrier=barrier, sync_every=spec["sync_every"])
+        net = Network(behavior={1: TimeResolution(dt=spec["dt"])})
+        ng = NeuronGroup(net=net, size=stop - start, behavior=behavior)
+        ng.id_offset = start
+        net.initialize(info=False)
+        recorders = [b for b in ng.behavior.values() if isinstance(b, SpikeRecorder)]
+        results.put((index, "ready", None))
+
+        while True:
+            command, argument = commands.get()
+            if command == "advance":
+                begin = time.perf_counter()
+                net.simulate_iterations(argument, measure_block_time=False)
+                results.put((index, "done", time.perf_counter() - begin))
+            elif command == "spikes":
+                store = recorders[0].store
+                offsets = None if store.log_offsets is None else store.log_offsets[:store.count].copy()
+                results.put((index, "spikes", (store.log_times[:store.count].copy(),
+                                               store.log_ids[:store.count] + start, offsets)))
+            elif command == "close":
+                return
+    except Exception:
+        if barrier is not None:
+            barrier.abort()
+        results.put((index, "error", traceback.format_exc()))
+
+
+class ShardedGroup:
+    """
+    One logical neuron group of `size` neurons partitioned across worker processes
+
+    Args:
+        size (int): number of neurons
+        behavior (dict): key -> ("module.Class", kwargs) of the group, without a clock. A SpikeRecorder is
+            added at key 5 unless the group has one.
+        workers (int): number of processes. The default is 2.
+        dt (float): time step of the TimeResolution clock of every shard. The default is 1.0.
+        seed (int): seed of every shard. The default is 0.
+        threads (int): torch intra-op threads per worker. The default is 1.
+        sync_every (int): iterations between barriers. The default is 1.
+    """
+
+    def __init__(self, size, behavior, workers=2, dt=1.0, seed=0, threads=1, sync_every=1):
+        self.size = size
+        self.behavior = dict(behavior)
+        if not any(resolve_behavior(cls) is SpikeRecorder for cls, _ in self.behavior.values()):
+            self.behavior.setdefault(5, ("spikes.SpikeRecorder", {}))
+        self.workers = workers
+        self.dt = dt
+        self.seed = seed
+        self.threads = threads
+        self.sync_every = sync_every
+        self.bounds = shard_bounds(size, workers)
+        self.iteration = 0
+        self.processes = []
+
+    def start(self):
+        """
+        Allocate the shared state and start and initialize the shards
+        """
+        self.shared = {name: torch.empty(self.size, dtype=dtype).share_memory_()
+                       for name, dtype in probe(self.behavior, self.dt).items()}
+        context = torch.multiprocessing.get_context("spawn")
+        barrier = context.Barrier(self.workers) if self.workers > 1 else None
+        self.results = context.Queue()
+        self.commands = [context.Queue() for _ in self.bounds]
+        spec = {"behavior": self.behavior, "dt": self.dt, "seed": self.seed, "threads": self.threads,
+                "sync_every": self.sync_every}
+        for index, (start, stop) in enumerate(self.bounds):
+            process = context.Process(target=shard_worker, daemon=True, args=(
+                index, start, stop, spec, self.shared, barrier, self.commands[index], self.results))
+            process.start()
+            self.processes.append(process)
+        self.collect("ready")
+        return self
+
+    def collect(self, expected):
+        """
+        Wait for the reply of every shard
+        :return: list of the replies, in shard order
+        """
+        replies = [None] * self.workers
+        for _ in range(self.workers):
+            while True:
+                try:
+                    index, kind, value = self.results.get(timeout=1.0)
+                    break
+                except queue.Empty:
+                    if not all(p.is_alive() for p in self.processes):
+                        raise RuntimeError("A shard process exited unexpectedly.")
+            if kind == "error":
+                raise RuntimeError(f"Shard {index} failed:\n{value}")
+            if kind != expected:
+                raise RuntimeError(f"Shard {index} replied {kind}, expected {expected}.")
+            replies[index] = value
+        return replies
+
+    def broadcast(self, command, argument=None):
+        for commands in self.commands:
+            commands.put((command, argument))
+
+    def advance(self, iterations):
+        """
+        Run every shard for the given number of iterations
+        :return: busy time of every shard in seconds
+        """
+        self.broadcast("advance", iterations)
+        busy = self.collect("done")
+        self.iteration += iterations
+        return busy
+
+    def state(self, name):
+        """
+        Shared population tensor of an attribute, e.g. "u". It is updated in place by the shards while they run.
+        """
+        return self.shared[name]
+
+    def spikes(self):
+        """
+        Spikes of all shards merged into one store with global neuron ids, in (time, id) order, with the
+        offsets inside the step when the SpikeRecorder records them
+        """
+        self.broadcast("spikes")
+        logs = self.collect("spikes")
+        times = np.concatenate([t for t, _, _ in logs])
+        ids = np.concatenate([i for _, i, _ in logs])
+        order = np.lexsort((ids, times))
+        offsets = None
+        if logs[0][2] is not None:
+            offsets = np.concatenate([o for _, _, o in logs])[order]
+        store = SpikeStore(self.size, capacity=max(len(ids), 1), offsets=offsets is not None)
+        store.extend(times[order], ids[order], offsets)
+        return store
+
+    def close(self):
+        if self.processes:
+            self.broadcast("close")
+            for process in self.processes:
+                process.join(timeout=10)
+                if process.is_alive():
+                    process.terminate()
+            self.processes = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
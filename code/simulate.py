@@ -1,7 +1,12 @@
 from pymonntorch import *
-from plots import plot_membrane_potential
+from block import simulate_blocks
+from event_driven import simulate_event_driven
+from spikes import SpikeRecorder
+from online_stats import OnlineStatistics
+from profiling import Profiler
+from snapshot import checkpoint, save_checkpoint, restore
+from steady import SteadyState, simulate_until_steady
 import torch
-import matplotlib.pyplot as plt
 
 
 class Simulation:
@@ -11,6 +16,8 @@ class Simulation:
             self.net = net
         else:
             self.net = Network()
+        self.sweeps = {}
+        self.profiler = None
 
     def add_neuron_group(self, tag, **kwargs):
         if tag in [ng.tag for ng in self.net.NeuronGroups]:
@@ -18,23 +25,160 @@ class Simulation:
         # NeuronGroup(net=self.net, tag=tag, **kwargs)
         SimulateNeuronGroup(net=self.net, tag=tag, **kwargs)
 
-    def simulate(self, iterations=100):
-        self.net.initialize()
-        self.net.simulate_iterations(iterations=iterations)
+    def add_synapse_group(self, tag, src, dst, **kwargs):
+        """
+        Connect two neuron groups, e.g. with behavior={2.5: synapses.SparseSynapse(weights=...)}
+        :param src: presynaptic neuron group or its tag
+        :param dst: postsynaptic neuron group or its tag
+        """
+        if tag in [sg.tag for sg in self.net.SynapseGroups]:
+            raise Exception("The synapse group's id already exist.")
+        SynapseGroup(net=self.net, src=src, dst=dst, tag=tag, **kwargs)
+
+    def add_parameter_sweep(self, tag, grid, behavior, **kwargs):
+        """
+        Run every point of a parameter grid as one lane of a single neuron group
+        :param tag: tag of the neuron group
+        :param grid: dict mapping (behavior key, parameter name) to the values of that axis,
+                     e.g. {(2, "value"): range(20), (3, "tau"): [5, 10]}
+        :param behavior: behaviors of the group; swept parameters override their init_kwargs
+        :return: None
+        """
+        axes = list(grid.keys())
+        values = [torch.as_tensor(list(grid[axis]), dtype=torch.float32) for axis in axes]
+        points = torch.meshgrid(*values, indexing="ij")
+        for (key, name), lane_values in zip(axes, points):
+            behavior[key].init_kwargs[name] = lane_values.flatten()
+        self.sweeps[tag] = {"axes": axes, "values": values, "shape": tuple(len(v) for v in values)}
+        self.add_neuron_group(tag=tag, size=points[0].numel(), behavior=behavior, **kwargs)
+
+    def spike_counts(self, ng, event_idx=5):
+        """
+        Number of spikes of every neuron of a group
+        :param ng: neuron group
+        :param event_idx: key of the EventRecorder, SpikeRecorder or OnlineStatistics
+        :return: tensor of shape (ng.size,)
+        """
+        recorder = ng.behavior[event_idx]
+        if isinstance(recorder, OnlineStatistics):
+            return recorder.spike_count.clone()
+        if isinstance(recorder, SpikeRecorder):
+            return torch.as_tensor(recorder.store.counts(0, self.net.iteration + 1))
+        spike_events = recorder.variables['spike']
+        if not len(spike_events):
+            return torch.zeros(ng.size, dtype=torch.long)
+        return torch.bincount(spike_events[:, 1].long(), minlength=ng.size)
+
+    def rates(self, ng, event_idx=5):
+        """
+        Firing rate of every neuron of a group: the steady-state estimate of the lanes that a
+        SteadyState monitor saw converge, the mean rate over the run for the others
+        :param ng: neuron group
+        :param event_idx: key of the EventRecorder or SpikeRecorder
+        :return: tensor of shape (ng.size,)
+        """
+        rates = self.spike_counts(ng, event_idx) / (self.net.network.dt * self.net.iteration)
+        for behavior in ng.behavior.values():
+            if isinstance(behavior, SteadyState):
+                rates = torch.where(behavior.converged, behavior.rate.to(rates.dtype), rates)
+        return rates
+
+    def sweep_rates(self, tag, event_idx=5):
+        """
+        Firing rate of every grid point of a sweep
+        :param tag: tag of the swept neuron group
+        :param event_idx: key of the EventRecorder
+        :return: tensor of rates with the grid's shape
+        """
+        rates = self.rates(self.net[tag, 0], event_idx)
+        return rates.reshape(self.sweeps[tag]["shape"])
+
+    def sweep_trace(self, tag, variable, record_idx=4):
+        """
+        Recorded trace of every grid point of a sweep
+        :param tag: tag of the swept neuron group
+        :param variable: name of the recorded variable
+        :param record_idx: key of the Recorder
+        :return: tensor of shape (time, *grid shape)
+        """
+        trace = self.net[tag, 0].behavior[record_idx].variables[variable]
+        return trace.reshape(trace.shape[0], *self.sweeps[tag]["shape"])
+
+    def simulate(self, iterations=100, block_size=None, event_driven=False, info=True, cache=None, seed=None,
+                 profile=None, warm_start=None, until_steady=False):
+        """
+        Initialize and run the network
+        :param iterations: number of iterations
+        :param block_size: if given, advance this many steps per block and only observe the
+                           network at block boundaries (see block.simulate_blocks)
+        :param event_driven: solve LIF groups under piecewise-constant input exactly, event by event,
+                             and time step the others (see event_driven.simulate_event_driven)
+        :param info: print the network summary on initialization
+        :param cache: a cache.ResultCache; a cached run of the same configuration is loaded instead of
+                      simulated again, and a shorter one is resumed
+        :param seed: seed of the global random generators, set before initialization
+        :param profile: True or a profiling.Profiler to time every behavior call of the time-stepped
+                        loop; the profiler is kept in self.profiler (see Profiler.summary, save_trace)
+        :param warm_start: checkpoint (or checkpoint file) to continue from instead of the random initial
+                           state, see snapshot.restore; `iterations` are then run after the checkpoint
+        :param until_steady: stop before `iterations` once every steady.SteadyState monitor has converged
+        :return: None
+        """
+        if cache is not None:
+            cache.simulate(self, iterations, block_size, event_driven, info, seed, profile, until_steady, warm_start)
+            return
+        if seed is not None:
+            torch.manual_seed(seed)
+            np.random.seed(seed)
+        self.net.initialize(info=info)
+        if warm_start is not None:
+            restore(self.net, warm_start)
+        self.advance(iterations, block_size, event_driven, info, profile, until_steady)
+
+    def advance(self, iterations, block_size=None, event_driven=False, info=True, profile=None, until_steady=False):
+        """
+        Continue an initialized network for the given number of iterations
+        """
+        if profile:
+            if block_size or event_driven:
+                raise ValueError("Profiling only instruments the time-stepped loop.")
+            self.profiler = profile if isinstance(profile, Profiler) else Profiler()
+            self.profiler.run(self.net, iterations)
+        elif until_steady:
+            simulate_until_steady(self.net, iterations)
+        elif event_driven:
+            simulate_event_driven(self.net, iterations)
+        elif block_size:
+            simulate_blocks(self.net, iterations, block_size)
+        else:
+            self.net.simulate_iterations(iterations=iterations, measure_block_time=info)
+
+    def checkpoint(self, filename=None):
+        """
+        Dynamic state of the network, to warm-start (fork) other simulations with the same groups
+        :param filename: if given, the checkpoint is also written to this file
+        :return: checkpoint dict
+        """
+        if filename:
+            save_checkpoint(self.net, filename)
+        return checkpoint(self.net)
 
     def plot_membrane_potential(self, title: str,
                                 model_idx: int = 3,
                                 record_idx=4,
                                 save: bool = None,
                                 filename: str = None):
+        import matplotlib.pyplot as plt
+        from plots import plot_trace, show as show_figure
+
         num_ng = len(self.net.NeuronGroups)
         legend_position = (0, -0.2) if num_ng < 2 else (1.05, 1)
         # Generate colors for each neuron
         colors = plt.cm.jet(np.linspace(0, 1, num_ng))
         fig, (ax1, ax2) = plt.subplots(2, 1, sharex=True)
         for i, ng in enumerate(self.net.NeuronGroups):
-            ax1.plot(ng.behavior[record_idx].variables["u"][:, :1], color=colors[i], label=f'{ng.tag} potential')
-            ax2.plot(ng.behavior[record_idx].variables["I"][:, :1], color=colors[i], label=f"{ng.tag} current")
+            plot_trace(ax1, ng.behavior[record_idx].variables["u"][:, :1], color=colors[i], label=f'{ng.tag} potential')
+            plot_trace(ax2, ng.behavior[record_idx].variables["I"][:, :1], color=colors[i], label=f"{ng.tag} current")
 
             ax1.axhline(y=ng.behavior[model_idx].init_kwargs['threshold'], color='red', linestyle='--',
                         label=f'{ng.tag} Threshold')
@@ -54,18 +198,22 @@ class Simulation:
         plt.tight_layout()
         if save:
             plt.savefig(filename or title + '.pdf')
-        plt.show()
+        show_figure()
 
     def plot_w(self, title: str,
                record_idx: int = 4,
                save: bool = None,
                filename: str = None):
+        import matplotlib.pyplot as plt
+        from plots import plot_trace, show as show_figure
+
         num_ng = len(self.net.NeuronGroups)
         legend_position = (0, -0.2) if num_ng < 2 else (1.05, 1)
         # Generate colors for each neuron
         colors = plt.cm.jet(np.linspace(0, 1, num_ng))
         for i, ng in enumerate(self.net.NeuronGroups):
-            plt.plot(ng.behavior[record_idx].variables["w"][:, :1], color=colors[i], label=f'{ng.tag} adaptation')
+            plot_trace(plt.gca(), ng.behavior[record_idx].variables["w"][:, :1], color=colors[i],
+                       label=f'{ng.tag} adaptation')
 
         plt.xlabel('Time')
         plt.ylabel('w')
@@ -74,7 +222,7 @@ class Simulation:
         plt.title(title)
         if save:
             plt.savefig(filename or title + '.pdf')
-        plt.show()
+        show_figure()
 
     def plot_IF_curve(self, title: str = None,
                       label: str = None,
@@ -83,11 +231,17 @@ class Simulation:
                       show=True,
                       save: bool = None,
                       filename: str = None):
+        import matplotlib.pyplot as plt
+        from plots import show as show_figure
+
         frequencies = []
         currents = []
         for i, ng in enumerate(self.net.NeuronGroups):
-            spike_events = ng.behavior[event_idx].variables['spike']
-            frequencies.append(len(spike_events) / (self.net.network.dt * self.net.iteration))
+            if ng.tag in self.sweeps:
+                frequencies.extend(self.sweep_rates(ng.tag, event_idx=event_idx).flatten().tolist())
+                currents.extend(torch.as_tensor(ng.behavior[current_idx].init_kwargs['value']).expand(ng.size).tolist())
+                continue
+            frequencies.append(float(self.rates(ng, event_idx).sum()))
             currents.append(ng.behavior[current_idx].init_kwargs['value'])
         plt.plot(currents, frequencies, label=label)
         plt.title(title)
@@ -98,7 +252,7 @@ class Simulation:
         if save:
             plt.savefig(filename or title + '.pdf')
         if show:
-            plt.show()
+            show_figure()
         else:
             return plt
 
@@ -109,10 +263,13 @@ class SimulateNeuronGroup(NeuronGroup):
                                 record_idx=4,
                                 save: bool = None,
                                 filename: str = None):
+        import matplotlib.pyplot as plt
+        from plots import plot_trace, show as show_figure
+
         fig, (ax1, ax2) = plt.subplots(2, 1, sharex=True)
 
-        ax1.plot(self.behavior[record_idx].variables["u"][:, :1], label=f'potential')
-        ax2.plot(self.behavior[record_idx].variables["I"][:, :1], label=f"current")
+        plot_trace(ax1, self.behavior[record_idx].variables["u"][:, :1], label=f'potential')
+        plot_trace(ax2, self.behavior[record_idx].variables["I"][:, :1], label=f"current")
 
         ax1.axhline(y=self.behavior[model_idx].init_kwargs['threshold'], color='red', linestyle='--',
                     label=f'{self.tag} Threshold')
@@ -132,14 +289,17 @@ class SimulateNeuronGroup(NeuronGroup):
         plt.tight_layout()
         if save:
             plt.savefig(filename or title + '.pdf')
-        plt.show()
+        show_figure()
 
     def plot_w(self, title: str,
                record_idx: int = 4,
                save: bool = None,
                filename: str = None):
+        import matplotlib.pyplot as plt
+        from plots import plot_trace, show as show_figure
+
         # Generate colors for each neuron
-        plt.plot(self.behavior[record_idx].variables["w"][:, :1], label=f'adaptation')
+        plot_trace(plt.gca(), self.behavior[record_idx].variables["w"][:, :1], label=f'adaptation')
 
         plt.xlabel('Time')
         plt.ylabel('w')
@@ -148,4 +308,4 @@ class SimulateNeuronGroup(NeuronGroup):
         plt.title(title)
         if save:
             plt.savefig(filename or title + '.pdf')
-        plt.show()
+        show_figure()
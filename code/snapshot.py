@@ -0,0 +1,121 @@
+import copy
+
+import numpy as np
+import torch
+from pymonntorch import *
+
+
+def network_objects(net):
+    objects = [net, *net.behavior.values()]
+    for group in net.NeuronGroups + net.SynapseGroups:
+        objects += [group, *group.behavior.values()]
+    return objects
+
+
+def drop_compiled(net):
+    """
+    Clear the compiled expressions pymonntorch caches on its objects (code objects cannot be pickled);
+    they are rebuilt lazily on the next use
+    """
+    for obj in network_objects(net):
+        obj._mat_eval_dict = {}
+        if isinstance(obj, Recorder):
+            obj.compiled = dict.fromkeys(obj.compiled)
+
+
+def save_network(net, file):
+    """
+    Write an initialized network, with its recorded data and the global random states, to a file
+    """
+    drop_compiled(net)
+    torch.save({"net": net, "torch_rng": torch.get_rng_state(), "numpy_rng": np.random.get_state()}, file)
+
+
+def load_network(file):
+    """
+    Read a network written by save_network and restore the global random states
+    :return: the network, ready to continue with simulate_iterations
+    """
+    state = torch.load(file, weights_only=False)
+    torch.set_rng_state(state["torch_rng"])
+    np.random.set_state(state["numpy_rng"])
+    return state["net"]
+
+
+# pymonntorch bookkeeping and recorded data, which are not part of the dynamic state of a behavior
+NOT_STATE = {"init_kwargs", "behavior_enabled", "device", "training", "tags", "tag_shortcuts",
+             "empty_iteration_function", "variables", "compiled"}
+STATE_TYPES = (torch.Tensor, np.ndarray, np.random.RandomState, int, float, bool, tuple, dict, type(None))
+
+
+def behavior_state(behavior):
+    # Copies, since behaviors update their tensors in place (e.g. delay buffers)
+    return {k: v.detach().clone() if isinstance(v, torch.Tensor) else copy.deepcopy(v)
+            for k, v in vars(behavior).items()
+            if not k.startswith("_") and k not in NOT_STATE and isinstance(v, STATE_TYPES)}
+
+
+def behavior_config(behavior):
+    from cache import canonical
+    return canonical(type(behavior)), canonical(behavior.init_kwargs)
+
+
+def checkpoint(net):
+    """
+    Dynamic state of an initialized network without its recorded data: tensors of the neuron groups
+    (u, w, I, last_spike, ...), the state of every behavior (e.g. noise generators, recorder cursors,
+    synaptic delay buffers), the iteration and the global random states
+    """
+    state = {"iteration": net.iteration, "passed": getattr(net, "passed", None),
+             "torch_rng": torch.get_rng_state(), "numpy_rng": np.random.get_state(), "groups": {},
+             "synapses": {sg.tag: {key: (behavior_config(b), behavior_state(b)) for key, b in sg.behavior.items()}
+                          for sg in net.SynapseGroups}}
+    for ng in net.NeuronGroups:
+        state["groups"][ng.tag] = {
+            "size": ng.size,
+            "tensors": {k: v.detach().clone() for k, v in vars(ng).items()
+                        if isinstance(v, torch.Tensor) and not k.startswith("_") and k != "id"},
+            "behavior": {key: (behavior_config(b), behavior_state(b)) for key, b in ng.behavior.items()},
+        }
+    return state
+
+
+def save_checkpoint(net, file):
+    torch.save(checkpoint(net), file)
+
+
+def restore(net, state):
+    """
+    Warm-start an initialized network from a checkpoint (or a file written by save_checkpoint).
+    Groups are matched by tag. The state of a behavior is only carried over when the behavior has the
+    same class and parameters as in the checkpoint, so a fork with e.g. a different current keeps the
+    warmed-up neurons and starts the new current fresh at the checkpoint's iteration.
+    """
+    if not isinstance(state, dict):
+        state = torch.load(state, weights_only=False)
+    net.iteration = state["iteration"]
+    if state["passed"] is not None:
+        net.passed = state["passed"]
+    torch.set_rng_state(state["torch_rng"])
+    np.random.set_state(state["numpy_rng"])
+    for ng in net.NeuronGroups:
+        if ng.tag not in state["groups"]:
+            continue
+        group = state["groups"][ng.tag]
+        if group["size"] != ng.size:
+            raise ValueError(f"Group {ng.tag} has {ng.size} neurons, the checkpoint has {group['size']}.")
+        for name, value in group["tensors"].items():
+            current = getattr(ng, name, None)
+            dtype = current.dtype if isinstance(current, torch.Tensor) else value.dtype
+            setattr(ng, name, value.to(device=ng.device, dtype=dtype).clone())
+        restore_behaviors(ng, group["behavior"])
+    for sg in net.SynapseGroups:
+        restore_behaviors(sg, state.get("synapses", {}).get(sg.tag, {}))
+
+
+def restore_behaviors(group, states):
+    for key, behavior in group.behavior.items():
+        config, behavior_values = states.get(key, (None, None))
+        if config == behavior_config(behavior):
+            for name, value in behavior_values.items():
+                setattr(behavior, name, value.clone() if isinstance(value, torch.Tensor) else copy.deepcopy(value))
@@ -0,0 +1,115 @@
+"""
+Spike-time accuracy and cost of precise mode (spikes located inside the step, see
+integrators.precise_step) against grid spikes, with a fine-dt forward Euler reference.
+
+    python spike_timing_benchmark.py
+
+Spike times are read from a SpikeRecorder with offsets (SpikeStore.spike_times). The error is the mean
+absolute difference of matched spike times over 8 input currents, which includes the phase drift of
+a slightly wrong rate; the first spike error shows the accuracy of a single crossing. The cost is the
+wall time per unit of simulated time of 10^5 neurons. AELIF runs with b=0 as in integrator_benchmark.py.
+
+Measured on CPU:
+
+    LIF: reference euler dt=0.001, 62 spikes
+                  mode    dt  mean |dt_spike|  first spike  missing  ms / time unit
+                  grid   1.0           0.7151       0.2605        1            1.44
+                  grid   0.1           0.0815       0.0222        0           11.25
+               precise   1.0           0.0014       0.0004        0            5.09
+               precise   0.5           0.0014       0.0004        0            7.27
+    ELIF: reference euler dt=0.001, 85 spikes
+                  mode    dt  mean |dt_spike|  first spike  missing  ms / time unit
+                  grid   1.0           7.0617       1.1820       11            3.86
+                  grid   0.1           1.3589       0.1945        1           37.75
+         precise euler   1.0           1.6281       0.2588        4           10.20
+     precise exp_euler   1.0           3.1925       0.5154        7           15.35
+           precise rk4   1.0           0.6239       0.1157        1           27.65
+           precise rk4   0.5           0.5297       0.0598        0           46.97
+    AELIF: reference euler dt=0.001, 33 spikes
+                  mode    dt  mean |dt_spike|  first spike  missing  ms / time unit
+                  grid   1.0           6.6117       1.8430       10            2.33
+                  grid   0.1           1.5964       0.2573        4           14.33
+         precise euler   1.0           3.0955       0.5614        1            3.99
+     precise exp_euler   1.0           2.2324       0.5761        2            7.00
+           precise rk4   1.0           1.0676       0.0940        3           10.48
+           precise rk4   0.5           0.8576       0.0534        0           16.99
+
+Precise LIF integrates exactly and places every crossing to float32 accuracy, so at dt=1 it is 50
+times more accurate than grid spikes at dt=0.1 for half the cost (the remaining error is the reference's).
+For ELIF and AELIF the crossing is exact on the integrator's trajectory, and the error left is the
+subthreshold error of the integrator. With rk4, precise spikes at dt=1 beat forward Euler at dt=0.1
+for a fraction of its cost, but not by the same margin.
+"""
+import time
+
+import torch
+from pymonntorch import *
+
+from currents import ConstantCurrent
+from integrator_benchmark import MODELS, spike_time_error
+from models import LIF
+from spikes import SpikeRecorder
+from time_res import TimeResolution
+
+DURATION = 100
+COST_NEURONS = 100_000
+COST_DURATION = 50
+CURRENTS = {"LIF": torch.linspace(6.5, 12, 8), "ELIF": torch.linspace(14, 40, 8), "AELIF": torch.linspace(14, 40, 8)}
+MODELS = {"LIF": (LIF, dict(R=5, tau=10, threshold=-37, u_rest=-67, u_reset=-75)), **MODELS}
+# (label, dt, model keyword arguments)
+CONFIGS = {
+    "LIF": [("grid", 1.0, {}), ("grid", 0.1, {}), ("precise", 1.0, dict(precise=True)),
+            ("precise", 0.5, dict(precise=True))],
+    "ELIF": [("grid", 1.0, {}), ("grid", 0.1, {}), ("precise euler", 1.0, dict(precise=True)),
+             ("precise exp_euler", 1.0, dict(precise=True, integrator="exp_euler")),
+             ("precise rk4", 1.0, dict(precise=True, integrator="rk4")),
+             ("precise rk4", 0.5, dict(precise=True, integrator="rk4"))],
+}
+CONFIGS["AELIF"] = CONFIGS["ELIF"]
+
+
+def spike_trains(model, params, currents, dt, **kwargs):
+    """
+    Spike times of one lane per input current
+    """
+    net = Network(behavior={1: TimeResolution(dt=dt)})
+    ng = NeuronGroup(net=net, size=len(currents), behavior={
+        2: ConstantCurrent(value=currents),
+        3: model(**params, ratio=0, **kwargs),
+        5: SpikeRecorder(offsets=True),
+    })
+    net.initialize(info=False)
+    net.simulate_iterations(round(DURATION / dt), measure_block_time=False)
+    times, ids = ng.behavior[5].store.spike_times(dt)
+    return [times[ids == lane].tolist() for lane in range(len(currents))]
+
+
+def cost(model, params, currents, dt, **kwargs):
+    """
+    Wall time per unit of simulated time of a large population spread over the input currents
+    """
+    net = Network(behavior={1: TimeResolution(dt=dt)})
+    NeuronGroup(net=net, size=COST_NEURONS, behavior={
+        2: ConstantCurrent(value=currents.repeat_interleave(COST_NEURONS // len(currents))),
+        3: model(**params, **kwargs),
+        5: SpikeRecorder(offsets=True),
+    })
+    net.initialize(info=False)
+    start = time.perf_counter()
+    net.simulate_iterations(round(COST_DURATION / dt), measure_block_time=False)
+    return (time.perf_counter() - start) / COST_DURATION
+
+
+if __name__ == "__main__":
+    for name, (model, params) in MODELS.items():
+        currents = CURRENTS[name]
+        reference = spike_trains(model, params, currents, 0.001)
+        print(f"{name}: reference euler dt=0.001, {sum(map(len, reference))} spikes")
+        print(f"{'mode':>18} {'dt':>5} {'mean |dt_spike|':>16} {'first spike':>12} {'missing':>8} "
+              f"{'ms / time unit':>15}")
+        for label, dt, kwargs in CONFIGS[name]:
+            trains = spike_trains(model, params, currents, dt, **kwargs)
+            error, missing = spike_time_error(trains, reference)
+            first = [abs(lane[0] - ref[0]) for lane, ref in zip(trains, reference) if lane and ref]
+            print(f"{label:>18} {dt:>5} {error:>16.4f} {sum(first) / len(first):>12.4f} {missing:>8} "
+                  f"{cost(model, params, currents, dt, **kwargs) * 1e3:>15.2f}")
@@ -0,0 +1,164 @@
+import numpy as np
+from pymonntorch import *
+
+
+class SpikeStore:
+    """
+    Compact spike trains of a population.
+    Spikes are appended to an (iteration, neuron) log with int32 entries; queries run on a CSR
+    layout (per-neuron sorted spike times, `indptr` of length size + 1) built lazily from the log.
+    With `offsets`, the log also keeps the float32 fraction of the step at which every spike occurred.
+    """
+
+    def __init__(self, size, capacity=1024, offsets=False):
+        self.size = size
+        self.count = 0
+        self.log_times = np.empty(capacity, dtype=np.int32)
+        self.log_ids = np.empty(capacity, dtype=np.int32)
+        self.log_offsets = np.empty(capacity, dtype=np.float32) if offsets else None
+        self.csr = None
+
+    @classmethod
+    def from_events(cls, events, size):
+        """
+        Build a store from EventRecorder output, a [n, 2] tensor of (iteration, neuron)
+        """
+        events = np.asarray(events.cpu() if hasattr(events, "cpu") else events).reshape(-1, 2)
+        store = cls(size, capacity=max(len(events), 1))
+        store.extend(events[:, 0], events[:, 1])
+        return store
+
+    def extend(self, times, ids, offsets=None):
+        n = len(ids)
+        if self.count + n > len(self.log_ids):
+            capacity = max(2 * len(self.log_ids), self.count + n)
+            self.log_times = np.resize(self.log_times, capacity)
+            self.log_ids = np.resize(self.log_ids, capacity)
+            if self.log_offsets is not None:
+                self.log_offsets = np.resize(self.log_offsets, capacity)
+        self.log_times[self.count:self.count + n] = times
+        self.log_ids[self.count:self.count + n] = ids
+        if self.log_offsets is not None:
+            # Spikes without an offset happened at the end of their step
+            self.log_offsets[self.count:self.count + n] = 1.0 if offsets is None else offsets
+        self.count += n
+        self.csr = None
+
+    def append(self, iteration, ids, offsets=None):
+        """
+        Add the spikes of one iteration
+        """
+        self.extend(np.full(len(ids), iteration, dtype=np.int32), ids, offsets)
+
+    def spike_times(self, dt):
+        """
+        Spikes in units of time, in the order of the log: the step of iteration i spans ((i - 1) dt, i dt],
+        so a spike is at (i - 1 + offset) * dt, or at i * dt without offsets
+        :return: (float64 times, ids) arrays
+        """
+        times = self.log_times[:self.count].astype(np.float64)
+        if self.log_offsets is not None:
+            times += self.log_offsets[:self.count] - 1.0
+        return times * dt, self.log_ids[:self.count].copy()
+
+    def __len__(self):
+        return self.count
+
+    def build(self):
+        """
+        :return: (indptr, times) with the spike times of neuron i in times[indptr[i]:indptr[i + 1]]
+        """
+        if self.csr is None:
+            ids = self.log_ids[:self.count]
+            # The log is in time order, so a stable sort by neuron keeps every train sorted
+            order = np.argsort(ids, kind="stable")
+            indptr = np.zeros(self.size + 1, dtype=np.int64)
+            np.cumsum(np.bincount(ids, minlength=self.size), out=indptr[1:])
+            times = self.log_times[:self.count][order]
+            # Offset each train by its neuron so that one searchsorted serves all trains
+            self.span = np.int64(times.max(initial=0)) + 1
+            self.keys = np.repeat(np.arange(self.size, dtype=np.int64), np.diff(indptr)) * self.span + times
+            self.csr = indptr, times
+        return self.csr
+
+    def train(self, neuron):
+        indptr, times = self.build()
+        return times[indptr[neuron]:indptr[neuron + 1]]
+
+    def window(self, t0, t1, neurons=None):
+        """
+        Positions of the first and one past the last spike in [t0, t1) of every neuron, O(log n) each
+        :return: (neurons, start, stop) with the spikes of neurons[j] in times[start[j]:stop[j]]
+        """
+        self.build()
+        neurons = np.arange(self.size) if neurons is None else np.asarray(neurons)
+        base = neurons.astype(np.int64) * self.span
+        start = np.searchsorted(self.keys, base + min(max(int(t0), 0), self.span))
+        stop = np.searchsorted(self.keys, base + min(max(int(t1), 0), self.span))
+        return neurons, start, stop
+
+    def counts(self, t0, t1, neurons=None):
+        _, start, stop = self.window(t0, t1, neurons)
+        return stop - start
+
+    def rates(self, t0, t1, dt, neurons=None):
+        """
+        Spikes per unit of time of every neuron over the iterations [t0, t1)
+        """
+        return self.counts(t0, t1, neurons) / ((t1 - t0) * dt)
+
+    def spikes(self, neurons=None, t0=0, t1=None):
+        """
+        Spikes of a neuron subset as (times, ids) arrays, without touching the other trains
+        """
+        indptr, times = self.build()
+        t1 = int(times.max(initial=0)) + 1 if t1 is None else t1
+        neurons, start, stop = self.window(t0, t1, neurons)
+        lengths = stop - start
+        positions = np.repeat(start - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+        return times[positions], np.repeat(neurons, lengths)
+
+    def binned_counts(self, bin_size, t0=0, t1=None, neurons=None):
+        """
+        Spike counts per neuron and time bin
+        :return: [len(neurons), n_bins] array
+        """
+        times, ids = self.spikes(neurons, t0, t1)
+        t1 = int(times.max(initial=t0)) + 1 if t1 is None else t1
+        n_bins = -(-(t1 - t0) // bin_size)
+        neurons = np.arange(self.size) if neurons is None else np.asarray(neurons)
+        rows = np.searchsorted(np.sort(neurons), ids)
+        rows = np.argsort(neurons)[rows]
+        flat = rows.astype(np.int64) * n_bins + (times - t0) // bin_size
+        return np.bincount(flat, minlength=len(neurons) * n_bins).reshape(len(neurons), n_bins)
+
+
+class SpikeRecorder(Behavior):
+    """
+    Appends the spikes of every iteration to a SpikeStore (`self.store`). With offsets=True it also
+    records `ng.spike_offset`, the spike times inside the step of models in precise mode.
+    """
+
+    def initialize(self, ng):
+        super().initialize(ng)
+        self.variable = self.parameter("variable", "spike")
+        self.offsets = self.parameter("offsets", False)
+        self.store = SpikeStore(ng.size, offsets=self.offsets)
+
+    def forward(self, ng):
+        if ng.recording:
+            ids = getattr(ng, self.variable).nonzero().flatten()
+            if len(ids):
+                offsets = None
+                if self.offsets and hasattr(ng, "spike_offset"):
+                    offsets = ng.spike_offset[ids].cpu().numpy()
+                self.store.append(ng.network.iteration, ids.cpu().numpy(), offsets)
+
+    def record_block(self, ng, start, spikes):
+        """
+        Append the spikes of a block of iterations from `start` at once (see block.simulate_blocks)
+        :param spikes: bool tensor of shape (steps, ng.size)
+        """
+        if ng.recording:
+            steps, ids = spikes.nonzero().cpu().numpy().T
+            self.store.extend(start + steps, ids)
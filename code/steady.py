@@ -0,0 +1,158 @@
+import torch
+from pymonntorch import *
+
+
+class SteadyState(Behavior):
+    """
+    Per-neuron convergence monitor for firing rates. After `skip` transient intervals, a lane has
+    converged once its last `window` interspike intervals agree within one step (or `rtol` of their
+    mean) - periodic firing under constant input - or once the standard error of its mean interval
+    drops below `rtol` of the mean - noisy input. Lanes without a spike for `silent` iterations (and
+    three times their last interval) converge to rate 0. The estimate of a converged lane is kept and
+    further spikes are ignored.
+
+    With `freeze`, converged lanes are frozen: the monitor shares its `converged` mask as `ng.frozen`,
+    and the models of models.py hold the state of those lanes. Once every lane has converged
+    (`self.done`), the model behavior is disabled; the currents, recorders and other behaviors keep
+    running. `release` undoes both, which simulate_until_steady does when it returns.
+
+    Put it after the model, e.g. at key 6. After the run, `self.rate` holds the rate of every
+    neuron (spikes per unit of time) and `self.bound` the half-width of its confidence interval.
+
+    Args:
+        window (int): number of intervals that have to agree. The default is 5.
+        rtol (float): relative tolerance. The default is 0.01.
+        skip (int): transient intervals that are ignored. The default is 2.
+        silent (int): iterations without a spike after which a lane is taken as silent. The default is 2000.
+        z (float): z-score of the confidence bound of noisy lanes. The default is 1.96.
+        variable (str): spike attribute of the group. The default is "spike".
+        freeze (bool): freeze converged lanes. The default is True.
+        model_idx (int): key of the model behavior. The default is 3.
+    """
+
+    def initialize(self, ng):
+        super().initialize(ng)
+        self.window = self.parameter("window", 5)
+        self.rtol = self.parameter("rtol", 0.01)
+        self.skip = self.parameter("skip", 2)
+        self.silent = self.parameter("silent", 2000)
+        self.z = self.parameter("z", 1.96)
+        self.variable = self.parameter("variable", "spike")
+        self.freeze = self.parameter("freeze", True)
+        self.model_idx = self.parameter("model_idx", 3)
+
+        self.last = torch.full((ng.size,), -1, dtype=torch.long, device=ng.device)
+        self.start = torch.full((ng.size,), ng.network.iteration, dtype=torch.long, device=ng.device)
+        self.count = torch.zeros(ng.size, dtype=torch.long, device=ng.device)
+        self.intervals = torch.zeros((ng.size, self.window), dtype=torch.float64, device=ng.device)
+        self.latest = torch.zeros(ng.size, dtype=torch.float64, device=ng.device)
+        self.mean = torch.zeros(ng.size, dtype=torch.float64, device=ng.device)
+        self.m2 = torch.zeros(ng.size, dtype=torch.float64, device=ng.device)
+        self.converged = torch.zeros(ng.size, dtype=torch.bool, device=ng.device)
+        self.converged_at = torch.full((ng.size,), -1, dtype=torch.long, device=ng.device)
+        self.rate = torch.zeros(ng.size, dtype=torch.float64, device=ng.device)
+        self.bound = torch.full((ng.size,), float("inf"), dtype=torch.float64, device=ng.device)
+        self.done = False
+
+    def forward(self, ng):
+        iteration = ng.network.iteration
+        dt = ng.network.dt
+        spikes = getattr(ng, self.variable)
+        fired = (spikes.bool() & ~self.converged).nonzero().flatten()
+
+        if len(fired):
+            previous = self.last[fired]
+            self.last[fired] = iteration
+            seen = previous >= 0
+            if seen.any():
+                self.update(fired[seen], (iteration - previous[seen]).to(torch.float64), iteration, dt)
+
+        # A lane that has fired is only taken as silent once the gap is also well beyond its last interval
+        gap = iteration - torch.maximum(self.last, self.start)
+        quiet = ~self.converged & (gap >= self.silent) & (gap >= 3 * self.latest)
+        if quiet.any():
+            self.converged |= quiet
+            self.converged_at[quiet] = iteration
+            self.rate[quiet] = 0.0
+            self.bound[quiet] = 1 / (self.silent * dt)
+
+        if self.freeze:
+            ng.frozen = self.converged
+
+        if self.converged.all() and not self.done:
+            self.done = True
+            if self.freeze:
+                # Every lane is held from now on, so the model need not run; its last spikes are cleared
+                # as it would have done for frozen lanes
+                ng.behavior[self.model_idx].behavior_enabled = False
+                spikes.fill_(False)
+
+    def release(self, ng):
+        """
+        Unfreeze the lanes of the group and re-enable its model; the estimates are kept
+        :param ng: neuron group
+        :return: None
+        """
+        if self.freeze:
+            ng.behavior[self.model_idx].behavior_enabled = True
+            ng.frozen = None
+            self.freeze = False
+
+    def update(self, lanes, isi, iteration, dt):
+        self.count[lanes] += 1
+        n = self.count[lanes]
+        self.intervals[lanes, n % self.window] = isi
+        self.latest[lanes] = isi
+
+        # Welford's running mean and variance over the intervals after the transient
+        counted = n > self.skip
+        k = (n - self.skip).clamp(min=1).to(torch.float64)
+        delta = torch.where(counted, isi - self.mean[lanes], torch.zeros_like(isi))
+        self.mean[lanes] += delta / k
+        self.m2[lanes] += delta * (isi - self.mean[lanes])
+
+        ready = lanes[n >= self.skip + self.window]
+        if not len(ready):
+            return
+        ring = self.intervals[ready]
+        ring_mean = ring.mean(dim=1)
+        periodic = ring.amax(dim=1) - ring.amin(dim=1) <= torch.clamp(self.rtol * ring_mean, min=1.0)
+
+        samples = (self.count[ready] - self.skip).to(torch.float64)
+        standard_error = (self.m2[ready] / (samples - 1)).sqrt() / samples.sqrt()
+        stable = standard_error <= self.rtol * self.mean[ready]
+
+        mean = torch.where(periodic, ring_mean, self.mean[ready])
+        # Spike times are exact to one step, so the window spans window * mean steps +- 1
+        relative = torch.where(periodic, 1 / (self.window * ring_mean), self.z * standard_error / self.mean[ready])
+        converged = periodic | stable
+        done = ready[converged]
+        self.converged[done] = True
+        self.converged_at[done] = iteration
+        self.rate[done] = 1 / (mean[converged] * dt)
+        self.bound[done] = self.rate[done] * relative[converged]
+
+
+def steady_monitors(net):
+    return [b for ng in net.NeuronGroups for b in ng.behavior.values() if isinstance(b, SteadyState)]
+
+
+def simulate_until_steady(net, iterations, check_every=50):
+    """
+    Simulate at most `iterations` steps, stopping early once every SteadyState monitor is done.
+    The monitors are released afterwards, so the network continues with every lane running.
+    :return: number of iterations simulated
+    """
+    monitors = steady_monitors(net)
+    simulated = 0
+    while simulated < iterations:
+        n = min(check_every, iterations - simulated)
+        net.simulate_iterations(n, measure_block_time=False)
+        simulated += n
+        if monitors and all(monitor.done for monitor in monitors):
+            break
+    for ng in net.NeuronGroups:
+        for behavior in ng.behavior.values():
+            if isinstance(behavior, SteadyState):
+                behavior.release(ng)
+    return simulated
@@ -0,0 +1,172 @@
+import math
+
+import torch
+from pymonntorch import *
+
+from rng import draw_seed, neuron_ids, stream_id, uniform
+
+
+class Stimulus:
+    """
+    Closed-form input current. `values` evaluates it for a column of iterations at once and returns
+    a [T, 1] tensor (same for all neurons) or a [T, N] tensor (per-neuron parameters or noise).
+    Stimuli compose with +, * and `gate`, and the result is materialized chunk by chunk.
+    """
+
+    def values(self, ng, iterations):
+        raise NotImplementedError
+
+    def materialize(self, ng, start, size):
+        iterations = torch.arange(start, start + size, dtype=torch.float64, device=ng.device).unsqueeze(1)
+        return self.values(ng, iterations).to(ng.def_dtype)
+
+    def __add__(self, other):
+        return Sum(self, as_stimulus(other))
+
+    def __mul__(self, other):
+        return Product(self, as_stimulus(other))
+
+    __radd__ = __add__
+    __rmul__ = __mul__
+
+    def gate(self, t_start, t_end=None):
+        return Product(self, Step(1.0, t_start, t_end))
+
+    def with_noise(self, noise_range, seed=None):
+        return Sum(self, UniformNoise(noise_range, seed))
+
+
+def as_stimulus(value):
+    return value if isinstance(value, Stimulus) else Constant(value)
+
+
+def lanes(value, ng):
+    """
+    Parameter as a float64 row that broadcasts against a [T, 1] column
+    """
+    return torch.as_tensor(value, dtype=torch.float64, device=ng.device)
+
+
+class Constant(Stimulus):
+    def __init__(self, value):
+        self.value = value
+
+    def values(self, ng, iterations):
+        return torch.zeros_like(iterations) + lanes(self.value, ng)
+
+
+class Step(Stimulus):
+    def __init__(self, value, t_start, t_end=None):
+        self.value, self.t_start, self.t_end = value, t_start, t_end
+
+    def values(self, ng, iterations):
+        t = iterations * ng.network.dt
+        on = t >= lanes(self.t_start, ng)
+        if self.t_end is not None:
+            on = on & (t < lanes(self.t_end, ng))
+        return lanes(self.value, ng) * on
+
+
+class Sin(Stimulus):
+    def __init__(self, amplitude, frequency, phase=0.0, offset=0.0):
+        self.amplitude, self.frequency, self.phase, self.offset = amplitude, frequency, phase, offset
+
+    def values(self, ng, iterations):
+        t = iterations * ng.network.dt
+        return (torch.sin(lanes(self.frequency, ng) * t + lanes(self.phase, ng)) * lanes(self.amplitude, ng)
+                + lanes(self.offset, ng))
+
+
+class Ramp(Stimulus):
+    def __init__(self, slope, start=0.0):
+        self.slope, self.start = slope, start
+
+    def values(self, ng, iterations):
+        # Closed form of `I += slope * dt`, so there is no accumulated rounding drift
+        return lanes(self.start, ng) + lanes(self.slope, ng) * ng.network.dt * iterations
+
+
+class Log(Stimulus):
+    def __init__(self, horizontal_shift=0.0, vertical_shift=0.0):
+        self.horizontal_shift, self.vertical_shift = horizontal_shift, vertical_shift
+
+    def values(self, ng, iterations):
+        t = iterations * ng.network.dt
+        return lanes(self.vertical_shift, ng) + torch.log(t + lanes(self.horizontal_shift, ng))
+
+
+class Exp(Stimulus):
+    def __init__(self, base=0.0):
+        self.base = base
+
+    def values(self, ng, iterations):
+        return lanes(self.base, ng) + torch.exp(iterations)
+
+
+class UniformNoise(Stimulus):
+    """
+    Independent uniform noise in [-noise_range / 2, noise_range / 2) for every neuron and iteration,
+    drawn in bulk per chunk from a counter-based stream (see rng.py). Without a seed, one is drawn from
+    the global torch generator on first use.
+    """
+
+    def __init__(self, noise_range, seed=None, stream=None):
+        self.noise_range = noise_range
+        self.seed = seed
+        self.stream = stream_id(type(self).__name__) if stream is None else stream
+
+    def values(self, ng, iterations):
+        if self.seed is None:
+            self.seed = draw_seed()
+        noise = uniform(self.seed, self.stream, neuron_ids(ng), iterations.flatten().long())
+        return (noise - 0.5) * lanes(self.noise_range, ng)
+
+
+class Sum(Stimulus):
+    def __init__(self, *terms):
+        self.terms = terms
+
+    def values(self, ng, iterations):
+        return sum(term.values(ng, iterations) for term in self.terms)
+
+
+class Product(Stimulus):
+    def __init__(self, *factors):
+        self.factors = factors
+
+    def values(self, ng, iterations):
+        return math.prod(factor.values(ng, iterations) for factor in self.factors)
+
+
+class StimulusCache:
+    """
+    Serves one row per iteration from a lazily materialized [chunk_size, 1 or N] chunk
+    """
+
+    def __init__(self, stimulus, chunk_size=1024):
+        self.stimulus = stimulus
+        self.chunk_size = chunk_size
+        self.start = 0
+        self.chunk = None
+
+    def row(self, ng, iteration):
+        if self.chunk is None or not self.start <= iteration < self.start + len(self.chunk):
+            self.start = iteration
+            self.chunk = self.stimulus.materialize(ng, iteration, self.chunk_size)
+        return self.chunk[iteration - self.start]
+
+
+class StimulusCurrent(Behavior):
+    """
+    Drive ng.I with a (composed) Stimulus, e.g.
+    StimulusCurrent(stimulus=(Step(10, t_start=25) + Sin(2, 0.5)).with_noise(3))
+    """
+
+    def initialize(self, ng):
+        self.stimulus = self.parameter("stimulus", None, required=True)
+        self.chunk_size = self.parameter("chunk_size", 1024)
+        self.cache = StimulusCache(self.stimulus, self.chunk_size)
+        ng.I = ng.vector()
+
+    def forward(self, ng):
+        ng.I[:] = self.cache.row(ng, ng.network.iteration)
@@ -0,0 +1,92 @@
+import torch
+from pymonntorch import *
+
+
+def random_connectivity(n_pre, n_post, k, weight, delay=None, seed=None, device="cpu"):
+    """
+    Random projection with a fixed out-degree, as a sparse CSR matrix of shape (n_pre, n_post)
+    :param k: number of targets of every presynaptic neuron (drawn with replacement)
+    :param weight: weight of every synapse, a number or a callable (generator, n) -> tensor
+    :param delay: None, or (min, max) to draw uniform per-synapse delays in units of time
+    :return: (weights, delays), delays being None or a tensor in the order of weights.values()
+    """
+    generator = torch.Generator(device=device)
+    if seed is not None:
+        generator.manual_seed(seed)
+    else:
+        generator.seed()
+    n = n_pre * k
+    crow = torch.arange(0, n + 1, k, dtype=torch.int64, device=device)
+    col = torch.randint(n_post, (n,), generator=generator, dtype=torch.int64, device=device)
+    col = col.view(n_pre, k).sort(dim=1).values.flatten()
+    values = weight(generator, n) if callable(weight) else torch.full((n,), float(weight), device=device)
+    weights = torch.sparse_csr_tensor(crow, col, values, size=(n_pre, n_post), check_invariants=False)
+    delays = None
+    if delay is not None:
+        low, high = delay
+        delays = low + (high - low) * torch.rand(n, generator=generator, device=device)
+    return weights, delays
+
+
+class SparseSynapse(Behavior):
+    """
+    Current-based synapses of a SynapseGroup with event-driven propagation. The weights are kept in CSR
+    layout with one row per presynaptic neuron, so a step only touches the rows of the neurons that
+    spiked: a spike of src at iteration t adds the weights to dst.I at iteration t + delay.
+    Without delays the weights are added to dst.I directly, otherwise they are scattered into a ring
+    buffer of max delay + 1 slots, whose current slot is added to dst.I and cleared every step.
+
+    The behavior has to run after the current behavior of dst (which resets ng.I) and before its model,
+    e.g. at key 2.5 with the current at 2 and the model at 3. It reads the spikes src emitted in the
+    previous iteration, so every delay is at least one step.
+
+    Args:
+        weights (tensor): (src.size, dst.size) matrix, sparse (CSR or COO) or dense
+        delay (float or tensor): transmission delay in units of time, one value or one per synapse in
+            the order of weights.to_sparse_csr().values(). The default is 0 (one step).
+        variable (str): spike attribute of src. The default is "spike".
+    """
+
+    def initialize(self, sg):
+        weights = self.parameter("weights", None, required=True)
+        delay = self.parameter("delay", 0)
+        self.variable = self.parameter("variable", "spike")
+
+        weights = weights.to_sparse_csr() if weights.layout != torch.sparse_csr else weights
+        if weights.shape != (sg.src.size, sg.dst.size):
+            raise ValueError(f"Expected weights of shape {(sg.src.size, sg.dst.size)}, got {tuple(weights.shape)}.")
+        self.crow = weights.crow_indices().to(device=sg.device, dtype=torch.int64)
+        self.col = weights.col_indices().to(device=sg.device, dtype=torch.int32)
+        self.weight = weights.values().to(device=sg.device, dtype=sg.dst.I.dtype)
+
+        steps = torch.as_tensor(delay, dtype=torch.float64) / sg.network.dt
+        steps = torch.round(steps).clamp(min=1).to(torch.int64)
+        self.delayed = bool((steps > 1).any())
+        if self.delayed:
+            self.delay = steps.expand(len(self.weight)).to(device=sg.device, dtype=torch.int16)
+            self.slots = int(steps.max()) + 1
+            self.buffer = torch.zeros(self.slots * sg.dst.size, dtype=sg.dst.I.dtype, device=sg.device)
+
+    def forward(self, sg):
+        spikes = getattr(sg.src, self.variable)
+        fired = spikes.nonzero().flatten()
+
+        if len(fired):
+            # Synapse indices of the fired rows: the row start repeated over the row, plus 0, 1, 2, ...
+            start = self.crow[fired]
+            length = self.crow[fired + 1] - start
+            offset = torch.cumsum(length, 0) - length
+            synapses = torch.repeat_interleave(start - offset, length) + torch.arange(
+                int(length.sum()), device=sg.device)
+            targets = self.col[synapses].long()
+            if self.delayed:
+                # Spikes of the previous iteration arrive at iteration - 1 + delay
+                slot = (sg.network.iteration - 1 + self.delay[synapses].long()) % self.slots
+                self.buffer.index_add_(0, slot * sg.dst.size + targets, self.weight[synapses])
+            else:
+                sg.dst.I.index_add_(0, targets, self.weight[synapses])
+
+        if self.delayed:
+            current = self.buffer.view(self.slots, sg.dst.size)[sg.network.iteration % self.slots]
+            sg.dst.I += current
+            current.zero_()
@@ -0,0 +1,117 @@
+import pytest
+import torch
+from pymonntorch import *
+
+import block
+from block import block_size_for, group_blocks
+from currents import ConstantCurrent, NoisyCurrent, SinCurrent, StepCurrent
+from models import AELIF, LIF
+from steady import SteadyState
+from simulate import Simulation
+from spikes import SpikeRecorder
+from time_res import TimeResolution
+
+AELIF_PARAMS = dict(a=6.7, b=0.5, R=1.7, tau_m=10, tau_w=100, threshold=-30, rh_threshold=-50,
+                    u_rest=-65, u_reset=-70, delta_T=1, refractory_T=1.0)
+
+
+def build(gap_width):
+    sim = Simulation(Network(behavior={1: TimeResolution(dt=0.5)}))
+    sim.add_neuron_group(tag="ng", size=12, behavior={
+        2: ConstantCurrent(value=torch.linspace(10, 60, 12), noise_range=5.0, seed=2),
+        3: AELIF(**AELIF_PARAMS),
+        4: Recorder(variables=["u", "w"], gap_width=gap_width),
+        5: SpikeRecorder(),
+        6: EventRecorder(variables=["spike"]),
+    })
+    return sim
+
+
+def outputs(sim):
+    ng = sim.net.NeuronGroups[0]
+    times, ids = ng.behavior[5].store.spikes()
+    return ng.behavior[4].variables["u"], ng.behavior[4].variables["w"], torch.as_tensor(times), \
+        torch.as_tensor(ids), ng.behavior[6].variables["spike"], ng.u
+
+
+@pytest.mark.parametrize("block_size, gap_width", [(10, 5), (8, 4), (7, 0)])
+def test_blocks_match_plain_stepping(block_size, gap_width):
+    torch.manual_seed(0)
+    plain = build(gap_width)
+    plain.simulate(333, info=False)
+    torch.manual_seed(0)
+    blocked = build(gap_width)
+    blocked.simulate(200, block_size=block_size, info=False)
+    # Continue from a block boundary that is not a multiple of the block size
+    blocked.advance(133, block_size=block_size, info=False)
+    assert len(outputs(plain)[2]) > 0
+    for expected, value in zip(outputs(plain), outputs(blocked)):
+        assert torch.equal(value, expected)
+
+
+@pytest.mark.parametrize("gap_width, expected", [(4, 2), (5, 5), (0, 1)])
+def test_block_size_follows_the_recorders(gap_width, expected):
+    sim = build(gap_width)
+    sim.net.initialize(info=False)
+    assert block_size_for(sim.net, 10) == expected
+
+
+LIF_PARAMS = dict(R=5, tau=10, threshold=-37, u_rest=-67, u_reset=-75, refractory_T=1.0)
+CURRENTS = {
+    "constant": lambda size: ConstantCurrent(value=torch.linspace(5, 40, size), noise_range=5.0, seed=2),
+    "step": lambda size: StepCurrent(value=30.0, t_start=40, t_end=250, noise_range=2.0, seed=3),
+    "sin": lambda size: SinCurrent(amplitude=20.0, frequency=0.05, offset=10.0),
+    "noisy": lambda size: NoisyCurrent(iterations=400, mean=12.0, std=5.0, seed=4),
+}
+
+
+def build_lif(current, size=12, **kwargs):
+    sim = Simulation(Network(behavior={1: TimeResolution(dt=0.5)}))
+    sim.add_neuron_group(tag="ng", size=size, behavior={
+        2: CURRENTS[current](size),
+        3: LIF(**LIF_PARAMS, **kwargs),
+        4: Recorder(variables=["u", "I"], gap_width=5),
+        5: SpikeRecorder(),
+        6: EventRecorder(variables=["spike"]),
+    })
+    return sim
+
+
+@pytest.mark.parametrize("current", CURRENTS)
+@pytest.mark.parametrize("kwargs", [dict(), dict(fused=True), dict(precision="float16", compact=True)])
+def test_multi_step_advance_matches_plain_stepping(current, kwargs):
+    torch.manual_seed(0)
+    plain = build_lif(current, **kwargs)
+    plain.simulate(333, info=False)
+    torch.manual_seed(0)
+    blocked = build_lif(current, **kwargs)
+    blocked.simulate(333, block_size=10, info=False)
+    assert group_blocks(blocked.net, [], 10) is not None
+    ng, blocked_ng = plain.net.NeuronGroups[0], blocked.net.NeuronGroups[0]
+    times, ids = ng.behavior[5].store.spikes()
+    blocked_times, blocked_ids = blocked_ng.behavior[5].store.spikes()
+    assert len(times) > 0
+    assert (blocked_times == times).all() and (blocked_ids == ids).all()
+    assert torch.equal(blocked_ng.behavior[6].variables["spike"], ng.behavior[6].variables["spike"])
+    for variable in ("u", "I"):
+        assert torch.equal(blocked_ng.behavior[4].variables[variable], ng.behavior[4].variables[variable])
+    assert torch.equal(blocked_ng.u, ng.u) and torch.equal(blocked_ng.I, ng.I)
+
+
+def test_inputs_are_generated_in_parts(monkeypatch):
+    # groups too large for a whole block of inputs in cache advance in parts of the block
+    calls = []
+    block_method = ConstantCurrent.block
+    monkeypatch.setattr(ConstantCurrent, "block", lambda self, ng, start, steps: calls.append(steps) or
+                        block_method(self, ng, start, steps))
+    sim = build_lif("constant", size=2 ** 15)
+    sim.simulate(20, block_size=10, info=False)
+    # blocks of 5 steps (the stride of the Recorder), 2^17 // 2^15 = 4 steps of inputs at a time
+    assert calls == [4, 1] * 4
+
+
+def test_other_behaviors_fall_back_to_stepping():
+    sim = build_lif("constant")
+    sim.net.NeuronGroups[0].add_behavior(7, SteadyState(), initialize=False)
+    sim.net.initialize(info=False)
+    assert group_blocks(sim.net, [], 10) is None
@@ -0,0 +1,56 @@
+import os
+
+import torch
+from pymonntorch import *
+
+from cache import ResultCache, source_files
+from currents import ConstantCurrent
+from models import AELIF
+from simulate import Simulation
+from time_res import TimeResolution
+
+AELIF_PARAMS = dict(a=6.7, b=0.5, R=1.7, tau_m=10, tau_w=100, threshold=-30, rh_threshold=-50,
+                    u_rest=-65, u_reset=-70, delta_T=1, refractory_T=1.0)
+
+
+def build():
+    sim = Simulation(Network(behavior={1: TimeResolution(dt=0.5)}))
+    # The noise has no seed of its own: it is drawn from the global generator and kept in the cache
+    sim.add_neuron_group(tag="ng", size=10, behavior={
+        2: ConstantCurrent(value=torch.linspace(20, 60, 10), noise_range=10.0),
+        3: AELIF(**AELIF_PARAMS),
+        5: EventRecorder(variables=["spike"]),
+    })
+    return sim
+
+
+def state(sim):
+    ng = sim.net.NeuronGroups[0]
+    return ng.u, ng.w, ng.I, ng.last_spike
+
+
+def test_cache_resumes_a_shorter_run(tmp_path):
+    cache = ResultCache(str(tmp_path))
+    whole = build()
+    whole.simulate(300, seed=4, info=False)
+
+    build().simulate(120, seed=4, info=False, cache=cache)
+    resumed = build()
+    resumed.simulate(300, seed=4, info=False, cache=cache)
+    for expected, value in zip(state(whole), state(resumed)):
+        assert torch.equal(value, expected)
+    assert torch.equal(resumed.net.NeuronGroups[0].behavior[5].variables["spike"],
+                       whole.net.NeuronGroups[0].behavior[5].variables["spike"])
+
+    # A run of the same length is loaded without simulating
+    loaded = build()
+    assert cache.simulate(loaded, 300, info=False, seed=4) == 300
+    for expected, value in zip(state(whole), state(loaded)):
+        assert torch.equal(value, expected)
+
+
+def test_every_module_is_part_of_the_code_version():
+    files = {os.path.basename(file) for file in source_files(build().net)}
+    assert {"rng.py", "integrators.py", "stimuli.py", "utils.py", "spikes.py", "block.py", "event_driven.py",
+            "models.py", "currents.py"} <= files
+    assert "Network.py" in files
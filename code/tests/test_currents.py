@@ -0,0 +1,39 @@
+import pytest
+import torch
+from pymonntorch import *
+
+from currents import NoisyCurrent
+from time_res import TimeResolution
+
+ITERATIONS = 500
+
+
+def run(noise_type, splits, chunk_size=64):
+    net = Network(behavior={1: TimeResolution(dt=1.0)})
+    ng = NeuronGroup(net=net, size=4, behavior={
+        2: NoisyCurrent(iterations=ITERATIONS, noise_type=noise_type, mean=2.0, std=3.0, seed=5,
+                        chunk_size=chunk_size),
+        4: Recorder(variables=["I"]),
+    })
+    net.initialize(info=False)
+    for iterations in splits:
+        net.simulate_iterations(iterations, measure_block_time=False)
+    # The clock starts at iteration 1, the series at 0
+    return torch.cat([ng.behavior[2].noise_at(ng, 0)[None].float(), ng.behavior[4].variables["I"]])
+
+
+@pytest.mark.parametrize("noise_type", ["white", "brownian"])
+def test_streamed_series_does_not_depend_on_the_split(noise_type):
+    whole = run(noise_type, [ITERATIONS - 1])
+    assert torch.equal(run(noise_type, [100, 37, ITERATIONS - 138]), whole)
+
+
+def test_brownian_series_is_scaled_over_the_whole_run():
+    series = run("brownian", [ITERATIONS - 1]).double()
+    assert torch.allclose(series.mean(dim=0), torch.full((4,), 2.0, dtype=torch.float64), atol=1e-4)
+    assert torch.allclose(series.std(dim=0, unbiased=False), torch.full((4,), 3.0, dtype=torch.float64), atol=1e-4)
+
+
+def test_series_end():
+    with pytest.raises(IndexError):
+        run("white", [ITERATIONS])
@@ -0,0 +1,48 @@
+import math
+
+import torch
+from pymonntorch import *
+
+from currents import StepCurrent
+from models import LIF
+from simulate import Simulation
+from time_res import TimeResolution
+
+LIF_PARAMS = dict(R=5, tau=10, threshold=-37, u_rest=-67, u_reset=-75, ratio=0)
+VALUES = torch.tensor([5.0, 8.0, 12.0])
+
+
+def run(event_driven, record=True, iterations=100):
+    sim = Simulation(Network(behavior={1: TimeResolution(dt=1.0)}))
+    behavior = {
+        2: StepCurrent(value=VALUES, t_start=10, t_end=150),
+        3: LIF(**LIF_PARAMS),
+        5: EventRecorder(variables=["spike"]),
+    }
+    if record:
+        behavior[4] = Recorder(variables=["u", "I"])
+    sim.add_neuron_group(tag="ng", size=len(VALUES), behavior=behavior)
+    sim.simulate(iterations, event_driven=event_driven, info=False)
+    return sim.net.NeuronGroups[0]
+
+
+def test_recorded_group_is_time_stepped():
+    stepped, solved = run(False), run(True)
+    for variable in ("u", "I"):
+        assert torch.equal(solved.behavior[4].variables[variable], stepped.behavior[4].variables[variable])
+    assert torch.equal(solved.behavior[5].variables["spike"], stepped.behavior[5].variables["spike"])
+
+
+def test_solved_state_matches_closed_form():
+    ng = run(True, record=False)
+    assert torch.equal(ng.I, VALUES)
+    u_rest, u_reset, tau = LIF_PARAMS["u_rest"], LIF_PARAMS["u_reset"], LIF_PARAMS["tau"]
+    u_inf = u_rest + LIF_PARAMS["R"] * VALUES[2].item()
+    # u relaxes from u_reset to u_rest until t_start=10, then towards u_inf
+    u_start = u_rest + (u_reset - u_rest) * math.exp(-10 / tau)
+    first = 10 + tau * math.log((u_inf - u_start) / (u_inf - LIF_PARAMS["threshold"]))
+    times = ng.spike_times[ng.behavior[5].variables["spike"][:, 1] == 2]
+    assert abs(times[0].item() - first) < 1e-6
+    # The final state is the closed form from the last spike
+    expected = u_inf + (u_reset - u_inf) * math.exp(-(100 - times[-1].item()) / tau)
+    assert abs(ng.u[2].item() - expected) < 1e-4
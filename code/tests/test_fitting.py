@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from currents import ConstantCurrent
+from fitting import CMAES, Fitter
+from models import LIF
+
+FIXED = dict(R=5, threshold=-37, u_rest=-67, u_reset=-75)
+BOUNDS = {"tau": (5, 20)}
+
+
+def fitter(**fixed):
+    # The noisy current has no seed of its own: the fitter draws one and keeps it
+    protocols = [(ConstantCurrent(value=10, noise_range=20.0), [5.0, 20.0, 35.0])]
+    return Fitter(LIF, {**FIXED, **fixed}, BOUNDS, protocols, duration=50, dt=0.5, segments=5)
+
+
+def test_fixed_ratio_overrides_the_default():
+    assert fitter(ratio=1.0).fixed["ratio"] == 1.0
+    assert fitter().fixed["ratio"] == 0
+
+
+def test_shrink_keeps_the_input_of_every_lane():
+    f = fitter()
+    unit = np.linspace(0, 1, 8)[:, None]
+    distances, stopped = f.evaluate(unit)
+    assert not stopped.any()
+    # Stop the first half of the lanes at the first check, which shrinks the batch
+    cutoff = np.where(np.arange(8) < 4, -1.0, np.inf)
+    shrunk, stopped = f.evaluate(unit, cutoff)
+    assert stopped.tolist() == [True] * 4 + [False] * 4
+    assert np.array_equal(shrunk[4:], distances[4:])
+
+
+def test_run_without_completed_candidates():
+    with pytest.raises(RuntimeError):
+        fitter().run(CMAES(dim=1, population=4, seed=0), generations=0, info=False)
@@ -0,0 +1,52 @@
+import pytest
+import torch
+from pymonntorch import *
+
+from currents import ConstantCurrent
+from models import LIF, ELIF, AELIF
+from time_res import TimeResolution
+
+SIZE = 16
+MODELS = {
+    "LIF": (LIF, dict(R=5, tau=10, threshold=-37, u_rest=-67, u_reset=-75)),
+    "ELIF": (ELIF, dict(R=1.7, tau=10, threshold=-13, rh_threshold=-42, u_rest=-65, u_reset=-73, delta_T=0.1)),
+    "AELIF": (AELIF, dict(a=6.7, b=0.5, R=1.7, tau_m=10, tau_w=100, threshold=-30, rh_threshold=-50,
+                          u_rest=-65, u_reset=-70, delta_T=1)),
+}
+REFRACTORY = {"none": 0, "scalar": 2.0, "per neuron": torch.linspace(0, 4, SIZE)}
+
+
+def run(model, params, refractory_T, fused):
+    torch.manual_seed(0)
+    net = Network(behavior={1: TimeResolution(dt=0.5)})
+    ng = NeuronGroup(net=net, size=SIZE, behavior={
+        2: ConstantCurrent(value=torch.linspace(5, 40, SIZE), noise_range=2.0, seed=1),
+        3: model(**params, refractory_T=refractory_T, fused=fused),
+        4: Recorder(variables=["u", "w"] if model is AELIF else ["u"]),
+        5: EventRecorder(variables=["spike"]),
+    })
+    net.initialize(info=False)
+    net.simulate_iterations(300, measure_block_time=False)
+    return ng.behavior[4].variables, ng.behavior[5].variables["spike"]
+
+
+@pytest.mark.parametrize("refractory", REFRACTORY)
+@pytest.mark.parametrize("name", MODELS)
+def test_fused_matches_default(name, refractory):
+    model, params = MODELS[name]
+    traces, spikes = run(model, params, REFRACTORY[refractory], fused=False)
+    fused_traces, fused_spikes = run(model, params, REFRACTORY[refractory], fused=True)
+    assert len(spikes) > 0
+    assert torch.equal(fused_spikes, spikes)
+    for variable, trace in traces.items():
+        assert torch.equal(fused_traces[variable], trace), variable
+
+
+@pytest.mark.parametrize("name", MODELS)
+def test_scratch_keeps_module_buffers(name):
+    model, params = MODELS[name]
+    net = Network(behavior={1: TimeResolution(dt=0.5)})
+    ng = NeuronGroup(net=net, size=SIZE, behavior={3: model(**params, fused=True)})
+    net.initialize(info=False)
+    assert len(ng.behavior[3].scratch) == 2
+    assert list(ng.behavior[3].buffers()) == []
@@ -0,0 +1,117 @@
+import math
+
+import pytest
+import torch
+
+from integrators import INTEGRATORS, advance
+
+K = torch.tensor([0.5, 1.0, 4.0], dtype=torch.float64)
+THRESHOLD = torch.tensor(1e9, dtype=torch.float64)
+
+
+def decay(y):
+    return [-K * y[0]]
+
+
+def decay_jacobian(y):
+    return [-K.expand_as(y[0])]
+
+
+def square(y):
+    # y' = -y^2 from y(0) = 1 is 1 / (1 + t), with a Jacobian that is not constant
+    return [-y[0] ** 2]
+
+
+def square_jacobian(y):
+    return [-2 * y[0]]
+
+
+def no_reset(y, mask):
+    return y
+
+
+def errors(step, rhs, jacobian, exact, counts, duration=1.0):
+    result = []
+    for n in counts:
+        y = [torch.ones(len(K), dtype=torch.float64)]
+        for _ in range(n):
+            y = step(rhs, y, duration / n, jacobian)
+        result.append((y[0] - exact).abs())
+    return result
+
+
+@pytest.mark.parametrize("method", ["euler", "rk2", "rk4"])
+def test_convergence_order_on_linear_decay(method):
+    step, order = INTEGRATORS[method]
+    coarse, fine = errors(step, decay, decay_jacobian, torch.exp(-K), [32, 64])
+    assert torch.allclose(torch.log2(coarse / fine), torch.full_like(K, order), atol=0.1)
+
+
+@pytest.mark.parametrize("method", ["euler", "exp_euler", "rk2", "rk4"])
+def test_convergence_order_on_nonlinear_decay(method):
+    step, order = INTEGRATORS[method]
+    # the exponential Euler step with the exact Jacobian is second order on smooth problems
+    order = max(order, 2) if method == "exp_euler" else order
+    coarse, fine = errors(step, square, square_jacobian, 0.5, [16, 32])
+    assert torch.allclose(torch.log2(coarse / fine), torch.full_like(K, order), atol=0.1)
+
+
+def test_exponential_euler_is_exact_on_linear_decay():
+    step, _ = INTEGRATORS["exp_euler"]
+    y = step(decay, [torch.ones(len(K), dtype=torch.float64)], 1.0, decay_jacobian)
+    assert torch.allclose(y[0], torch.exp(-K), rtol=1e-14, atol=0)
+
+
+@pytest.mark.parametrize("method", ["rk2", "rk4"])
+def test_adaptive_substeps_respect_the_tolerance(method):
+    previous = None
+    for tolerance in [1e-3, 1e-5, 1e-7]:
+        y, h = [torch.ones(len(K), dtype=torch.float64)], None
+        for _ in range(5):
+            y, spike, _, h = advance(y, decay, 1.0, THRESHOLD, no_reset, method=method, jacobian=decay_jacobian,
+                                     adaptive=True, tolerance=tolerance, h=h)
+            assert not spike.any()
+        error = (y[0] - torch.exp(-5 * K)).abs().max().item()
+        # five steps of the clock, each split into a few substeps of local error below the tolerance
+        assert error <= 20 * tolerance
+        assert previous is None or error < previous
+        previous = error
+
+
+def test_adaptive_substeps_keep_a_stiff_lane_stable():
+    # a single Heun step of dt = 1 multiplies y by 1 - k + k^2 / 2 = 41 for k = 10
+    k = torch.tensor([10.0], dtype=torch.float64)
+    rhs, jacobian = lambda y: [-k * y[0]], lambda y: [-k.expand_as(y[0])]
+    fixed, _, _, _ = advance([torch.ones(1, dtype=torch.float64)], rhs, 1.0, THRESHOLD, no_reset, method="rk2")
+    assert fixed[0].item() == pytest.approx(41.0)
+    adaptive, _, _, _ = advance([torch.ones(1, dtype=torch.float64)], rhs, 1.0, THRESHOLD, no_reset, method="rk2",
+                                jacobian=jacobian, adaptive=True, tolerance=1e-6)
+    assert abs(adaptive[0].item() - math.exp(-10)) < 1e-5
+
+
+def ramp(y):
+    # u' = 1 crosses the threshold 0.3 at 0.3 of a step of size 1
+    return [torch.ones_like(y[0])]
+
+
+def ramp_jacobian(y):
+    return [torch.zeros_like(y[0])]
+
+
+def reset(y, mask):
+    return [torch.where(mask, torch.full_like(y[0], -1.0), y[0])]
+
+
+@pytest.mark.parametrize("method", ["euler", "exp_euler", "rk2", "rk4"])
+@pytest.mark.parametrize("mode", ["fixed", "adaptive", "precise"])
+def test_threshold_crossing_inside_the_step(method, mode):
+    y = [torch.tensor([0.0, -1.5], dtype=torch.float64)]
+    system = lambda index, after_spike: (ramp, ramp_jacobian, reset)
+    y, spike, offset, _ = advance(y, ramp, 1.0, 0.3, reset, method=method, jacobian=ramp_jacobian,
+                                  adaptive=mode == "adaptive", system=system if mode == "precise" else None)
+    assert spike.tolist() == [True, False]
+    assert offset[0].item() == pytest.approx(0.3)
+    assert offset[1].item() == 0
+    assert y[0][1].item() == pytest.approx(-0.5)
+    # the fixed step resets at the end of the step, the others integrate the rest of it after the reset
+    assert y[0][0].item() == pytest.approx(-1.0 if mode == "fixed" else -0.3)
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+import torch
+from pymonntorch import *
+
+from currents import ConstantCurrent
+from models import LIF
+from online_stats import OnlineStatistics
+from time_res import TimeResolution
+
+SIZE = 8
+ITERATIONS = 600
+
+
+def run(skip):
+    net = Network(behavior={1: TimeResolution(dt=0.5)})
+    ng = NeuronGroup(net=net, size=SIZE, behavior={
+        2: ConstantCurrent(value=torch.linspace(2, 30, SIZE), noise_range=10.0, seed=9),
+        3: LIF(R=5, tau=10, threshold=-37, u_rest=-67, u_reset=-75, refractory_T=1.0),
+        4: Recorder(variables=["u", "I"]),
+        5: EventRecorder(variables=["spike"]),
+        6: OnlineStatistics(variables=["u", "I"], skip=skip, count_window=10.0),
+    })
+    net.initialize(info=False)
+    net.simulate_iterations(ITERATIONS, measure_block_time=False)
+    return ng
+
+
+@pytest.mark.parametrize("skip", [0, 100])
+def test_state_statistics_match_the_trace(skip):
+    ng = run(skip)
+    summary = ng.behavior[6].summary()
+    assert summary["steps"] == ITERATIONS - skip
+    for name in ("u", "I"):
+        trace = ng.behavior[4].variables[name][skip:].to(torch.float64)
+        assert torch.allclose(summary[f"mean_{name}"], trace.mean(dim=0), rtol=1e-10, atol=1e-10)
+        assert torch.allclose(summary[f"var_{name}"], trace.var(dim=0), rtol=1e-8, atol=1e-10)
+        assert torch.equal(summary[f"min_{name}"], trace.amin(dim=0))
+        assert torch.equal(summary[f"max_{name}"], trace.amax(dim=0))
+
+
+@pytest.mark.parametrize("skip", [0, 100])
+def test_spike_statistics_match_the_events(skip):
+    ng = run(skip)
+    summary = ng.behavior[6].summary()
+    events = ng.behavior[5].variables["spike"].numpy()
+    events = events[events[:, 0] > skip]
+    counts = np.bincount(events[:, 1], minlength=SIZE)
+    assert counts.sum() > 20
+    assert np.allclose(summary["rate"].numpy(), counts / ((ITERATIONS - skip) * 0.5))
+    for neuron in range(SIZE):
+        isi = np.diff(events[events[:, 1] == neuron, 0]) * 0.5
+        if len(isi) > 1:
+            assert np.isclose(summary["isi_mean"][neuron].item(), isi.mean())
+            assert np.isclose(summary["isi_cv"][neuron].item(), isi.std(ddof=1) / isi.mean())
+        elif not len(isi):
+            assert np.isnan(summary["isi_mean"][neuron].item())
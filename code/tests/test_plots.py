@@ -0,0 +1,37 @@
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+from plots import decimate, plot_raster, plot_trace, set_headless
+
+set_headless()
+
+
+def test_short_trace_is_kept():
+    y = np.arange(10.0)
+    x, kept = decimate(y, width=5)
+    assert np.array_equal(x, np.arange(10)) and np.array_equal(kept, y)
+
+
+@pytest.mark.parametrize("length", [10_000, 10_007])
+def test_decimation_keeps_extremes_in_time_order(length):
+    rng = np.random.default_rng(0)
+    y = rng.standard_normal((length, 3)).cumsum(axis=0)
+    y[1234, 1] = 100.0
+    y[length - 1, 2] = -100.0
+    x, kept = decimate(y, width=100)
+    assert len(x) <= 2 * 101
+    assert np.all(np.diff(x, axis=0) >= 0)
+    assert np.array_equal(kept, np.take_along_axis(y, x, axis=0))
+    assert np.array_equal(kept.max(axis=0), y.max(axis=0))
+    assert np.array_equal(kept.min(axis=0), y.min(axis=0))
+
+
+def test_plots_draw():
+    fig, ax = plt.subplots()
+    assert len(plot_trace(ax, np.random.default_rng(0).standard_normal((50_000, 2)))) == 2
+    times = np.repeat(np.arange(1000), 200)
+    ids = np.tile(np.arange(200), 1000)
+    image = plot_raster(ax, times, ids, max_points=1000, bins=(100, 50))
+    assert image.get_array().sum() == len(times)
+    plt.close(fig)
@@ -0,0 +1,61 @@
+import math
+
+import pytest
+import torch
+from pymonntorch import *
+
+from currents import ConstantCurrent
+from integrators import exp_euler, locate_crossing
+from models import LIF, ELIF
+from spikes import SpikeRecorder
+from time_res import TimeResolution
+
+LIF_PARAMS = dict(R=5, tau=10, threshold=-37, u_rest=-67, u_reset=-75, ratio=0)
+ELIF_PARAMS = dict(R=1.7, tau=10, threshold=-13, rh_threshold=-42, u_rest=-65, u_reset=-73, delta_T=0.1, ratio=0)
+CURRENTS = torch.tensor([7.0, 9.0, 12.0])
+
+
+def spike_trains(model, params, dt, duration=100, **kwargs):
+    net = Network(behavior={1: TimeResolution(dt=dt)})
+    ng = NeuronGroup(net=net, size=len(CURRENTS), behavior={
+        2: ConstantCurrent(value=CURRENTS if model is LIF else CURRENTS * 3),
+        3: model(**params, **kwargs),
+        5: SpikeRecorder(offsets=True),
+    })
+    net.initialize(info=False)
+    net.simulate_iterations(round(duration / dt), measure_block_time=False)
+    times, ids = ng.behavior[5].store.spike_times(dt)
+    return [torch.as_tensor(times[ids == lane]) for lane in range(len(CURRENTS))]
+
+
+def test_locate_crossing_of_linear_decay():
+    # du/dt = -(u - 10): from 0 the threshold 5 is reached at t = ln 2
+    rhs = lambda y: [-(y[0] - 10.0)]
+    jacobian = lambda y: [torch.full_like(y[0], -1.0)]
+    y = [torch.zeros(1, dtype=torch.float64)]
+    fraction, y_sub = locate_crossing(y, rhs, 1.0, 5.0, exp_euler, torch.tensor([0.5], dtype=torch.float64),
+                                      jacobian)
+    assert abs(fraction.item() - math.log(2)) < 1e-12
+    assert abs(y_sub[0].item() - 5.0) < 1e-10
+
+
+@pytest.mark.parametrize("dt", [1.0, 0.5])
+def test_precise_lif_matches_the_analytic_spike_times(dt):
+    for lane, train in enumerate(spike_trains(LIF, LIF_PARAMS, dt, precise=True)):
+        u_inf = LIF_PARAMS["u_rest"] + LIF_PARAMS["R"] * CURRENTS[lane].item()
+        period = LIF_PARAMS["tau"] * math.log((u_inf - LIF_PARAMS["u_reset"]) / (u_inf - LIF_PARAMS["threshold"]))
+        expected = period * torch.arange(1, len(train) + 1, dtype=torch.float64)
+        assert len(train) == int(100 // period)
+        assert torch.allclose(train, expected, atol=2e-3)
+
+
+def test_precise_elif_is_closer_than_grid_spikes():
+    reference = spike_trains(ELIF, ELIF_PARAMS, 0.001, duration=50)
+
+    def error(trains):
+        # Error of the first spike, which is not blurred by the phase drift of a slightly wrong rate
+        return max(abs(t[0] - r[0]).item() for t, r in zip(trains, reference))
+
+    precise = error(spike_trains(ELIF, ELIF_PARAMS, 0.5, duration=50, precise=True, integrator="rk4"))
+    grid = error(spike_trains(ELIF, ELIF_PARAMS, 0.5, duration=50))
+    assert precise < grid
@@ -0,0 +1,89 @@
+import pytest
+import torch
+from pymonntorch import *
+
+import models
+from currents import ConstantCurrent
+from models import LIF, ELIF, AELIF
+from simulate import Simulation
+from spikes import SpikeRecorder
+from time_res import TimeResolution
+
+CURRENTS = torch.linspace(5, 40, 16)
+MODELS = {
+    "LIF": (LIF, dict(R=5, tau=10, threshold=-37, u_rest=-67, u_reset=-75, refractory_T=2.0)),
+    "ELIF": (ELIF, dict(R=1.7, tau=10, threshold=-13, rh_threshold=-42, u_rest=-65, u_reset=-73, delta_T=0.1,
+                        refractory_T=2.0)),
+    "AELIF": (AELIF, dict(a=6.7, b=0.5, R=1.7, tau_m=10, tau_w=100, threshold=-30, rh_threshold=-50,
+                          u_rest=-65, u_reset=-70, delta_T=1, refractory_T=2.0)),
+}
+
+
+def run(model, params, block_size=None, **kwargs):
+    sim = Simulation(Network(behavior={1: TimeResolution(dt=0.5)}))
+    sim.add_neuron_group(tag="ng", size=len(CURRENTS), behavior={
+        2: ConstantCurrent(value=CURRENTS),
+        3: model(**params, ratio=0, **kwargs),
+        4: Recorder(variables=["u", "I"]),
+        5: SpikeRecorder(),
+        6: EventRecorder(variables=["spike"]),
+    })
+    sim.simulate(200, block_size=block_size, info=False)
+    ng = sim.net.NeuronGroups[0]
+    return ng.behavior[4].variables["u"], ng.behavior[5].store.spikes(), ng.behavior[6].variables["spike"]
+
+
+@pytest.mark.parametrize("name", MODELS)
+@pytest.mark.parametrize("block_size", [None, 10])
+def test_compact_with_standard_recorders(name, block_size):
+    model, params = MODELS[name]
+    u, (times, ids), events = run(model, params, block_size)
+    compact_u, (compact_times, compact_ids), compact_events = run(model, params, block_size, compact=True)
+    assert len(events) > 0
+    assert torch.equal(compact_u, u)
+    assert torch.equal(compact_events, events)
+    assert (compact_times == times).all() and (compact_ids == ids).all()
+
+
+@pytest.mark.parametrize("name", MODELS)
+def test_half_precision_keeps_spike_tensor(name):
+    model, params = MODELS[name]
+    _, _, events = run(model, params, precision="float16", compact=True)
+    assert len(events) > 0
+
+
+def rates(model, params, **kwargs):
+    net = Network(behavior={1: TimeResolution(dt=0.1)})
+    ng = NeuronGroup(net=net, size=len(CURRENTS), behavior={
+        2: ConstantCurrent(value=CURRENTS),
+        3: model(**params, ratio=0, **kwargs),
+        5: SpikeRecorder(),
+    })
+    net.initialize(info=False)
+    net.simulate_iterations(2000, measure_block_time=False)
+    return torch.as_tensor(ng.behavior[5].store.rates(0, net.iteration + 1, 0.1), dtype=torch.float64)
+
+
+@pytest.mark.parametrize("name", MODELS)
+@pytest.mark.parametrize("precision", ["float16", "bfloat16"])
+def test_half_precision_rate_error(name, precision):
+    model, params = MODELS[name]
+    reference = rates(model, params, precision="float64")
+    half = rates(model, params, precision=precision, compact=True)
+    # at most one spike more or less per lane in the 200 ms
+    assert (reference > 0).sum() > len(CURRENTS) // 2
+    assert ((half - reference).abs() * 200).round().max() <= 1
+    assert (half.sum() - reference.sum()).abs() / reference.sum() < 0.02
+
+
+@pytest.mark.parametrize("name", MODELS)
+@pytest.mark.parametrize("kwargs", [dict(compact=True), dict(compact=True, fused=True),
+                                    dict(precision="float16", compact=True), dict(precision="float16", precise=True)])
+def test_chunked_step(monkeypatch, name, kwargs):
+    model, params = MODELS[name]
+    u, (times, ids), _ = run(model, params, **kwargs)
+    monkeypatch.setattr(models, "CHUNK_SIZE", 5)
+    chunked_u, (chunked_times, chunked_ids), _ = run(model, params, **kwargs)
+    assert len(times) > 0
+    assert torch.equal(chunked_u, u)
+    assert (chunked_times == times).all() and (chunked_ids == ids).all()
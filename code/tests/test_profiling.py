@@ -0,0 +1,55 @@
+import json
+
+import torch
+from pymonntorch import *
+
+import profiling
+from currents import ConstantCurrent
+from models import LIF
+from profiling import Profiler, allocated_bytes
+from time_res import TimeResolution
+
+
+def network():
+    net = Network(behavior={1: TimeResolution(dt=1.0)})
+    NeuronGroup(net=net, size=10, tag="ng", behavior={
+        2: ConstantCurrent(value=torch.linspace(5, 10, 10)),
+        3: LIF(R=5, tau=10, threshold=-37, u_rest=-67, u_reset=-75),
+        4: Recorder(variables=["u"]),
+    })
+    net.initialize(info=False)
+    return net
+
+
+def test_allocated_bytes_without_proc(monkeypatch):
+    measured = allocated_bytes()
+    assert measured is None or measured > 0
+    monkeypatch.setattr(profiling, "STATM", "/nonexistent/statm")
+    assert allocated_bytes() is None
+
+
+def test_profiler_counts_every_call(tmp_path):
+    net = network()
+    profiler = Profiler(trace_steps=5)
+    profiler.run(net, 20)
+    assert net.iteration == 20
+    assert len(profiler.step_times) == 20
+    names = {name for _, _, name in profiler.stats}
+    assert {"TimeResolution", "ConstantCurrent", "LIF", "Recorder"} <= names
+    assert all(calls == 20 for _, calls, _ in profiler.stats.values())
+    assert "LIF" in profiler.summary()
+
+    profiler.save_trace(tmp_path / "trace.json")
+    with open(tmp_path / "trace.json") as f:
+        trace = json.load(f)
+    assert len(trace["traceEvents"]) >= 5 * len(profiler.stats)
+
+
+def test_profiler_without_memory_measurement(monkeypatch):
+    monkeypatch.setattr(profiling, "STATM", "/nonexistent/statm")
+    net = network()
+    profiler = Profiler()
+    profiler.run(net, 5)
+    assert not profiler.memory
+    assert all(grown == 0 for _, _, grown in profiler.stats.values())
+    assert profiler.summary().splitlines()[1].rstrip().endswith("-")
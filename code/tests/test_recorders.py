@@ -0,0 +1,82 @@
+import gc
+import os
+
+import numpy as np
+import pytest
+import torch
+from pymonntorch import *
+
+from currents import ConstantCurrent
+from models import LIF
+from recorders import ChunkedArray, StreamRecorder
+from time_res import TimeResolution
+
+
+def test_chunked_array_after_early_flush(tmp_path):
+    array = ChunkedArray(str(tmp_path / "u"), 3, "float32", chunk_size=4)
+    rows = np.arange(33, dtype=np.float32).reshape(11, 3)
+    for row in rows[:6]:
+        array.append(row)
+    array.flush()
+    for row in rows[6:]:
+        array.append(row)
+    assert len(array) == 11
+    assert np.array_equal(np.asarray(array), rows)
+    assert np.array_equal(array[3:9], rows[3:9])
+    assert np.array_equal(array[::-2, 1], rows[::-2, 1])
+    assert np.array_equal(array[-1], rows[-1])
+    with pytest.raises(IndexError):
+        array[11]
+
+
+def run(precision="float32", **kwargs):
+    net = Network(behavior={1: TimeResolution(dt=1.0)})
+    ng = NeuronGroup(net=net, size=5, behavior={
+        2: ConstantCurrent(value=torch.linspace(5, 10, 5)),
+        3: LIF(R=5, tau=10, threshold=-37, u_rest=-67, u_reset=-75, precision=precision),
+        4: Recorder(variables=["u"]),
+        5: StreamRecorder(variables=["u"], chunk_size=8, **kwargs),
+    })
+    net.initialize(info=False)
+    net.simulate_iterations(13, measure_block_time=False)
+    ng.behavior[5].flush()
+    net.simulate_iterations(20, measure_block_time=False)
+    return ng
+
+
+def test_stream_recorder_matches_recorder():
+    ng = run()
+    assert np.array_equal(np.asarray(ng.behavior[5].variables["u"]), ng.behavior[4].variables["u"].numpy())
+
+
+def test_temporary_directory_is_removed():
+    ng = run()
+    directory = ng.behavior[5].directory
+    assert os.listdir(directory)
+    ng.behavior[5].close()
+    assert not os.path.exists(directory)
+
+    ng = run()
+    directory = ng.behavior[5].directory
+    del ng
+    gc.collect()
+    assert not os.path.exists(directory)
+
+
+def test_given_directory_is_kept(tmp_path):
+    run(directory=str(tmp_path)).behavior[5].close()
+    assert os.listdir(tmp_path)
+
+
+def test_bfloat16_group():
+    ng = run(precision="bfloat16")
+    assert np.array_equal(np.asarray(ng.behavior[5].variables["u"]), ng.behavior[4].variables["u"].float().numpy())
+
+
+def test_clear_keeps_other_files(tmp_path):
+    (tmp_path / "notes.txt").write_text("keep")
+    ng = run(directory=str(tmp_path))
+    recorder = ng.behavior[5]
+    recorder.clear_recorder()
+    assert os.listdir(tmp_path) == ["notes.txt"]
+    assert len(recorder.variables["u"]) == 0
@@ -0,0 +1,64 @@
+import pytest
+import torch
+from pymonntorch import *
+
+from currents import ConstantCurrent, NoisyCurrent
+from rng import normal, philox, uniform
+from time_res import TimeResolution
+
+# Known-answer vectors of Philox4x32-10 from Random123
+KAT = [
+    ((0, 0, 0, 0), (0, 0), (0x6627e8d5, 0xe169c58d, 0xbc57ac4c, 0x9b00dbd8)),
+    ((0xffffffff,) * 4, (0xffffffff,) * 2, (0x408f276d, 0x41c83b0e, 0xa20bc7c6, 0x6d5451fd)),
+    ((0x243f6a88, 0x85a308d3, 0x13198a2e, 0x03707344), (0xa4093822, 0x299f31d0),
+     (0xd16cfe09, 0x94fdcceb, 0x5001e420, 0x24126ea1)),
+]
+
+
+@pytest.mark.parametrize("counter, key, expected", KAT)
+def test_philox_known_answers(counter, key, expected):
+    words = philox([torch.tensor([c], dtype=torch.int64) for c in counter], key)
+    assert tuple(int(w) for w in words) == expected
+
+
+@pytest.mark.parametrize("generate", [uniform, normal])
+def test_values_do_not_depend_on_the_block(generate):
+    ids = torch.arange(5, 12)
+    whole = generate(7, 3, ids, torch.arange(0, 37))
+    assert torch.equal(generate(7, 3, ids, torch.arange(13, 30)), whole[13:30])
+    assert torch.equal(generate(7, 3, ids[2:4], torch.tensor([21])), whole[21:22, 2:4])
+    assert not torch.equal(generate(7, 4, ids, torch.arange(0, 37)), whole)
+
+
+def currents(behavior, sizes, iterations=40):
+    """
+    Input of a population split into groups of the given sizes, one row per iteration
+    """
+    net = Network(behavior={1: TimeResolution(dt=1.0)})
+    groups, offset = [], 0
+    for size in sizes:
+        ng = NeuronGroup(net=net, size=size, behavior={2: behavior(), 9: Recorder(variables=["I"])})
+        ng.id_offset = offset
+        groups.append(ng)
+        offset += size
+    net.initialize(info=False)
+    net.simulate_iterations(iterations, measure_block_time=False)
+    return torch.cat([ng.behavior[9].variables["I"] for ng in groups], dim=1)
+
+
+def test_current_noise_does_not_depend_on_the_split():
+    behavior = lambda: ConstantCurrent(value=5.0, noise_range=2.0, seed=11)
+    whole = currents(behavior, [12])
+    assert whole.std() > 0
+    assert torch.equal(currents(behavior, [5, 7]), whole)
+
+
+@pytest.mark.parametrize("noise_type", ["white", "brownian"])
+def test_noisy_current_does_not_depend_on_the_chunk_size(noise_type):
+    def behavior(chunk_size):
+        return lambda: NoisyCurrent(iterations=60, noise_type=noise_type, mean=1.0, std=2.0, seed=3,
+                                    chunk_size=chunk_size)
+
+    whole = currents(behavior(256), [6], iterations=59)
+    assert torch.allclose(currents(behavior(7), [6], iterations=59), whole, atol=1e-5)
+    assert torch.equal(currents(behavior(256), [2, 4], iterations=59), whole)
@@ -0,0 +1,54 @@
+import glob
+import os
+
+import numpy as np
+import pytest
+
+from parallel import load_result, run_job
+from runner import expand, load_output, main, read_scenarios, run_scenario
+
+SCENARIOS = sorted(glob.glob(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                          "scenarios", "*.json")))
+
+
+def test_scenarios_run(tmp_path):
+    manifests = main(SCENARIOS + ["--out", str(tmp_path), "--quiet"])
+    assert len(manifests) == sum(len(read_scenarios(scenario)) for scenario in SCENARIOS)
+    for manifest in manifests:
+        assert load_output(str(tmp_path), manifest["name"])["data"]
+
+
+@pytest.mark.parametrize("scenario", SCENARIOS)
+def test_runner_matches_pool_job(tmp_path, scenario):
+    spec = expand(read_scenarios(scenario)[0])
+    output = run_scenario(spec, 0, str(tmp_path))
+    result = load_result(run_job(spec, 0, str(tmp_path / "job")))
+    data = load_output(str(tmp_path), output["name"])["data"]
+    for tag, keys in result["data"].items():
+        for key, variables in keys.items():
+            for variable, array in variables.items():
+                assert np.array_equal(data[f"{tag}/{key}/{variable}"], array)
+
+
+def test_unknown_simulate_option(tmp_path):
+    spec = expand(read_scenarios(SCENARIOS[0])[0])
+    spec["simulate"] = {"block_sizes": 10}
+    with pytest.raises(ValueError):
+        run_scenario(spec, 0, str(tmp_path))
+    with pytest.raises(ValueError):
+        run_job(spec, 0, str(tmp_path))
+
+
+def test_fractional_keys_round_trip(tmp_path):
+    spec = {"name": "fractional", "dt": 1.0, "iterations": 50, "groups": [{
+        "tag": "ng", "size": 3,
+        "behavior": {
+            2: ("currents.ConstantCurrent", {"value": 10}),
+            3: ("models.LIF", {"R": 5, "tau": 10, "threshold": -37, "u_rest": -67, "u_reset": -75}),
+            4.5: ("Recorder", {"variables": ["u"]}),
+            5: ("EventRecorder", {"variables": ["spike"]}),
+        },
+    }]}
+    result = load_result(run_job(spec, 0, str(tmp_path)))
+    assert set(result["data"]["ng"]) == {4.5, 5}
+    assert result["data"]["ng"][4.5]["u"].shape == (50, 3)
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+import torch
+
+from sharded import ShardedGroup, shard_bounds
+
+BEHAVIOR = {
+    2: ("currents.ConstantCurrent", {"value": 8.0, "noise_range": 6.0}),
+    3: ("models.LIF", {"R": 5, "tau": 10, "threshold": -37, "u_rest": -67, "u_reset": -75, "refractory_T": 2.0,
+                       "fused": True}),
+}
+
+
+def test_shard_bounds_cover_the_population():
+    bounds = shard_bounds(10, 3)
+    assert bounds[0][0] == 0 and bounds[-1][1] == 10
+    assert all(stop == start for (_, stop), (start, _) in zip(bounds[:-1], bounds[1:]))
+
+
+def run(workers):
+    with ShardedGroup(50, BEHAVIOR, workers=workers, seed=3) as group:
+        group.advance(30)
+        group.advance(20)
+        u = group.state("u").clone()
+        times, ids = group.spikes().spikes()
+    return u, times, ids
+
+
+@pytest.fixture(scope="module")
+def single():
+    return run(1)
+
+
+@pytest.mark.parametrize("workers", [2, 3])
+def test_workers_give_the_same_run(single, workers):
+    u, times, ids = single
+    sharded_u, sharded_times, sharded_ids = run(workers)
+    assert len(times) > 0
+    assert torch.equal(sharded_u, u)
+    assert np.array_equal(sharded_times, times) and np.array_equal(sharded_ids, ids)
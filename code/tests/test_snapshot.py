@@ -0,0 +1,66 @@
+import torch
+from pymonntorch import *
+
+from cache import ResultCache
+from currents import ConstantCurrent
+from models import AELIF
+from simulate import Simulation
+from time_res import TimeResolution
+
+AELIF_PARAMS = dict(a=6.7, b=0.5, R=1.7, tau_m=10, tau_w=100, threshold=-30, rh_threshold=-50,
+                    u_rest=-65, u_reset=-70, delta_T=1, refractory_T=1.0)
+
+
+def build():
+    sim = Simulation(Network(behavior={1: TimeResolution(dt=0.5)}))
+    # The noise has no seed of its own: it is drawn from the global generator and kept in checkpoints
+    sim.add_neuron_group(tag="ng", size=10, behavior={
+        2: ConstantCurrent(value=torch.linspace(20, 60, 10), noise_range=10.0),
+        3: AELIF(**AELIF_PARAMS),
+        5: EventRecorder(variables=["spike"]),
+    })
+    return sim
+
+
+def state(sim):
+    ng = sim.net.NeuronGroups[0]
+    return ng.u, ng.w, ng.I, ng.last_spike
+
+
+def test_fork_continues_the_run(tmp_path):
+    whole = build()
+    whole.simulate(300, seed=4, info=False)
+
+    first = build()
+    first.simulate(120, seed=4, info=False)
+    first.checkpoint(str(tmp_path / "state.pt"))
+    fork = build()
+    # Another seed only changes the initial state, which the checkpoint replaces
+    fork.simulate(180, seed=9, info=False, warm_start=str(tmp_path / "state.pt"))
+
+    for expected, value in zip(state(whole), state(fork)):
+        assert torch.equal(value, expected)
+    spikes = whole.net.NeuronGroups[0].behavior[5].variables["spike"]
+    assert len(spikes) > 0
+    assert torch.equal(fork.net.NeuronGroups[0].behavior[5].variables["spike"], spikes[spikes[:, 0] > 120])
+
+
+def test_fork_through_the_cache(tmp_path):
+    first = build()
+    first.simulate(120, seed=4, info=False)
+    state_file = str(tmp_path / "state.pt")
+    first.checkpoint(state_file)
+    fork = build()
+    fork.simulate(80, seed=4, info=False, warm_start=state_file)
+
+    cache = ResultCache(str(tmp_path / "cache"))
+    for loaded in (0, 80):
+        cached = build()
+        assert cache.simulate(cached, 80, info=False, seed=4, warm_start=state_file) == loaded
+        assert cached.net.iteration == 200
+        for expected, value in zip(state(fork), state(cached)):
+            assert torch.equal(value, expected)
+    # Another checkpoint is another configuration
+    first.advance(10, info=False)
+    other = build()
+    assert cache.simulate(other, 80, info=False, seed=4, warm_start=first.checkpoint()) == 0
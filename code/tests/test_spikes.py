@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+import torch
+from pymonntorch import *
+
+from currents import ConstantCurrent
+from models import LIF
+from spikes import SpikeRecorder, SpikeStore
+from time_res import TimeResolution
+
+SIZE = 20
+ITERATIONS = 400
+WINDOWS = [(0, ITERATIONS + 1), (1, 50), (37, 38), (100, 290), (250, ITERATIONS + 100), (60, 60)]
+NEURONS = [None, [7, 2, 19, 0], [5]]
+
+
+@pytest.fixture(scope="module")
+def recorded():
+    net = Network(behavior={1: TimeResolution(dt=0.5)})
+    ng = NeuronGroup(net=net, size=SIZE, behavior={
+        2: ConstantCurrent(value=torch.linspace(0, 30, SIZE), noise_range=20.0, seed=5),
+        3: LIF(R=5, tau=10, threshold=-37, u_rest=-67, u_reset=-75, refractory_T=1.0),
+        5: SpikeRecorder(),
+        6: EventRecorder(variables=["spike"]),
+    })
+    net.initialize(info=False)
+    net.simulate_iterations(ITERATIONS, measure_block_time=False)
+    rows = ng.behavior[6].variables["spike"].numpy()
+    return ng.behavior[5].store, rows
+
+
+def scan(rows, t0, t1, neuron):
+    # brute force: the spike times of one neuron in [t0, t1), from the EventRecorder rows
+    return np.sort(rows[(rows[:, 1] == neuron) & (rows[:, 0] >= t0) & (rows[:, 0] < t1), 0])
+
+
+def test_store_matches_the_event_rows(recorded):
+    store, rows = recorded
+    assert len(store) == len(rows) > 50
+    from_events = SpikeStore.from_events(torch.as_tensor(rows), SIZE)
+    for neuron in range(SIZE):
+        assert np.array_equal(store.train(neuron), scan(rows, 0, ITERATIONS + 1, neuron))
+        assert np.array_equal(from_events.train(neuron), store.train(neuron))
+
+
+@pytest.mark.parametrize("t0, t1", WINDOWS)
+@pytest.mark.parametrize("neurons", NEURONS)
+def test_window_counts_rates(recorded, t0, t1, neurons):
+    store, rows = recorded
+    _, times = store.build()
+    selected, start, stop = store.window(t0, t1, neurons)
+    expected = [scan(rows, t0, t1, neuron) for neuron in selected]
+    for j, neuron in enumerate(selected):
+        assert np.array_equal(times[start[j]:stop[j]], expected[j])
+    counts = np.array([len(train) for train in expected])
+    assert np.array_equal(store.counts(t0, t1, neurons), counts)
+    if t1 > t0:
+        assert np.allclose(store.rates(t0, t1, 0.5, neurons), counts / ((t1 - t0) * 0.5))
+
+
+@pytest.mark.parametrize("t0, t1", WINDOWS)
+@pytest.mark.parametrize("neurons", NEURONS)
+def test_spikes_of_a_subset(recorded, t0, t1, neurons):
+    store, rows = recorded
+    times, ids = store.spikes(neurons, t0, t1)
+    selected = range(SIZE) if neurons is None else neurons
+    expected = [(t, neuron) for neuron in selected for t in scan(rows, t0, t1, neuron)]
+    assert list(zip(times.tolist(), ids.tolist())) == expected
+
+
+@pytest.mark.parametrize("bin_size", [1, 7, 50])
+@pytest.mark.parametrize("neurons", NEURONS)
+def test_binned_counts(recorded, bin_size, neurons):
+    store, rows = recorded
+    t0, t1 = 13, 380
+    counts = store.binned_counts(bin_size, t0, t1, neurons)
+    selected = range(SIZE) if neurons is None else neurons
+    n_bins = -(-(t1 - t0) // bin_size)
+    expected = np.zeros((len(selected), n_bins), dtype=np.int64)
+    for row, neuron in enumerate(selected):
+        for t in scan(rows, t0, t1, neuron):
+            expected[row, (t - t0) // bin_size] += 1
+    assert np.array_equal(counts, expected)
+
+
+def test_spike_times(recorded):
+    store, rows = recorded
+    times, ids = store.spike_times(0.5)
+    assert sorted(zip(times.tolist(), ids.tolist())) == sorted((t * 0.5, i) for t, i in rows.tolist())
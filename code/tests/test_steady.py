@@ -0,0 +1,66 @@
+import torch
+from pymonntorch import *
+
+from currents import ConstantCurrent
+from models import LIF
+from spikes import SpikeRecorder
+from steady import SteadyState, simulate_until_steady
+from time_res import TimeResolution
+
+LIF_PARAMS = dict(R=5, tau=10, threshold=-37, u_rest=-67, u_reset=-75, ratio=0)
+
+
+def network(currents, **kwargs):
+    net = Network(behavior={1: TimeResolution(dt=1.0)})
+    ng = NeuronGroup(net=net, size=len(currents), behavior={
+        2: ConstantCurrent(value=torch.tensor(currents)),
+        3: LIF(**LIF_PARAMS),
+        4: Recorder(variables=["u"]),
+        5: SpikeRecorder(),
+        6: SteadyState(silent=200, **kwargs),
+    })
+    net.initialize(info=False)
+    return net, ng
+
+
+def test_rates_of_periodic_lanes():
+    net, ng = network([7.0, 10.0, 20.0], freeze=False)
+    net.simulate_iterations(1000, measure_block_time=False)
+    monitor = ng.behavior[6]
+    assert monitor.converged.all()
+    counts = torch.as_tensor(ng.behavior[5].store.counts(500, 1001), dtype=torch.float64)
+    assert torch.allclose(monitor.rate, counts / 500, rtol=0.05)
+
+
+def test_converged_lanes_are_frozen_per_lane():
+    net, ng = network([20.0, 7.0])
+    monitor = ng.behavior[6]
+    while not monitor.converged[0]:
+        net.simulate_iterations(1, measure_block_time=False)
+    assert not monitor.converged[1]
+    at = net.iteration
+    net.simulate_iterations(20, measure_block_time=False)
+    u = ng.behavior[4].variables["u"]
+    # the converged lane is held, the other one keeps running
+    assert (u[at:, 0] == u[at - 1, 0]).all()
+    assert len(torch.unique(u[at:, 1])) > 1
+    times, ids = ng.behavior[5].store.spikes()
+    assert not ((times > at) & (ids == 0)).any()
+
+
+def test_recorders_run_until_steady_and_after():
+    net, ng = network([7.0, 10.0, 20.0])
+    simulated = simulate_until_steady(net, 5000)
+    monitor = ng.behavior[6]
+    assert monitor.done and simulated < 5000
+    assert len(ng.behavior[4].variables["u"]) == simulated
+    assert all(behavior.behavior_enabled for behavior in ng.behavior.values())
+    assert ng.frozen is None
+
+    # released: the model runs every lane again, the estimates are kept
+    rate = monitor.rate.clone()
+    net.simulate_iterations(100, measure_block_time=False)
+    assert len(ng.behavior[4].variables["u"]) == simulated + 100
+    times, _ = ng.behavior[5].store.spikes()
+    assert (times > simulated).any()
+    assert torch.equal(monitor.rate, rate)
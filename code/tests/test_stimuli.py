@@ -0,0 +1,57 @@
+import pytest
+import torch
+from pymonntorch import *
+
+from stimuli import Constant, Product, Ramp, Sin, Step, StimulusCache, StimulusCurrent, Sum, UniformNoise
+from time_res import TimeResolution
+
+SIZE = 4
+STIMULI = {
+    "sum": lambda: Sum(Step(10.0, t_start=3.0, t_end=20.0), Sin(2.0, 0.5, phase=[0.0, 0.5, 1.0, 1.5]), Constant(1.0)),
+    "product": lambda: Product(Ramp(0.25, start=1.0), Sin([1.0, 2.0, 3.0, 4.0], 0.3, offset=2.0)),
+    "gated noise": lambda: (Step(5.0, t_start=2.0) + Sin(1.0, 0.2)).gate(4.0, 25.0).with_noise(3.0, seed=7),
+    "operators": lambda: 2.0 * (Ramp(0.5) + 1.0) * Step([1.0, 0.0, 1.0, 0.0], t_start=1.0) + UniformNoise(1.0, seed=3),
+}
+
+
+def group():
+    net = Network(behavior={1: TimeResolution(dt=0.5)})
+    ng = NeuronGroup(net=net, size=SIZE, behavior={})
+    net.initialize(info=False)
+    return ng
+
+
+def direct(stimulus, ng, iteration):
+    # one iteration evaluated on its own, in the dtype of the group
+    column = torch.tensor([[iteration]], dtype=torch.float64)
+    return stimulus.values(ng, column).to(ng.def_dtype).expand(1, SIZE)[0]
+
+
+@pytest.mark.parametrize("name", STIMULI)
+@pytest.mark.parametrize("chunk_size", [1, 7, 64])
+def test_cached_rows_equal_direct_evaluation(name, chunk_size):
+    ng = group()
+    stimulus = STIMULI[name]()
+    cache = StimulusCache(stimulus, chunk_size)
+    # forward across chunk edges, then back to the beginning and to a chunk edge
+    for iteration in [*range(60), 0, 13, 2 * chunk_size, 2 * chunk_size - 1]:
+        assert torch.equal(cache.row(ng, iteration).expand(SIZE), direct(stimulus, ng, iteration)), iteration
+
+
+def test_sum_and_product_of_terms():
+    ng = group()
+    iterations = torch.arange(0, 40, dtype=torch.float64).unsqueeze(1)
+    terms = [Step(10.0, t_start=3.0, t_end=9.0), Sin(2.0, 0.5, phase=[0.0, 0.5, 1.0, 1.5]), Ramp(0.1)]
+    values = [term.values(ng, iterations) for term in terms]
+    assert torch.equal(Sum(*terms).values(ng, iterations), values[0] + values[1] + values[2])
+    assert torch.equal(Product(*terms).values(ng, iterations), values[0] * values[1] * values[2])
+
+
+def test_stimulus_current_follows_the_closed_form():
+    stimulus = STIMULI["gated noise"]()
+    net = Network(behavior={1: TimeResolution(dt=0.5)})
+    ng = NeuronGroup(net=net, size=SIZE, behavior={2: StimulusCurrent(stimulus=stimulus, chunk_size=16)})
+    net.initialize(info=False)
+    for _ in range(50):
+        net.simulate_iterations(1, measure_block_time=False)
+        assert torch.equal(ng.I, direct(stimulus, ng, net.iteration))
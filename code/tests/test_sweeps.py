@@ -0,0 +1,42 @@
+import itertools
+
+import torch
+from pymonntorch import *
+
+from currents import ConstantCurrent
+from models import LIF
+from simulate import Simulation
+from spikes import SpikeRecorder
+from time_res import TimeResolution
+
+VALUES = [5.0, 10.0, 20.0, 35.0]
+TAUS = [5.0, 10.0, 20.0]
+LIF_PARAMS = dict(R=5, threshold=-37, u_rest=-67, u_reset=-75, refractory_T=1.0, ratio=0)
+
+
+def behavior(value=None, tau=None):
+    return {
+        2: ConstantCurrent(value=value),
+        3: LIF(tau=tau, **LIF_PARAMS),
+        4: Recorder(variables=["u"]),
+        5: SpikeRecorder(),
+    }
+
+
+def test_sweep_matches_single_runs():
+    sweep = Simulation(Network(behavior={1: TimeResolution(dt=0.5)}))
+    sweep.add_parameter_sweep("sweep", {(2, "value"): VALUES, (3, "tau"): TAUS}, behavior())
+    sweep.simulate(300, info=False)
+    rates = sweep.sweep_rates("sweep")
+    trace = sweep.sweep_trace("sweep", "u")
+    assert rates.shape == (len(VALUES), len(TAUS))
+    assert trace.shape == (300, len(VALUES), len(TAUS))
+    assert (rates > 0).any() and (rates == 0).any()
+
+    for (i, value), (j, tau) in itertools.product(enumerate(VALUES), enumerate(TAUS)):
+        single = Simulation(Network(behavior={1: TimeResolution(dt=0.5)}))
+        single.add_neuron_group(tag="single", size=1, behavior=behavior(value, tau))
+        single.simulate(300, info=False)
+        ng = single.net["single", 0]
+        assert torch.equal(trace[:, i, j], ng.behavior[4].variables["u"][:, 0])
+        assert rates[i, j] == single.rates(ng)[0]
@@ -0,0 +1,62 @@
+import pytest
+import torch
+from pymonntorch import *
+
+from currents import ConstantCurrent
+from models import LIF
+from synapses import SparseSynapse, random_connectivity
+from time_res import TimeResolution
+
+SIZE = 40
+CURRENT = 5 + (torch.arange(SIZE) % 9) * 0.5
+LIF_PARAMS = dict(R=5, tau=10, threshold=-37, u_rest=-67, u_reset=-75, refractory_T=2.0)
+
+
+class DenseSynapse(Behavior):
+    """
+    Reference: the spikes emitted d steps ago through the dense weights of the synapses with delay d
+    """
+
+    def initialize(self, sg):
+        # delay in steps -> dense (src.size, dst.size) weights
+        self.weights = self.parameter("weights", None, required=True)
+        self.history = []
+
+    def forward(self, sg):
+        self.history.append(sg.src.spike.float())
+        for d, weights in self.weights.items():
+            if len(self.history) >= d:
+                sg.dst.I += self.history[-d] @ weights
+
+
+def run(synapse):
+    net = Network(behavior={1: TimeResolution(dt=1.0)})
+    NeuronGroup(net=net, tag="ng", size=SIZE, behavior={
+        2: ConstantCurrent(value=CURRENT),
+        3: LIF(**LIF_PARAMS, ratio=0),
+        4: Recorder(variables=["u", "I"]),
+    })
+    SynapseGroup(net=net, src="ng", dst="ng", tag="recurrent", behavior={2.5: synapse})
+    net.initialize(info=False)
+    net.simulate_iterations(200, measure_block_time=False)
+    return net.NeuronGroups[0].behavior[4].variables
+
+
+@pytest.mark.parametrize("delayed", [False, True])
+def test_sparse_matches_dense(delayed):
+    # Weights in halves keep every sum exact in float32, whatever the order of the additions
+    weights, delays = random_connectivity(SIZE, SIZE, 8, lambda g, n: torch.randint(-4, 9, (n,), generator=g) * 0.5,
+                                          delay=(0.5, 4.49) if delayed else None, seed=1)
+    steps = torch.ones(len(weights.values()), dtype=torch.int64) if delays is None else delays.round().long()
+    dense = {}
+    rows = torch.repeat_interleave(torch.arange(SIZE), weights.crow_indices().diff())
+    for d in steps.unique().tolist():
+        chosen = steps == d
+        dense[d] = torch.zeros(SIZE, SIZE).index_put_((rows[chosen], weights.col_indices()[chosen]),
+                                                      weights.values()[chosen], accumulate=True)
+
+    expected = run(DenseSynapse(weights=dense))
+    sparse = run(SparseSynapse(weights=weights, delay=0 if delays is None else delays))
+    assert (expected["I"] != CURRENT).any()
+    assert torch.equal(sparse["I"], expected["I"])
+    assert torch.equal(sparse["u"], expected["u"])
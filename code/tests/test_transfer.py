@@ -0,0 +1,73 @@
+import os
+
+import numpy as np
+import pytest
+import torch
+from pymonntorch import *
+
+from currents import ConstantCurrent
+from models import LIF
+from spikes import SpikeRecorder
+from time_res import TimeResolution
+from transfer import TransferTable, lif_rate, lif_rheobase
+
+DT = 0.1
+LIF_PARAMS = dict(R=5, tau=10, u_rest=-67, u_reset=-75, threshold=-37)
+CURRENTS = np.linspace(4, 40, 19)
+
+
+def simulated_trains(currents, refractory_T, iterations):
+    net = Network(behavior={1: TimeResolution(dt=DT)})
+    ng = NeuronGroup(net=net, size=len(currents), behavior={
+        2: ConstantCurrent(value=torch.as_tensor(currents, dtype=torch.float32)),
+        3: LIF(**LIF_PARAMS, refractory_T=refractory_T, ratio=0),
+        5: SpikeRecorder(),
+    })
+    net.initialize(info=False)
+    net.simulate_iterations(iterations, measure_block_time=False)
+    return [ng.behavior[5].store.train(i) for i in range(ng.size)]
+
+
+@pytest.mark.parametrize("refractory_T", [0.0, 1.0, 2.5])
+def test_lif_rate_matches_simulated_spikes(refractory_T):
+    rates = lif_rate(CURRENTS, **LIF_PARAMS, refractory_T=refractory_T, dt=DT)
+    trains = simulated_trains(CURRENTS, refractory_T, 5000)
+    assert (rates == 0).any() and (rates > 0).sum() > 10
+    for current, rate, train in zip(CURRENTS, rates, trains):
+        if rate == 0:
+            assert len(train) == 0, current
+            continue
+        # every interval is the one of the forward Euler scheme, up to a step of float32 rounding
+        intervals = np.diff(train) * DT
+        assert len(intervals) > 2
+        assert np.all(np.abs(intervals - 1 / rate) <= DT + 1e-9), current
+        assert abs(np.median(intervals) - 1 / rate) < 1e-6, current
+
+
+def test_continuous_rate_is_the_limit_of_small_steps():
+    firing = CURRENTS[CURRENTS > lif_rheobase(5, -67, -37) + 1]
+    continuous = lif_rate(firing, **LIF_PARAMS, refractory_T=1.0)
+    fine = lif_rate(firing, **LIF_PARAMS, refractory_T=1.0, dt=1e-4)
+    assert np.allclose(fine, continuous, rtol=1e-2)
+
+
+def test_transfer_table(tmp_path):
+    grid = np.linspace(8, 32, 7)
+    table = TransferTable(LIF, dict(LIF_PARAMS, refractory_T=1.0), {"I": grid}, dt=DT, iterations=20000,
+                          directory=str(tmp_path))
+    expected = lif_rate(grid, **LIF_PARAMS, refractory_T=1.0, dt=DT)
+    assert np.allclose(table.rates, expected, rtol=0.02)
+    assert np.allclose(table(I=grid), table.rates)
+
+    # between grid points the table interpolates linearly
+    middle = (grid[2] + grid[3]) / 2
+    assert np.isclose(table(I=middle), (table.rates[2] + table.rates[3]) / 2)
+    # outside the grid it is simulated on demand, or clamped without fallback
+    assert np.isclose(table(I=40.0), lif_rate(40.0, **LIF_PARAMS, refractory_T=1.0, dt=DT), rtol=0.02)
+    assert np.isclose(table(I=40.0, fallback=False), table.rates[-1])
+
+    # the second table with the same configuration is read from the cache
+    assert len(os.listdir(tmp_path)) == 1
+    cached = TransferTable(LIF, dict(LIF_PARAMS, refractory_T=1.0), {"I": grid}, dt=DT, iterations=20000,
+                           directory=str(tmp_path))
+    assert np.array_equal(cached.rates, table.rates)
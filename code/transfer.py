@@ -0,0 +1,188 @@
+"""
+f-I transfer functions: closed forms for LIF, rheobases for ELIF/AELIF and simulated, cached
+and interpolated f-I(-noise) tables for any model.
+Rates are in spikes per unit of time, as in Simulation.rates.
+"""
+import hashlib
+import json
+import math
+import os
+
+import numpy as np
+import torch
+from pymonntorch import *
+
+from cache import canonical
+from currents import ConstantCurrent
+from spikes import SpikeRecorder
+from steady import SteadyState
+from time_res import TimeResolution
+
+
+def lif_rate(I, R, tau, u_rest, u_reset, threshold, refractory_T=0.0, dt=None):
+    """
+    Firing rate of LIF under constant input, with the input gated off for refractory_T after a spike
+    :param I: input current(s), any array-like
+    :param dt: None for the continuous-time rate, or the step of the forward Euler scheme in models.LIF,
+               in which case the rate matches the simulation exactly (up to float32 rounding)
+    :return: numpy array of rates with the shape of I
+    """
+    I = np.asarray(I, dtype=np.float64)
+    u_inf = u_rest + R * I
+    firing = u_inf > threshold
+    # The input is off for the refractory period while u decays from u_reset towards u_rest
+    if dt is None:
+        u_start = u_rest + (u_reset - u_rest) * math.exp(-refractory_T / tau)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            isi = refractory_T + tau * np.log((u_inf - u_start) / (u_inf - threshold))
+    else:
+        decay = 1 - dt / tau
+        off = math.floor(refractory_T / dt + 1e-9)
+        u_start = u_rest + (u_reset - u_rest) * decay ** off
+        with np.errstate(divide="ignore", invalid="ignore"):
+            steps = np.floor(np.log((u_inf - threshold) / (u_inf - u_start)) / math.log(decay)) + 1
+        isi = (off + np.maximum(steps, 1)) * dt
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(firing, 1 / isi, 0.0)
+
+
+def lif_rheobase(R, u_rest, threshold):
+    return (threshold - u_rest) / R
+
+
+def elif_rheobase(R, u_rest, rh_threshold, delta_T):
+    """
+    Smallest constant current without a stable resting state: the exponential term balances the
+    leak at u = rh_threshold
+    """
+    return (rh_threshold - u_rest - delta_T) / R
+
+
+def aelif_rheobase(R, a, tau_m, tau_w, u_rest, rh_threshold, delta_T):
+    """
+    Current at which the resting state of AELIF (with w at a * (u - u_rest)) loses stability: the
+    saddle-node at exp((u - rh_threshold) / delta_T) = 1 + R a, or the Hopf bifurcation at
+    1 + tau_m / tau_w if that comes first (strong adaptation, R a > tau_m / tau_w). A subcritical Hopf
+    leaves the model bistable below this current, so a neuron kicked away from rest (e.g. by the onset
+    of the current) may still fire.
+    """
+    leak = 1 + R * a
+    u_c = rh_threshold + delta_T * math.log(min(leak, 1 + tau_m / tau_w))
+    return (leak * (u_c - u_rest) - delta_T * math.exp((u_c - rh_threshold) / delta_T)) / R
+
+
+# Table axes that are parameters of the current, all others are parameters of the model
+CURRENT_AXES = {"I": "value", "noise": "noise_range"}
+
+
+class TransferTable:
+    """
+    f-I(-noise, -parameter) surface of a model, simulated once on a grid (one lane per grid point,
+    run until the rates are steady), cached on disk and interpolated multilinearly.
+
+    Example:
+        table = TransferTable(AELIF, params, {"I": np.linspace(0, 80, 41), "noise": [0, 5, 10]})
+        table(I=[12.5, 30], noise=2)
+    Points outside the grid are simulated on demand unless fallback=False.
+
+    Args:
+        model: model behavior class
+        params (dict): fixed model parameters
+        axes (dict): axis name -> grid values; "I" and "noise" are the value and noise_range of a
+            ConstantCurrent, other names are model parameters
+        dt (float): time step of the simulations
+        iterations (int): maximum length of a simulation
+        directory (str): cache directory of the tables
+    """
+
+    def __init__(self, model, params, axes, dt=0.1, iterations=50000, directory=".sim_cache/transfer"):
+        self.model = model
+        self.params = params
+        self.names = list(axes)
+        self.grid = [np.asarray(sorted(axes[name]), dtype=np.float64) for name in self.names]
+        self.dt = dt
+        self.iterations = iterations
+        self.directory = directory
+        self.rates = self.load_or_build()
+
+    def key(self):
+        config = [canonical(self.model), canonical(self.params), self.names, canonical(self.grid),
+                  self.dt, self.iterations]
+        return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+
+    def load_or_build(self):
+        file = os.path.join(self.directory, f"{self.key()}.npy")
+        if os.path.exists(file):
+            return np.load(file)
+        rates = self.simulate(np.meshgrid(*self.grid, indexing="ij"))
+        os.makedirs(self.directory, exist_ok=True)
+        np.save(file, rates)
+        return rates
+
+    def simulate(self, coordinates):
+        """
+        Steady-state rates at the given coordinates, one array per axis (all of the same shape)
+        """
+        from simulate import Simulation
+
+        shape = np.shape(coordinates[0])
+        current, model = {}, dict(self.params, ratio=0)
+        for name, values in zip(self.names, coordinates):
+            values = torch.as_tensor(np.ravel(values), dtype=torch.float32)
+            if name in CURRENT_AXES:
+                current[CURRENT_AXES[name]] = values
+            else:
+                model[name] = values
+        current.setdefault("value", 0.0)
+        size = int(np.prod(shape))
+        sim = Simulation(net=Network(behavior={1: TimeResolution(dt=self.dt)}))
+        sim.add_neuron_group(tag="transfer", size=size, behavior={
+            2: ConstantCurrent(**current),
+            3: self.model(**model),
+            5: SpikeRecorder(),
+            6: SteadyState(),
+        })
+        sim.simulate(self.iterations, info=False, until_steady=True)
+        return sim.rates(sim.net["transfer", 0]).double().numpy().reshape(shape)
+
+    def inside(self, coordinates):
+        return np.all([(c >= g[0]) & (c <= g[-1]) for c, g in zip(coordinates, self.grid)], axis=0)
+
+    def interpolate(self, coordinates):
+        """
+        Multilinear interpolation of the table; coordinates are clamped to the grid
+        """
+        result = np.zeros(np.shape(coordinates[0]))
+        lower, weights = [], []
+        for c, g in zip(coordinates, self.grid):
+            if len(g) == 1:
+                lower.append(np.zeros(np.shape(c), dtype=np.int64))
+                weights.append(np.zeros(np.shape(c)))
+                continue
+            c = np.clip(c, g[0], g[-1])
+            i = np.clip(np.searchsorted(g, c, side="right") - 1, 0, len(g) - 2)
+            lower.append(i)
+            weights.append((c - g[i]) / (g[i + 1] - g[i]))
+        # Sum over the 2^d corners of the enclosing cell
+        for corner in range(2 ** len(self.grid)):
+            index, weight = [], np.ones(np.shape(coordinates[0]))
+            for d, (i, w) in enumerate(zip(lower, weights)):
+                upper = (corner >> d) & 1
+                if len(self.grid[d]) == 1 and upper:
+                    weight = weight * 0
+                index.append(np.minimum(i + upper, len(self.grid[d]) - 1))
+                weight = weight * (w if upper else 1 - w)
+            result += weight * self.rates[tuple(index)]
+        return result
+
+    def __call__(self, fallback=True, **coordinates):
+        """
+        Rates at the given axis values (broadcast against each other)
+        :param fallback: simulate the points outside the grid instead of clamping them to it
+        """
+        coordinates = np.broadcast_arrays(*[np.asarray(coordinates[name], dtype=np.float64) for name in self.names])
+        rates = self.interpolate(coordinates)
+        outside = ~self.inside(coordinates)
+        if fallback and outside.any():
+            rates[outside] = self.simulate([c[outside] for c in coordinates])
+        return rates
@@ -0,0 +1,29 @@
+import numpy as np
+import torch
+
+
+def to_lanes(ng, value):
+    """
+    Turn a per-neuron parameter into a tensor over the neurons of the group
+    :param ng: neuron group
+    :param value: a python number (kept as is) or a list/array/tensor with one entry per neuron
+    :return: number or tensor of shape (ng.size,)
+    """
+    if isinstance(value, (list, tuple, np.ndarray, torch.Tensor)):
+        value = torch.as_tensor(value, dtype=ng.def_dtype, device=ng.device)
+        if value.dim() == 0:
+            return value.item()
+        if value.numel() != ng.size:
+            raise ValueError(f"Expected {ng.size} per-neuron values, got {value.numel()}.")
+        return value.reshape(ng.size)
+    return value
+
+
+def at_lanes(value, index):
+    """
+    A parameter of to_lanes restricted to the neurons at `index` (all of them when index is None)
+    """
+    if index is None or not isinstance(value, torch.Tensor) or not value.dim():
+        return value
+    return value[index]
+